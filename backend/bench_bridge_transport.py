@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark TCP x unix socket entre o backend e o WhatsApp service.
+
+O serviço precisa estar rodando com a porta TCP e o socket ativos, por exemplo:
+    WHATSAPP_SOCKET=/tmp/whatsapp-service.sock node index.js
+
+Uso:
+    python bench_bridge_transport.py --socket /tmp/whatsapp-service.sock -n 2000
+
+Mede latência por chamada (média/p50/p95/p99) e CPU do processo Python por
+chamada, nos dois modos usados pelo backend: um cliente novo por chamada
+(como em whatsapp_request) e um cliente reaproveitado (keep-alive).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_client(socket_path, timeout):
+    if socket_path:
+        return httpx.AsyncClient(timeout=timeout, transport=httpx.AsyncHTTPTransport(uds=socket_path))
+    return httpx.AsyncClient(timeout=timeout)
+
+
+async def run_case(base_url, socket_path, endpoint, requests, warmup, reuse_client):
+    url = f"{base_url}{endpoint}"
+    latencies = []
+    cpu_start = 0.0
+    shared = make_client(socket_path, 10.0) if reuse_client else None
+    try:
+        for i in range(warmup + requests):
+            if i == warmup:
+                cpu_start = time.process_time()
+            started = time.perf_counter()
+            if shared:
+                response = await shared.get(url)
+            else:
+                async with make_client(socket_path, 10.0) as client:
+                    response = await client.get(url)
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            if i >= warmup:
+                latencies.append(elapsed * 1000)
+        cpu_ms = (time.process_time() - cpu_start) * 1000
+    finally:
+        if shared:
+            await shared.aclose()
+    return {
+        'mean': statistics.mean(latencies),
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'cpu': cpu_ms / requests,
+        'rps': requests / (sum(latencies) / 1000),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Compara TCP e unix socket no acesso ao WhatsApp service')
+    parser.add_argument('--tcp', default='http://localhost:3002', help='URL TCP do serviço')
+    parser.add_argument('--socket', required=True, help='Caminho do socket unix do serviço')
+    parser.add_argument('--endpoint', default='/health', help='Endpoint usado nas chamadas')
+    parser.add_argument('-n', '--requests', type=int, default=1000, help='Chamadas medidas por cenário')
+    parser.add_argument('--warmup', type=int, default=50, help='Chamadas de aquecimento (não medidas)')
+    args = parser.parse_args()
+
+    cases = [
+        ('tcp  / cliente por chamada', args.tcp, None, False),
+        ('unix / cliente por chamada', 'http://whatsapp-service', args.socket, False),
+        ('tcp  / keep-alive', args.tcp, None, True),
+        ('unix / keep-alive', 'http://whatsapp-service', args.socket, True),
+    ]
+
+    print(f"{args.requests} chamadas GET {args.endpoint} por cenário ({args.warmup} de aquecimento)\n")
+    print(f"{'cenário':<28}{'média ms':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'CPU ms':>9}{'req/s':>9}")
+    results = {}
+    for name, base_url, socket_path, reuse_client in cases:
+        stats = await run_case(base_url, socket_path, args.endpoint, args.requests, args.warmup, reuse_client)
+        results[name] = stats
+        print(f"{name:<28}{stats['mean']:>10.3f}{stats['p50']:>9.3f}{stats['p95']:>9.3f}"
+              f"{stats['p99']:>9.3f}{stats['cpu']:>9.3f}{stats['rps']:>9.0f}")
+
+    print()
+    for mode in ('cliente por chamada', 'keep-alive'):
+        tcp = results[f'tcp  / {mode}']
+        unix = results[f'unix / {mode}']
+        print(f"{mode}: latência {100 * (1 - unix['mean'] / tcp['mean']):+.1f}% "
+              f"| CPU {100 * (1 - unix['cpu'] / tcp['cpu']):+.1f}% (positivo = unix mais rápido)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
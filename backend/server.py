@@ -1,14 +1,17 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, InsertOne, DeleteOne, DeleteMany
+from bson.codec_options import CodecOptions
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, Optional, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
@@ -20,6 +23,13 @@ import aiofiles
 import httpx
 import base64
 import asyncio
+import json
+import re
+import gzip
+import hashlib
+import hmac
+import time
+import unicodedata
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -28,14 +38,26 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
+# Só os leitores de datetimes BSON (send_logs, marcas da retenção) usam datas "aware"
+# em UTC; as demais coleções guardam datas em string ISO e seguem com o codec padrão
+tz_aware_db = client.get_database(os.environ['DB_NAME'], codec_options=CodecOptions(tz_aware=True, tzinfo=timezone.utc))
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'nexus-whatsapp-secret-key-2024')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
-# WhatsApp Service URL
-WHATSAPP_SERVICE_URL = os.environ.get('WHATSAPP_SERVICE_URL', 'http://localhost:3002')
+# WhatsApp Service URL: http://host:porta ou unix:///caminho/do/socket (mesmo host, sem TCP)
+WHATSAPP_SERVICE_ADDRESS = os.environ.get('WHATSAPP_SERVICE_URL', 'http://localhost:3002')
+WHATSAPP_SERVICE_SOCKET = WHATSAPP_SERVICE_ADDRESS[len('unix://'):] if WHATSAPP_SERVICE_ADDRESS.startswith('unix://') else None
+# Com socket o host é só nominal: o transporte conecta direto no arquivo
+WHATSAPP_SERVICE_URL = 'http://whatsapp-service' if WHATSAPP_SERVICE_SOCKET else WHATSAPP_SERVICE_ADDRESS
+
+def whatsapp_http_client(timeout: float) -> httpx.AsyncClient:
+    """Cliente httpx para o WhatsApp service (TCP ou unix socket)"""
+    if WHATSAPP_SERVICE_SOCKET:
+        return httpx.AsyncClient(timeout=timeout, transport=httpx.AsyncHTTPTransport(uds=WHATSAPP_SERVICE_SOCKET))
+    return httpx.AsyncClient(timeout=timeout)
 
 # Create uploads directory
 UPLOADS_DIR = ROOT_DIR / 'uploads'
@@ -72,11 +94,70 @@ security = HTTPBearer()
 scheduler = AsyncIOScheduler(timezone='America/Sao_Paulo')
 
 # Configure logging
+# LOG_LEVEL global e níveis por categoria: LOG_CATEGORY_LEVELS="bridge=DEBUG,sync=WARNING"
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_CATEGORY_LEVELS = dict(
+    item.strip().split('=', 1) for item in os.environ.get('LOG_CATEGORY_LEVELS', '').split(',') if '=' in item
+)
+# Strings acima do limite são truncadas; listas mostram só os primeiros itens
+LOG_FIELD_MAX_CHARS = int(os.environ.get('LOG_FIELD_MAX_CHARS', '200'))
+LOG_LIST_MAX_ITEMS = int(os.environ.get('LOG_LIST_MAX_ITEMS', '5'))
+# Mensagens repetitivas (mesma chave) saem no máximo uma vez por intervalo
+LOG_SAMPLE_INTERVAL = float(os.environ.get('LOG_SAMPLE_INTERVAL', '60'))
+# Campos nunca registrados por conteúdo (binário/base64 ou sensíveis)
+REDACTED_LOG_FIELDS = {'imagebase64', 'image_base64', 'qrimage', 'qr_code', 'qrcode', 'password', 'token', 'authorization'}
+
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+bridge_logger = logger.getChild('bridge')
+sync_logger = logger.getChild('sync')
+for log_category, log_category_level in LOG_CATEGORY_LEVELS.items():
+    logger.getChild(log_category.strip()).setLevel(log_category_level.strip().upper())
+
+log_sample_state = {}  # chave -> [último registro (monotonic), mensagens suprimidas]
+
+def redact_for_log(value, max_chars: int = LOG_FIELD_MAX_CHARS):
+    """Cópia resumida de um payload para log: campos binários/sensíveis viram o tamanho,
+    strings longas são truncadas e listas grandes resumidas"""
+    if isinstance(value, dict):
+        return {
+            key: (f'<{len(item)} chars>' if isinstance(item, str) else '<redacted>')
+            if key.lower() in REDACTED_LOG_FIELDS and item else redact_for_log(item, max_chars)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        summary = [redact_for_log(item, max_chars) for item in value[:LOG_LIST_MAX_ITEMS]]
+        if len(value) > LOG_LIST_MAX_ITEMS:
+            summary.append(f'<+{len(value) - LOG_LIST_MAX_ITEMS} itens>')
+        return summary
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str) and len(value) > max_chars:
+        return f'{value[:max_chars]}…<+{len(value) - max_chars} chars>'
+    return value
+
+def log_event(log: logging.Logger, level: int, event: str, sample_key: str = None, **fields):
+    """Log estruturado 'evento campo=valor' com redação. Só formata se o nível estiver ativo;
+    com sample_key registra no máximo uma vez por LOG_SAMPLE_INTERVAL (informando as suprimidas)"""
+    if not log.isEnabledFor(level):
+        return
+    if sample_key:
+        now = time.monotonic()
+        sample = log_sample_state.get(sample_key)
+        if sample and now - sample[0] < LOG_SAMPLE_INTERVAL:
+            sample[1] += 1
+            return
+        if sample and sample[1]:
+            fields['suppressed'] = sample[1]
+        log_sample_state[sample_key] = [now, 0]
+    details = ' '.join(
+        f'{key}={json.dumps(redact_for_log(value), ensure_ascii=False, default=str)}'
+        for key, value in fields.items()
+    )
+    log.log(level, f'{event} {details}' if details else event)
 
 # ============= Models =============
 
@@ -255,6 +336,10 @@ class GroupResponse(BaseModel):
     name: str
     participants_count: int
 
+class GroupListCreate(BaseModel):
+    name: str
+    group_ids: List[str]
+
 class CampaignMessageItem(BaseModel):
     message: Optional[str] = None
     image_id: Optional[str] = None
@@ -303,6 +388,37 @@ class CampaignResponse(BaseModel):
     remaining_time_on_pause: Optional[int] = None  # Seconds remaining when paused
     created_at: str
 
+class CampaignSummaryResponse(BaseModel):
+    """Campos dos cards da listagem - sem group_ids nem os textos das mensagens (só uma
+    prévia e as imagens das variações), com contagens calculadas no Mongo"""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    title: str
+    user_id: str
+    connection_id: str
+    message_preview: str = ''
+    message_image_ids: List[Optional[str]] = []
+    image_id: Optional[str] = None
+    image_url: Optional[str] = None
+    schedule_type: str
+    scheduled_time: Optional[str] = None
+    interval_hours: Optional[int] = None
+    specific_times: Optional[List[str]] = None
+    delay_seconds: int
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    status: str
+    sent_count: int
+    total_count: int
+    current_group_index: int = 0
+    last_run: Optional[str] = None
+    next_run: Optional[str] = None
+    paused_at: Optional[str] = None
+    remaining_time_on_pause: Optional[int] = None
+    created_at: str
+    group_count: int
+    message_count: int
+
 class ImageResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -355,6 +471,26 @@ async def get_admin_user(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Acesso negado. Apenas administradores.")
     return user
 
+# ============= Server-Sent Events Helpers =============
+
+SSE_KEEPALIVE_SECONDS = 15
+
+def sse_event(event: str, data: dict) -> str:
+    """Formata um evento SSE (text/event-stream)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def sse_keepalive() -> str:
+    """Comentário SSE para manter a conexão aberta em proxies (nginx)"""
+    return ": keepalive\n\n"
+
+def sse_response(generator) -> StreamingResponse:
+    """StreamingResponse configurada para SSE sem buffering no nginx"""
+    return StreamingResponse(
+        generator,
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # ============= WhatsApp Service Integration =============
 
 # Auto-recovery tracking
@@ -403,7 +539,7 @@ async def auto_recover_whatsapp_service():
         
         # 3. Verifica se voltou
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with whatsapp_http_client(5.0) as client:
                 response = await client.get(f"{WHATSAPP_SERVICE_URL}/health")
                 if response.status_code == 200:
                     logger.info("[AUTO-RECOVERY] ✅ WhatsApp service recuperado com sucesso!")
@@ -420,13 +556,8 @@ async def auto_recover_whatsapp_service():
         return False
 
 async def check_whatsapp_health():
-    """Verifica saúde do WhatsApp service e tenta recuperar se necessário"""
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{WHATSAPP_SERVICE_URL}/health")
-            return response.status_code == 200
-    except:
-        return False
+    """Verifica saúde do WhatsApp service (ignora o cache)"""
+    return await get_bridge_health(force=True)
 
 @api_router.get("/debug/whatsapp-service")
 async def debug_whatsapp_service():
@@ -435,7 +566,7 @@ async def debug_whatsapp_service():
     import shutil
     
     result = {
-        'whatsapp_service_url': WHATSAPP_SERVICE_URL,
+        'whatsapp_service_url': WHATSAPP_SERVICE_ADDRESS,
         'node_installed': shutil.which('node') is not None,
         'node_version': None,
         'whatsapp_dir_exists': os.path.exists('/app/whatsapp-service'),
@@ -445,7 +576,8 @@ async def debug_whatsapp_service():
         'can_start_process': False,
         'error': None,
         'recovery_attempts': whatsapp_recovery_attempts,
-        'auto_recovery_enabled': True
+        'auto_recovery_enabled': True,
+        'circuit_breaker': bridge_breaker_snapshot()
     }
     
     # Check node version
@@ -464,7 +596,7 @@ async def debug_whatsapp_service():
     
     # Try to call the service
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with whatsapp_http_client(5.0) as client:
             response = await client.get(f"{WHATSAPP_SERVICE_URL}/health")
             result['service_responding'] = response.status_code == 200
             if response.status_code == 200:
@@ -551,18 +683,159 @@ async def check_mercadopago_payment(access_token: str, payment_id: str):
         logger.error(f"Erro ao verificar pagamento: {e}")
         return None
 
+# ============= WhatsApp Bridge Circuit Breaker =============
+
+# closed: chamadas normais | open: falha imediata, sem esperar timeout |
+# half_open: após BRIDGE_BREAKER_OPEN_SECONDS uma chamada de teste decide se fecha ou reabre.
+# Só falhas de transporte (conexão/timeout) contam - erros de negócio do bridge não.
+BRIDGE_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BRIDGE_BREAKER_FAILURE_THRESHOLD', '5'))
+BRIDGE_BREAKER_OPEN_SECONDS = float(os.environ.get('BRIDGE_BREAKER_OPEN_SECONDS', '30'))
+BRIDGE_HEALTH_TTL = float(os.environ.get('BRIDGE_HEALTH_TTL', '5'))
+# Quanto tempo uma campanha espera o circuito fechar antes de parar (mantendo o progresso)
+BRIDGE_CAMPAIGN_MAX_WAIT = float(os.environ.get('BRIDGE_CAMPAIGN_MAX_WAIT', '600'))
+
+bridge_breaker = {
+    'state': 'closed',
+    'failures': 0,
+    'opened_at': None,  # time.monotonic()
+    'probe_in_flight': False,
+    'last_error': None,
+    'open_count': 0
+}
+bridge_health_cache = {'healthy': None, 'checked_at': None, 'data': None}
+bridge_health_lock = asyncio.Lock()
+
+class BridgeUnavailableError(Exception):
+    """Circuito aberto: a chamada ao WhatsApp service não foi feita"""
+
+def bridge_retry_after() -> float:
+    """0 se uma chamada pode ser feita agora; senão, segundos até a próxima tentativa"""
+    if bridge_breaker['state'] == 'closed':
+        return 0.0
+    if bridge_breaker['probe_in_flight']:
+        return 1.0
+    if bridge_breaker['state'] == 'open':
+        return max(0.0, bridge_breaker['opened_at'] + BRIDGE_BREAKER_OPEN_SECONDS - time.monotonic())
+    return 0.0
+
+def bridge_breaker_acquire():
+    """Libera a chamada ou levanta BridgeUnavailableError (aberto ou teste em andamento)"""
+    retry_after = bridge_retry_after()
+    if retry_after > 0:
+        raise BridgeUnavailableError(f"WhatsApp service indisponível (nova tentativa em {retry_after:.0f}s)")
+    if bridge_breaker['state'] != 'closed':
+        # Janela do open expirou: esta chamada é o teste do half-open
+        bridge_breaker['state'] = 'half_open'
+        bridge_breaker['probe_in_flight'] = True
+
+def set_bridge_health(healthy: bool, data: dict = None):
+    bridge_health_cache['healthy'] = healthy
+    bridge_health_cache['checked_at'] = time.monotonic()
+    if data is not None:
+        bridge_health_cache['data'] = data
+
+def record_bridge_success():
+    if bridge_breaker['state'] != 'closed':
+        logger.info("[CIRCUIT] WhatsApp service respondeu - circuito fechado")
+    bridge_breaker.update({'state': 'closed', 'failures': 0, 'opened_at': None, 'probe_in_flight': False})
+    set_bridge_health(True)
+
+def record_bridge_failure(error: str):
+    bridge_breaker['failures'] += 1
+    bridge_breaker['last_error'] = error
+    bridge_breaker['probe_in_flight'] = False
+    if bridge_breaker['state'] == 'half_open' or bridge_breaker['failures'] >= BRIDGE_BREAKER_FAILURE_THRESHOLD:
+        if bridge_breaker['state'] != 'open':
+            bridge_breaker['open_count'] += 1
+            logger.warning(f"[CIRCUIT] Circuito aberto por {BRIDGE_BREAKER_OPEN_SECONDS:.0f}s após {bridge_breaker['failures']} falha(s): {error}")
+        bridge_breaker['state'] = 'open'
+        bridge_breaker['opened_at'] = time.monotonic()
+    set_bridge_health(False)
+
+def bridge_breaker_snapshot() -> dict:
+    checked_at = bridge_health_cache['checked_at']
+    return {
+        'state': bridge_breaker['state'],
+        'failures': bridge_breaker['failures'],
+        'retry_after': round(bridge_retry_after(), 1),
+        'last_error': bridge_breaker['last_error'],
+        'open_count': bridge_breaker['open_count'],
+        'health_cached': bridge_health_cache['healthy'],
+        'health_age': round(time.monotonic() - checked_at, 1) if checked_at else None
+    }
+
+async def probe_bridge_health() -> Optional[bool]:
+    """GET /health real (sem cache), valendo como teste do half-open.
+    None = o circuito não liberou a chamada (nada foi testado)"""
+    try:
+        bridge_breaker_acquire()
+    except BridgeUnavailableError:
+        return None
+    
+    try:
+        async with whatsapp_http_client(3.0) as http_client:
+            response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
+        if response.status_code == 200:
+            record_bridge_success()
+            set_bridge_health(True, response.json())
+            note_bridge_boot(bridge_health_cache['data'])
+            return True
+        record_bridge_failure(f"/health retornou {response.status_code}")
+    except asyncio.CancelledError:
+        # Teste cancelado não decide nada, mas não pode segurar o half-open
+        bridge_breaker['probe_in_flight'] = False
+        raise
+    except Exception as e:
+        record_bridge_failure(str(e) or type(e).__name__)
+    return False
+
+async def get_bridge_health(force: bool = False) -> bool:
+    """Saúde do WhatsApp service com cache curto (BRIDGE_HEALTH_TTL) compartilhado com o circuito"""
+    async with bridge_health_lock:
+        checked_at = bridge_health_cache['checked_at']
+        if not force and checked_at and time.monotonic() - checked_at < BRIDGE_HEALTH_TTL:
+            return bridge_health_cache['healthy']
+        return bool(await probe_bridge_health())
+
+async def bridge_breaker_admit():
+    """Libera uma chamada ao bridge. Com o circuito aberto o teste do half-open é sempre o
+    /health curto - uma chamada longa (ex: /send-batch) seguraria o teste por minutos"""
+    if bridge_breaker['state'] != 'closed':
+        await get_bridge_health()
+    if bridge_breaker['state'] != 'closed':
+        raise BridgeUnavailableError(f"WhatsApp service indisponível (nova tentativa em {bridge_retry_after():.0f}s)")
+
+def bridge_wait_deadline() -> float:
+    """Prazo (loop.time()) para o bridge voltar - calculado uma vez por grupo/bloco, não a cada tentativa"""
+    return asyncio.get_running_loop().time() + BRIDGE_CAMPAIGN_MAX_WAIT
+
+def check_bridge_wait_deadline(deadline: float):
+    """Prazo vencido: BridgeUnavailableError para a campanha (o índice atual fica salvo)"""
+    if asyncio.get_running_loop().time() >= deadline:
+        raise BridgeUnavailableError(f"WhatsApp service indisponível há mais de {BRIDGE_CAMPAIGN_MAX_WAIT:.0f}s")
+
+async def wait_for_bridge_circuit(deadline: float):
+    """Segura o envio enquanto o circuito está aberto (backoff) em vez de gastar grupos com falhas.
+    O prazo vem de fora: cada janela aberta + teste falho não pode reiniciar a espera"""
+    loop = asyncio.get_running_loop()
+    while (retry_after := bridge_retry_after()) > 0:
+        check_bridge_wait_deadline(deadline)
+        await asyncio.sleep(min(retry_after, deadline - loop.time()))
+
 async def whatsapp_request(method: str, endpoint: str, json_data: dict = None, timeout: float = 30.0, auto_recover: bool = True):
     """Make request to WhatsApp service with configurable timeout and auto-recovery"""
     max_attempts = 2 if auto_recover else 1
     last_error = None
     
     for attempt in range(max_attempts):
+        # Circuito aberto: falha imediata em vez de esperar o timeout
+        await bridge_breaker_admit()
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
+            async with whatsapp_http_client(timeout) as client:
                 url = f"{WHATSAPP_SERVICE_URL}{endpoint}"
-                logger.info(f"[DEBUG] WhatsApp request: {method} {url} (timeout={timeout}s, attempt={attempt+1})")
-                if json_data:
-                    logger.info(f"[DEBUG] Request data: {json_data}")
+                log_event(bridge_logger, logging.DEBUG, 'bridge_request', method=method, endpoint=endpoint,
+                          timeout=timeout, attempt=attempt + 1, body=json_data)
+                started = time.monotonic()
                 
                 if method == "GET":
                     response = await client.get(url)
@@ -571,42 +844,357 @@ async def whatsapp_request(method: str, endpoint: str, json_data: dict = None, t
                 elif method == "DELETE":
                     response = await client.delete(url)
                 
-                logger.info(f"[DEBUG] WhatsApp response status: {response.status_code}")
-                logger.info(f"[DEBUG] WhatsApp response body: {response.text[:500] if response.text else 'empty'}")
-                return response.json()
+                data = response.json()
+                log_event(bridge_logger, logging.DEBUG, 'bridge_response', method=method, endpoint=endpoint,
+                          status=response.status_code, elapsed_ms=round((time.monotonic() - started) * 1000),
+                          size=len(response.content), body=data)
+                record_bridge_success()
+                return data
                 
         except httpx.ConnectError as e:
-            logger.error(f"[DEBUG] WhatsApp service connection error: {e} - URL: {WHATSAPP_SERVICE_URL}")
+            log_event(bridge_logger, logging.ERROR, 'bridge_connect_error', sample_key='bridge_connect_error',
+                      error=str(e), url=WHATSAPP_SERVICE_ADDRESS)
             last_error = f"Serviço WhatsApp não acessível"
+            record_bridge_failure(last_error)
             
-            # Tenta auto-recovery na primeira falha
-            if attempt == 0 and auto_recover:
+            # Tenta auto-recovery na primeira falha (não com o circuito aberto)
+            if attempt == 0 and auto_recover and bridge_breaker['state'] == 'closed':
                 logger.info("[AUTO-RECOVERY] Tentando recuperar WhatsApp service...")
                 recovered = await auto_recover_whatsapp_service()
                 if recovered:
                     logger.info("[AUTO-RECOVERY] Serviço recuperado, tentando novamente...")
                     continue
                     
-        except httpx.ReadTimeout as e:
-            logger.error(f"[DEBUG] WhatsApp service read timeout: {e}")
+        except httpx.ReadTimeout:
+            log_event(bridge_logger, logging.ERROR, 'bridge_read_timeout', sample_key=f'bridge_read_timeout:{method}',
+                      endpoint=endpoint, timeout=timeout)
             last_error = f"WhatsApp service demorou demais para responder (timeout={timeout}s)"
+            record_bridge_failure(last_error)
             
-        except httpx.TimeoutException as e:
-            logger.error(f"[DEBUG] WhatsApp service timeout: {e}")
+        except httpx.TimeoutException:
+            log_event(bridge_logger, logging.ERROR, 'bridge_timeout', sample_key=f'bridge_timeout:{method}',
+                      endpoint=endpoint, timeout=timeout)
             last_error = f"Timeout ao comunicar com WhatsApp service"
+            record_bridge_failure(last_error)
             
             # Tenta auto-recovery
-            if attempt == 0 and auto_recover:
+            if attempt == 0 and auto_recover and bridge_breaker['state'] == 'closed':
                 logger.info("[AUTO-RECOVERY] Timeout detectado, tentando recuperar...")
                 await auto_recover_whatsapp_service()
                 continue
                 
         except Exception as e:
-            logger.error(f"[DEBUG] WhatsApp request error: {type(e).__name__}: {e}")
+            log_event(bridge_logger, logging.ERROR, 'bridge_error', sample_key=f'bridge_error:{type(e).__name__}',
+                      endpoint=endpoint, error=f'{type(e).__name__}: {e}')
             last_error = str(e)
+            if isinstance(e, httpx.TransportError):
+                record_bridge_failure(last_error)
     
     raise Exception(last_error or "Erro desconhecido ao comunicar com WhatsApp service")
 
+# ============= Bridge Session Restore =============
+
+# O WhatsApp service mantém as sessões só em memória: após um restart (bootId novo em
+# /health) o backend restaura, com concorrência limitada, todas as conexões que deveriam
+# estar ativas. O bootId é verificado a cada BRIDGE_BOOT_CHECK_INTERVAL segundos.
+BRIDGE_RESTORE_CONCURRENCY = int(os.environ.get('BRIDGE_RESTORE_CONCURRENCY', '5'))
+BRIDGE_BOOT_CHECK_INTERVAL = int(os.environ.get('BRIDGE_BOOT_CHECK_INTERVAL', '30'))
+BRIDGE_RESTORE_STATUSES = ['connected', 'reconnecting']
+
+bridge_restore_state = {
+    'boot_id': None,
+    'status': 'idle',  # idle, running, done, failed, cancelled
+    'trigger': None,   # startup, restart, manual
+    'started_at': None,
+    'finished_at': None,
+    'total': 0,
+    'restored': 0,
+    'skipped': 0,
+    'failed': 0,
+    'error': None,
+    'connections': {}
+}
+bridge_restore_runner = {'task': None, 'pending': None}
+
+def note_bridge_boot(health: dict):
+    """A cada /health ok: bootId diferente do último visto dispara a restauração"""
+    boot_id = (health or {}).get('bootId')
+    if not boot_id or boot_id == bridge_restore_state['boot_id']:
+        return
+    previous = bridge_restore_state['boot_id']
+    bridge_restore_state['boot_id'] = boot_id
+    if previous:
+        logger.warning(f"[RESTORE] WhatsApp service reiniciou (boot {previous} -> {boot_id}), restaurando sessões")
+    request_bridge_restore('restart' if previous else 'startup')
+
+def request_bridge_restore(trigger: str):
+    """Inicia a restauração; com uma em andamento, agenda outra rodada ao final dela"""
+    task = bridge_restore_runner['task']
+    if task and not task.done():
+        bridge_restore_runner['pending'] = trigger
+        return task
+    bridge_restore_runner['task'] = spawn_background_task(run_bridge_restore(trigger))
+    return bridge_restore_runner['task']
+
+async def run_bridge_restore(trigger: str):
+    while trigger:
+        bridge_restore_runner['pending'] = None
+        await restore_bridge_sessions(trigger)
+        trigger = bridge_restore_runner['pending']
+
+async def restore_bridge_session(connection_id: str, semaphore: asyncio.Semaphore):
+    state = bridge_restore_state
+    entry = state['connections'][connection_id]
+    async with semaphore:
+        entry['status'] = 'running'
+        try:
+            result = await whatsapp_request("POST", f"/connections/{connection_id}/restore", timeout=60.0, auto_recover=False)
+            if result.get('skipped'):
+                entry['status'] = 'skipped'
+                state['skipped'] += 1
+            elif result.get('success'):
+                entry['status'] = 'restored'
+                state['restored'] += 1
+            else:
+                entry['status'] = 'failed'
+                entry['error'] = result.get('error') or result.get('status')
+                state['failed'] += 1
+                if result.get('status') == 'no_session':
+                    # Sem credenciais salvas não há como voltar sem novo QR
+                    await db.connections.update_one(
+                        {'id': connection_id, 'status': {'$in': BRIDGE_RESTORE_STATUSES}},
+                        {'$set': {'status': 'disconnected'}}
+                    )
+            entry['bridge_status'] = result.get('status')
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = str(e)
+            state['failed'] += 1
+            logger.error(f"[RESTORE] Erro ao restaurar conexão {connection_id}: {e}")
+
+async def restore_bridge_sessions(trigger: str):
+    """Reabre no WhatsApp service as sessões de todas as conexões que deveriam estar ativas"""
+    state = bridge_restore_state
+    state.update({
+        'status': 'running',
+        'trigger': trigger,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'finished_at': None,
+        'total': 0,
+        'restored': 0,
+        'skipped': 0,
+        'failed': 0,
+        'error': None,
+        'connections': {}
+    })
+    try:
+        connections = await db.connections.find(
+            {'status': {'$in': BRIDGE_RESTORE_STATUSES}},
+            {'_id': 0, 'id': 1, 'name': 1}
+        ).to_list(None)
+        state['total'] = len(connections)
+        for connection in connections:
+            state['connections'][connection['id']] = {'name': connection.get('name'), 'status': 'queued', 'error': None}
+        
+        semaphore = asyncio.Semaphore(BRIDGE_RESTORE_CONCURRENCY)
+        await asyncio.gather(*(restore_bridge_session(connection['id'], semaphore) for connection in connections))
+        state['status'] = 'done'
+        logger.info(f"[RESTORE] {state['restored']} restaurada(s), {state['skipped']} já ativa(s), {state['failed']} falha(s) de {state['total']}")
+    except asyncio.CancelledError:
+        state['status'] = 'cancelled'
+        raise
+    except Exception as e:
+        state['status'] = 'failed'
+        state['error'] = str(e)
+        logger.error(f"[RESTORE] Erro na restauração de sessões: {e}")
+    finally:
+        state['finished_at'] = datetime.now(timezone.utc).isoformat()
+
+async def start_bridge_session_restore():
+    """Fase de startup: restaura as sessões (antes da retomada das campanhas), passa a vigiar
+    o bootId e liga o reconciliador de status"""
+    scheduler.add_job(
+        get_bridge_health,
+        IntervalTrigger(seconds=BRIDGE_BOOT_CHECK_INTERVAL),
+        id='bridge_boot_watch',
+        replace_existing=True
+    )
+    await get_bridge_health(force=True)
+    task = bridge_restore_runner['task']
+    if task:
+        await asyncio.shield(task)
+    start_connection_reconciler()
+
+@api_router.get("/admin/bridge-restore")
+async def get_bridge_restore_state(admin: dict = Depends(get_admin_user)):
+    """Progresso da última restauração de sessões no WhatsApp service"""
+    return {**bridge_restore_state, 'concurrency': BRIDGE_RESTORE_CONCURRENCY, 'pending': bridge_restore_runner['pending']}
+
+@api_router.post("/admin/bridge-restore/run")
+async def run_bridge_restore_now(admin: dict = Depends(get_admin_user)):
+    """Dispara a restauração manualmente (conexões já ativas no serviço são puladas)"""
+    request_bridge_restore('manual')
+    return {'message': 'Restauração de sessões iniciada', 'status': bridge_restore_state['status']}
+
+# ============= Connection Status Reconciler =============
+
+# Compara periodicamente o estado real das conexões no WhatsApp service (GET /connections,
+# uma chamada) com db.connections e corrige a diferença em um bulk_write.
+# CONNECTION_RECONCILE_INTERVAL=0 desliga; o jitter espalha as execuções entre processos.
+CONNECTION_RECONCILE_INTERVAL = int(os.environ.get('CONNECTION_RECONCILE_INTERVAL', '120'))
+CONNECTION_RECONCILE_JITTER = int(os.environ.get('CONNECTION_RECONCILE_JITTER', '15'))
+# Status que exigem a sessão viva no serviço (ausente lá = desconectada)
+CONNECTION_LIVE_STATUSES = ['connected', 'reconnecting', 'connecting', 'waiting_qr']
+RECONCILE_RECENT_CORRECTIONS = 20
+
+connection_reconcile_state = {
+    'runs': 0,
+    'skipped_runs': 0,
+    'last_run_at': None,
+    'last_duration_ms': None,
+    'last_error': None,
+    'last_drift': {},
+    'total_drift': {'status': 0, 'phone_number': 0, 'missing_in_bridge': 0},
+    'recent_corrections': []
+}
+connection_reconcile_lock = asyncio.Lock()
+
+def bridge_restore_settled() -> bool:
+    """Sessões ausentes só contam como drift depois da restauração do boot atual"""
+    current_boot = (bridge_health_cache.get('data') or {}).get('bootId')
+    task = bridge_restore_runner['task']
+    return (
+        current_boot is not None
+        and bridge_restore_state['boot_id'] == current_boot
+        and bridge_restore_state['status'] in ('done', 'failed')
+        and not (task and not task.done())
+    )
+
+def diff_connection_status(db_connection: dict, bridge_connection: Optional[dict], restore_settled: bool) -> dict:
+    """Campos a corrigir em uma conexão ({} = sem drift)"""
+    if bridge_connection is None:
+        if restore_settled and db_connection.get('status') in CONNECTION_LIVE_STATUSES:
+            return {'status': 'disconnected'}
+        return {}
+    
+    bridge_status = bridge_connection.get('status')
+    if not bridge_status or bridge_status == 'deleted':
+        return {}
+    
+    changes = {}
+    if bridge_status != db_connection.get('status'):
+        changes['status'] = bridge_status
+    phone_number = bridge_connection.get('phoneNumber')
+    if bridge_status == 'connected' and phone_number and phone_number != db_connection.get('phone_number'):
+        changes['phone_number'] = phone_number
+    return changes
+
+async def reconcile_connection_statuses():
+    """Uma rodada do reconciliador (ignorada se outra ainda está em andamento)"""
+    if connection_reconcile_lock.locked():
+        return
+    async with connection_reconcile_lock:
+        state = connection_reconcile_state
+        started = time.monotonic()
+        try:
+            # Serviço fora do ar: não dá para distinguir drift de indisponibilidade
+            if not await get_bridge_health():
+                state['skipped_runs'] += 1
+                return
+            bridge_connections = await whatsapp_request("GET", "/connections", timeout=10.0, auto_recover=False)
+            bridge_map = {connection['id']: connection for connection in bridge_connections}
+            restore_settled = bridge_restore_settled()
+            
+            db_connections = await db.connections.find(
+                {}, {'_id': 0, 'id': 1, 'user_id': 1, 'status': 1, 'phone_number': 1}
+            ).to_list(None)
+            
+            candidates = []
+            for db_connection in db_connections:
+                bridge_connection = bridge_map.get(db_connection['id'])
+                changes = diff_connection_status(db_connection, bridge_connection, restore_settled)
+                if changes:
+                    candidates.append((db_connection, bridge_connection, changes))
+            
+            # Um bulk_write condicional ao status lido: mudança concorrente (webhook/usuário) vence.
+            # Cada correção leva o id da rodada; só as que ficaram com ele são contadas e publicadas
+            now = datetime.now(timezone.utc).isoformat()
+            round_id = str(uuid.uuid4())
+            applied_ids = set()
+            if candidates:
+                await db.connections.bulk_write([
+                    UpdateOne(
+                        {'id': db_connection['id'], 'status': db_connection.get('status')},
+                        {'$set': {**changes, 'status_updated_at': now, 'reconciled_round': round_id}}
+                    )
+                    for db_connection, _, changes in candidates
+                ], ordered=False)
+                applied_ids = {
+                    connection['id'] async for connection in db.connections.find(
+                        {'id': {'$in': [db_connection['id'] for db_connection, _, _ in candidates]}, 'reconciled_round': round_id},
+                        {'_id': 0, 'id': 1}
+                    )
+                }
+            
+            drift = {'status': 0, 'phone_number': 0, 'missing_in_bridge': 0}
+            corrected = 0
+            for db_connection, bridge_connection, changes in candidates:
+                if db_connection['id'] not in applied_ids:
+                    continue
+                corrected += 1
+                for field in changes:
+                    drift[field] += 1
+                if bridge_connection is None:
+                    drift['missing_in_bridge'] += 1
+                publish_connection_event(db_connection['id'], db_connection.get('user_id'), changes)
+                state['recent_corrections'].append({
+                    'connection_id': db_connection['id'],
+                    'from': {field: db_connection.get(field) for field in changes},
+                    'to': changes,
+                    'at': now
+                })
+            
+            if corrected:
+                del state['recent_corrections'][:-RECONCILE_RECENT_CORRECTIONS]
+                logger.info(f"[RECONCILE] {corrected} conexão(ões) corrigida(s): {drift}")
+            
+            for field, count in drift.items():
+                state['total_drift'][field] += count
+            state['last_drift'] = drift
+            state['last_error'] = None
+        except Exception as e:
+            state['last_error'] = str(e)
+            logger.error(f"[RECONCILE] Erro ao reconciliar status das conexões: {e}")
+        finally:
+            state['runs'] += 1
+            state['last_run_at'] = datetime.now(timezone.utc).isoformat()
+            state['last_duration_ms'] = round((time.monotonic() - started) * 1000)
+
+def start_connection_reconciler():
+    if CONNECTION_RECONCILE_INTERVAL <= 0:
+        return
+    scheduler.add_job(
+        reconcile_connection_statuses,
+        IntervalTrigger(seconds=CONNECTION_RECONCILE_INTERVAL, jitter=CONNECTION_RECONCILE_JITTER),
+        id='connection_reconcile',
+        replace_existing=True
+    )
+
+@api_router.get("/admin/connection-reconciler")
+async def get_connection_reconciler_state(admin: dict = Depends(get_admin_user)):
+    """Métricas do reconciliador: drift corrigido na última rodada e acumulado"""
+    return {
+        'enabled': CONNECTION_RECONCILE_INTERVAL > 0,
+        'interval_seconds': CONNECTION_RECONCILE_INTERVAL,
+        'jitter_seconds': CONNECTION_RECONCILE_JITTER,
+        **connection_reconcile_state
+    }
+
+@api_router.post("/admin/connection-reconciler/run")
+async def run_connection_reconciler_now(admin: dict = Depends(get_admin_user)):
+    await reconcile_connection_statuses()
+    return connection_reconcile_state
+
 # ============= Auth Endpoints =============
 
 @api_router.post("/auth/register")
@@ -863,11 +1451,10 @@ def check_whatsapp_deps_installed() -> bool:
 
 def check_whatsapp_service_running() -> bool:
     """Check if WhatsApp service is responding"""
-    import urllib.request
+    transport = httpx.HTTPTransport(uds=WHATSAPP_SERVICE_SOCKET) if WHATSAPP_SERVICE_SOCKET else None
     try:
-        req = urllib.request.Request(f'{WHATSAPP_SERVICE_URL}/health', method='GET')
-        with urllib.request.urlopen(req, timeout=5) as response:
-            return response.status == 200
+        with httpx.Client(timeout=5, transport=transport) as http_client:
+            return http_client.get(f'{WHATSAPP_SERVICE_URL}/health').status_code == 200
     except:
         return False
 
@@ -1042,46 +1629,65 @@ async def install_whatsapp_deps(admin: dict = Depends(get_admin_user)):
         logs.append(f"❌ Erro: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Limites do terminal com streaming
+TERMINAL_TIMEOUT = 30  # segundos (modo buffered)
+TERMINAL_STREAM_TIMEOUT = int(os.environ.get('TERMINAL_STREAM_TIMEOUT', '1800'))  # 30 minutos
+TERMINAL_STREAM_MAX_OUTPUT = int(os.environ.get('TERMINAL_STREAM_MAX_OUTPUT', str(5 * 1024 * 1024)))  # 5 MB
+TERMINAL_STREAM_CHUNK_SIZE = 4096
+TERMINAL_STREAM_QUEUE_SIZE = 64  # chunks em memória antes de aplicar backpressure no processo
+TERMINAL_STREAM_DRAIN_TIMEOUT = 5  # segundos para esvaziar os pipes após matar o processo
+
+def kill_process_group(process):
+    """Mata o processo e todos os filhos (comandos shell criam sub-processos)"""
+    import signal
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
 @api_router.post("/admin/terminal/execute")
 async def execute_terminal_command(
     command: dict,
     admin: dict = Depends(get_admin_user)
 ):
     """Execute a terminal command with full permissions"""
-    import subprocess
-    import shlex
-    
     cmd = command.get('command', '').strip()
     if not cmd:
         raise HTTPException(status_code=400, detail="Comando vazio")
     
+    process = None
     try:
-        # Execute command with shell=True for full functionality
-        process = subprocess.Popen(
+        # Subprocesso assíncrono - não bloqueia o event loop enquanto o comando roda
+        process = await asyncio.create_subprocess_shell(
             cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd='/app'
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd='/app',
+            start_new_session=True
         )
         
         # Wait for completion with timeout
-        stdout, stderr = process.communicate(timeout=30)
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=TERMINAL_TIMEOUT)
         
         return {
             'success': process.returncode == 0,
-            'output': stdout,
-            'error': stderr,
+            'output': stdout.decode('utf-8', errors='replace'),
+            'error': stderr.decode('utf-8', errors='replace'),
             'exit_code': process.returncode
         }
         
-    except subprocess.TimeoutExpired:
-        process.kill()
+    except asyncio.TimeoutError:
+        kill_process_group(process)
+        await process.wait()
         return {
             'success': False,
             'output': '',
-            'error': 'Comando excedeu o tempo limite de 30 segundos',
+            'error': f'Comando excedeu o tempo limite de {TERMINAL_TIMEOUT} segundos. Use o terminal com streaming para comandos longos.',
             'exit_code': -1
         }
     except Exception as e:
@@ -1092,6 +1698,152 @@ async def execute_terminal_command(
             'exit_code': -1
         }
 
+async def _pump_process_stream(stream, name: str, queue: asyncio.Queue):
+    """Lê um pipe do processo em chunks e envia para a fila.
+    
+    Quando a fila está cheia o put() aguarda, o pipe para de ser lido e o
+    próprio processo bloqueia na escrita - backpressure até o cliente.
+    """
+    import codecs
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        chunk = await stream.read(TERMINAL_STREAM_CHUNK_SIZE)
+        if not chunk:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                await queue.put((name, tail))
+            break
+        text = decoder.decode(chunk)
+        if text:
+            await queue.put((name, text))
+    await queue.put((name, None))
+
+async def _stop_process_pumps(process, pumps) -> Optional[int]:
+    """Cancela os pumps, esvazia os pipes até EOF e aguarda o processo.
+    
+    Com a fila cheia os pumps ficam presos em queue.put(), o StreamReader pausa
+    a leitura e o pipe nunca chega ao EOF - process.wait() não retornaria.
+    """
+    for pump in pumps:
+        pump.cancel()
+    await asyncio.gather(*pumps, return_exceptions=True)
+    
+    async def drain(stream):
+        while await stream.read(TERMINAL_STREAM_CHUNK_SIZE * 16):
+            pass
+    
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(drain(process.stdout), drain(process.stderr)),
+            timeout=TERMINAL_STREAM_DRAIN_TIMEOUT
+        )
+    except Exception:
+        # Algum neto fora do grupo ainda segura o pipe - segue com o returncode do processo
+        pass
+    try:
+        return await asyncio.wait_for(process.wait(), timeout=TERMINAL_STREAM_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        return process.returncode
+
+async def stream_terminal_output(cmd: str):
+    """Executa o comando e gera eventos SSE com stdout/stderr conforme são produzidos"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    
+    try:
+        process = await asyncio.create_subprocess_shell(
+            cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd='/app',
+            start_new_session=True
+        )
+    except Exception as e:
+        yield sse_event('exit', {'exit_code': -1, 'success': False, 'error': str(e)})
+        return
+    
+    queue = asyncio.Queue(maxsize=TERMINAL_STREAM_QUEUE_SIZE)
+    pumps = [
+        asyncio.create_task(_pump_process_stream(process.stdout, 'stdout', queue)),
+        asyncio.create_task(_pump_process_stream(process.stderr, 'stderr', queue)),
+    ]
+    
+    open_streams = len(pumps)
+    total_bytes = 0
+    stop_reason = None
+    
+    try:
+        yield sse_event('start', {'pid': process.pid, 'command': cmd})
+        
+        while open_streams:
+            remaining = TERMINAL_STREAM_TIMEOUT - (loop.time() - started)
+            if remaining <= 0:
+                stop_reason = 'timeout'
+                break
+            
+            try:
+                name, text = await asyncio.wait_for(queue.get(), timeout=min(remaining, SSE_KEEPALIVE_SECONDS))
+            except asyncio.TimeoutError:
+                yield sse_keepalive()
+                continue
+            
+            if text is None:
+                open_streams -= 1
+                continue
+            
+            size = len(text.encode('utf-8'))
+            if total_bytes + size > TERMINAL_STREAM_MAX_OUTPUT:
+                allowed = TERMINAL_STREAM_MAX_OUTPUT - total_bytes
+                if allowed > 0:
+                    yield sse_event(name, {'data': text.encode('utf-8')[:allowed].decode('utf-8', errors='ignore')})
+                total_bytes = TERMINAL_STREAM_MAX_OUTPUT
+                stop_reason = 'output_limit'
+                break
+            
+            total_bytes += size
+            yield sse_event(name, {'data': text})
+        
+        if stop_reason:
+            kill_process_group(process)
+            exit_code = await _stop_process_pumps(process, pumps)
+        else:
+            exit_code = await process.wait()
+        
+        error = None
+        if stop_reason == 'timeout':
+            error = f'Comando excedeu o tempo limite de {TERMINAL_STREAM_TIMEOUT} segundos'
+        elif stop_reason == 'output_limit':
+            error = f'Saída excedeu o limite de {TERMINAL_STREAM_MAX_OUTPUT} bytes - processo encerrado'
+        
+        yield sse_event('exit', {
+            'exit_code': exit_code,
+            'success': exit_code == 0 and stop_reason is None,
+            'error': error,
+            'output_bytes': total_bytes,
+            'duration': round(loop.time() - started, 2)
+        })
+    finally:
+        # Cliente desconectou ou stream terminou - nunca deixar processo órfão
+        kill_process_group(process)
+        if process.returncode is None or not all(pump.done() for pump in pumps):
+            try:
+                await _stop_process_pumps(process, pumps)
+            except Exception:
+                pass
+
+@api_router.post("/admin/terminal/stream")
+async def stream_terminal_command(
+    command: dict,
+    admin: dict = Depends(get_admin_user)
+):
+    """Executa comando com saída em tempo real via SSE (eventos: start, stdout, stderr, exit)"""
+    cmd = command.get('command', '').strip()
+    if not cmd:
+        raise HTTPException(status_code=400, detail="Comando vazio")
+    
+    logger.info(f"[TERMINAL] {admin['username']} executando (stream): {cmd}")
+    return sse_response(stream_terminal_output(cmd))
+
 @api_router.post("/admin/dependencies/start-whatsapp")
 async def start_whatsapp_service(admin: dict = Depends(get_admin_user)):
     """Start WhatsApp service"""
@@ -1295,86 +2047,250 @@ async def full_setup(admin: dict = Depends(get_admin_user)):
 
 # ============= System Logs (Admin Only) =============
 
-@api_router.get("/admin/logs/{service}")
-async def get_service_logs(service: str, lines: int = 100, admin: dict = Depends(get_admin_user)):
-    """Get service logs - Admin only"""
-    import subprocess
-    
-    log_files = {
-        'backend': '/var/log/supervisor/backend.err.log',
-        'backend_out': '/var/log/supervisor/backend.out.log',
-        'whatsapp': '/var/log/supervisor/whatsapp.err.log',
-        'whatsapp_out': '/var/log/supervisor/whatsapp.out.log',
-        'frontend': '/var/log/supervisor/frontend.err.log',
-    }
+# Diretório dos logs do supervisor (pode ser diferente em docker/VPS)
+SUPERVISOR_LOG_DIR = os.environ.get('SUPERVISOR_LOG_DIR', '/var/log/supervisor')
+
+LOG_FILES = {
+    'backend': 'backend.err.log',
+    'backend_out': 'backend.out.log',
+    'whatsapp': 'whatsapp.err.log',
+    'whatsapp_out': 'whatsapp.out.log',
+    'frontend': 'frontend.err.log',
+}
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'WARN': 30, 'ERROR': 40, 'CRITICAL': 50}
+LOG_TAIL_BLOCK_SIZE = 8192
+LOG_TAIL_MAX_SCAN = 8 * 1024 * 1024  # Máximo lido de trás pra frente procurando linhas filtradas
+LOG_FOLLOW_POLL_INTERVAL = 1.0  # segundos (fallback sem inotify)
+LOG_FOLLOW_MAX_READ = 256 * 1024  # bytes por leitura ao seguir o arquivo
+
+LOG_LEVEL_PATTERN = re.compile(r'\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL)\b')
+
+def get_log_file_path(service: str) -> str:
+    if service not in LOG_FILES:
+        raise HTTPException(status_code=400, detail=f"Serviço inválido. Use: {', '.join(LOG_FILES.keys())}")
+    return os.path.join(SUPERVISOR_LOG_DIR, LOG_FILES[service])
+
+def parse_log_level(level: Optional[str]) -> Optional[int]:
+    if not level or level == 'all':
+        return None
+    if level.upper() not in LOG_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Nível inválido. Use: {', '.join(LOG_LEVELS.keys())}")
+    return LOG_LEVELS[level.upper()]
+
+class LogLineFilter:
+    """Filtro de linhas por nível mínimo e substring.
     
-    if service not in log_files:
-        raise HTTPException(status_code=400, detail=f"Serviço inválido. Use: {', '.join(log_files.keys())}")
+    Linhas sem nível (ex: traceback) herdam o nível da última linha com nível,
+    então um ERROR continua vindo junto com o stack trace.
+    """
+    def __init__(self, min_level: Optional[int] = None, search: Optional[str] = None):
+        self.min_level = min_level
+        self.search = search.lower() if search else None
+        self.current_level = None
+    
+    def matches(self, line: str) -> bool:
+        if self.min_level is not None:
+            found = LOG_LEVEL_PATTERN.search(line)
+            if found:
+                self.current_level = LOG_LEVELS[found.group(1)]
+            if self.current_level is None or self.current_level < self.min_level:
+                return False
+        if self.search and self.search not in line.lower():
+            return False
+        return True
     
-    log_file = log_files[service]
+    def filter(self, lines: list) -> list:
+        return [line for line in lines if self.matches(line)]
+
+def read_log_tail(path: str, lines: int, min_level: Optional[int] = None, search: Optional[str] = None) -> list:
+    """Lê as últimas N linhas (já filtradas) buscando blocos do fim para o início do arquivo"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        block_size = LOG_TAIL_BLOCK_SIZE
+        data = b''
+        
+        while True:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            data = f.read(read_size) + data
+            
+            text_lines = data.decode('utf-8', errors='replace').splitlines()
+            if pos > 0 and text_lines:
+                text_lines = text_lines[1:]  # Primeira linha pode estar cortada
+            
+            if min_level is None and not search:
+                matched = text_lines
+            else:
+                matched = LogLineFilter(min_level, search).filter(text_lines)
+            
+            if len(matched) >= lines or pos == 0 or (end - pos) >= LOG_TAIL_MAX_SCAN:
+                return matched[-lines:] if lines > 0 else []
+            
+            block_size *= 2
+
+async def tail_log_file(path: str, lines: int, min_level: Optional[int] = None, search: Optional[str] = None) -> Optional[str]:
+    """Tail sem fork de processo; None se o arquivo não existe"""
+    if not os.path.exists(path):
+        return None
+    result = await asyncio.to_thread(read_log_tail, path, lines, min_level, search)
+    return '\n'.join(result)
+
+@api_router.get("/admin/logs/{service}")
+async def get_service_logs(service: str, lines: int = 100, level: str = None, search: str = None, admin: dict = Depends(get_admin_user)):
+    """Get service logs - Admin only. level: nível mínimo (INFO, WARNING, ERROR...), search: substring"""
+    log_file = get_log_file_path(service)
+    min_level = parse_log_level(level)
     
     try:
-        # Read last N lines from log file
-        result = subprocess.run(
-            ['tail', '-n', str(min(lines, 500)), log_file],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
+        content = await tail_log_file(log_file, min(lines, 500), min_level, search)
         
-        log_content = result.stdout or result.stderr or "Arquivo vazio ou não encontrado"
+        if content is None:
+            log_content = f"Arquivo não encontrado: {log_file}"
+        else:
+            log_content = content or "Arquivo vazio ou nenhuma linha corresponde ao filtro"
         
         return {
             'service': service,
             'file': log_file,
+            'exists': content is not None,
             'lines': lines,
+            'level': level,
+            'search': search,
             'content': log_content
         }
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=500, detail="Timeout ao ler logs")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao ler logs: {str(e)}")
 
 @api_router.get("/admin/logs")
-async def get_all_logs(lines: int = 50, admin: dict = Depends(get_admin_user)):
+async def get_all_logs(lines: int = 50, level: str = None, search: str = None, admin: dict = Depends(get_admin_user)):
     """Get all service logs - Admin only"""
-    import subprocess
-    
     services = ['backend', 'whatsapp', 'frontend']
-    logs = {}
+    min_level = parse_log_level(level)
+    lines = min(lines, 200)
     
-    for service in services:
-        err_file = f'/var/log/supervisor/{service}.err.log'
-        out_file = f'/var/log/supervisor/{service}.out.log'
-        
+    async def read_service(service: str) -> dict:
+        err_file = os.path.join(SUPERVISOR_LOG_DIR, f'{service}.err.log')
+        out_file = os.path.join(SUPERVISOR_LOG_DIR, f'{service}.out.log')
         try:
-            # Error logs
-            result_err = subprocess.run(
-                ['tail', '-n', str(min(lines, 200)), err_file],
-                capture_output=True,
-                text=True,
-                timeout=5
+            err_content, out_content = await asyncio.gather(
+                tail_log_file(err_file, lines, min_level, search),
+                tail_log_file(out_file, lines, min_level, search)
             )
-            
-            # Output logs
-            result_out = subprocess.run(
-                ['tail', '-n', str(min(lines, 200)), out_file],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            logs[service] = {
-                'error': result_err.stdout or "Sem erros",
-                'output': result_out.stdout or "Sem saída"
+            return {
+                'error': err_content or ("Sem erros" if err_content is not None else f"Arquivo não encontrado: {err_file}"),
+                'output': out_content or ("Sem saída" if out_content is not None else f"Arquivo não encontrado: {out_file}")
             }
         except Exception as e:
-            logs[service] = {
+            return {
                 'error': f"Erro ao ler: {str(e)}",
                 'output': ""
             }
     
-    return logs
+    results = await asyncio.gather(*(read_service(service) for service in services))
+    return dict(zip(services, results))
+
+try:
+    from watchfiles import awatch
+except ImportError:  # Sem inotify - usa polling
+    awatch = None
+
+async def wait_for_log_changes(path: str):
+    """Gera a cada mudança no arquivo (inotify via watchfiles) ou a cada intervalo de polling.
+    
+    Também gera periodicamente sem mudanças, para o chamador enviar keepalive.
+    """
+    directory = os.path.dirname(path)
+    if awatch is not None and os.path.isdir(directory):
+        try:
+            async for _ in awatch(
+                directory,
+                watch_filter=lambda change, changed_path: changed_path == path,
+                rust_timeout=SSE_KEEPALIVE_SECONDS * 1000,
+                yield_on_timeout=True
+            ):
+                yield
+            return
+        except Exception as e:
+            logger.warning(f"[LOGS] inotify indisponível para {path}, usando polling: {e}")
+    
+    while True:
+        await asyncio.sleep(LOG_FOLLOW_POLL_INTERVAL)
+        yield
+
+async def follow_log_file(path: str, backlog: int, min_level: Optional[int], search: Optional[str]):
+    """Gera eventos SSE com as linhas novas do arquivo (tail -f), tratando rotação e truncamento"""
+    line_filter = LogLineFilter(min_level, search)
+    
+    if os.path.exists(path) and backlog > 0:
+        initial = await asyncio.to_thread(read_log_tail, path, backlog, min_level, search)
+        if initial:
+            yield sse_event('lines', {'lines': initial})
+    
+    handle = None
+    inode = None
+    position = 0
+    pending = b''
+    last_event = asyncio.get_running_loop().time()
+    
+    try:
+        if os.path.exists(path):
+            handle = open(path, 'rb')
+            handle.seek(0, os.SEEK_END)
+            position = handle.tell()
+            inode = os.fstat(handle.fileno()).st_ino
+        else:
+            yield sse_event('status', {'message': f'Aguardando arquivo: {path}'})
+        
+        async for _ in wait_for_log_changes(path):
+            # Arquivo criado, rotacionado (inode novo) ou truncado
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            
+            if stat is not None and (handle is None or stat.st_ino != inode or stat.st_size < position):
+                if handle:
+                    handle.close()
+                handle = open(path, 'rb')
+                inode = stat.st_ino
+                position = 0
+                pending = b''
+                yield sse_event('status', {'message': 'Arquivo reaberto (rotação/truncamento)'})
+            
+            new_lines = []
+            if handle is not None:
+                while True:
+                    chunk = handle.read(LOG_FOLLOW_MAX_READ)
+                    if not chunk:
+                        break
+                    position += len(chunk)
+                    pending += chunk
+                    *complete, pending = pending.split(b'\n')
+                    new_lines.extend(line_filter.filter([l.decode('utf-8', errors='replace') for l in complete]))
+                    if len(chunk) < LOG_FOLLOW_MAX_READ:
+                        break
+            
+            now = asyncio.get_running_loop().time()
+            if new_lines:
+                yield sse_event('lines', {'lines': new_lines})
+                last_event = now
+            elif now - last_event >= SSE_KEEPALIVE_SECONDS:
+                yield sse_keepalive()
+                last_event = now
+    finally:
+        if handle:
+            handle.close()
+
+@api_router.get("/admin/logs/{service}/stream")
+async def stream_service_logs(service: str, backlog: int = 50, level: str = None, search: str = None, admin: dict = Depends(get_admin_user)):
+    """Segue o log do serviço em tempo real via SSE (evento 'lines' com as linhas novas)"""
+    log_file = get_log_file_path(service)
+    min_level = parse_log_level(level)
+    return sse_response(follow_log_file(log_file, min(backlog, 500), min_level, search))
 
 @api_router.get("/admin/system-status")
 async def get_system_status(admin: dict = Depends(get_admin_user)):
@@ -1405,7 +2321,7 @@ async def get_system_status(admin: dict = Depends(get_admin_user)):
         # Test WhatsApp service
         whatsapp_ok = False
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with whatsapp_http_client(5.0) as client:
                 response = await client.get(f"{WHATSAPP_SERVICE_URL}/connections/test/status")
                 whatsapp_ok = response.status_code == 200
         except:
@@ -1413,7 +2329,7 @@ async def get_system_status(admin: dict = Depends(get_admin_user)):
         
         return {
             'services': services,
-            'whatsapp_service_url': WHATSAPP_SERVICE_URL,
+            'whatsapp_service_url': WHATSAPP_SERVICE_ADDRESS,
             'whatsapp_service_ok': whatsapp_ok,
             'mongo_url': mongo_url.split('@')[-1] if '@' in mongo_url else mongo_url,  # Hide credentials
             'uploads_dir': str(UPLOADS_DIR),
@@ -1424,8 +2340,137 @@ async def get_system_status(admin: dict = Depends(get_admin_user)):
 
 # ============= Activity Log =============
 
+# Escrita write-behind: log_activity só enfileira; um writer em background grava
+# em lotes (insert_many) por tamanho ou tempo. Sob sobrecarga os registros vão
+# para um arquivo NDJSON (reprocessado no próximo startup) em vez de atrasar a requisição.
+ACTIVITY_LOG_QUEUE_SIZE = int(os.environ.get('ACTIVITY_LOG_QUEUE_SIZE', '10000'))
+ACTIVITY_LOG_FLUSH_BATCH = int(os.environ.get('ACTIVITY_LOG_FLUSH_BATCH', '200'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', '1.0'))
+ACTIVITY_LOG_SPILL_FILE = Path(os.environ.get('ACTIVITY_LOG_SPILL_FILE', str(ROOT_DIR / 'activity_logs_spill.ndjson')))
+ACTIVITY_LOG_DRAIN_TIMEOUT = 10
+
+activity_log_queue = asyncio.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
+activity_log_overflow = []
+activity_log_stop = asyncio.Event()
+activity_log_writer_state = {'task': None, 'written': 0, 'spilled': 0, 'replayed': 0, 'dropped': 0, 'last_error': None}
+
+def append_activity_log_spill(logs: list):
+    with open(ACTIVITY_LOG_SPILL_FILE, 'a', encoding='utf-8') as spill:
+        for log in logs:
+            entry = {key: value for key, value in log.items() if key != '_id'}
+            spill.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+async def spill_activity_logs(logs: list):
+    try:
+        await asyncio.to_thread(append_activity_log_spill, logs)
+        activity_log_writer_state['spilled'] += len(logs)
+    except Exception as e:
+        activity_log_writer_state['dropped'] += len(logs)
+        logger.error(f"[ACTIVITY] Falha ao gravar spill ({len(logs)} registros descartados): {e}")
+
+async def flush_activity_logs(batch: list):
+    try:
+        await db.activity_logs.insert_many(batch, ordered=False)
+        activity_log_writer_state['written'] += len(batch)
+    except asyncio.CancelledError:
+        # Timeout do dreno no shutdown cancelou no meio do insert: o lote vai para o
+        # spill (o replay é upsert por id, então o que já foi gravado não duplica)
+        await spill_activity_logs(batch)
+        raise
+    except Exception as e:
+        # Mongo indisponível: não perde o lote
+        activity_log_writer_state['last_error'] = str(e)
+        logger.error(f"[ACTIVITY] Erro ao gravar lote de {len(batch)}: {e}")
+        await spill_activity_logs(batch)
+
+async def collect_activity_log_batch() -> list:
+    """Junta até ACTIVITY_LOG_FLUSH_BATCH registros ou o que chegar em ACTIVITY_LOG_FLUSH_INTERVAL"""
+    batch = []
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ACTIVITY_LOG_FLUSH_INTERVAL
+    while len(batch) < ACTIVITY_LOG_FLUSH_BATCH:
+        if activity_log_stop.is_set():
+            # Drenando: não espera por novos registros
+            try:
+                batch.append(activity_log_queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                break
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(activity_log_queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+async def replay_activity_log_spill():
+    """Regrava registros que foram para o disco (upsert por id - idempotente)"""
+    replaying = ACTIVITY_LOG_SPILL_FILE.with_name(ACTIVITY_LOG_SPILL_FILE.name + '.replaying')
+    if not await asyncio.to_thread(replaying.exists):
+        if not await asyncio.to_thread(ACTIVITY_LOG_SPILL_FILE.exists):
+            return
+        await asyncio.to_thread(os.replace, ACTIVITY_LOG_SPILL_FILE, replaying)
+    
+    lines = (await asyncio.to_thread(replaying.read_text, encoding='utf-8')).splitlines()
+    operations = []
+    for line in lines:
+        try:
+            log = json.loads(line)
+        except ValueError:
+            continue
+        # logged_at (TTL) só depois da consolidação - ver apply_log_expiry
+        log.pop('logged_at', None)
+        operations.append(UpdateOne({'id': log['id']}, {'$setOnInsert': log}, upsert=True))
+    
+    for i in range(0, len(operations), ACTIVITY_LOG_FLUSH_BATCH):
+        await db.activity_logs.bulk_write(operations[i:i + ACTIVITY_LOG_FLUSH_BATCH], ordered=False)
+    await asyncio.to_thread(replaying.unlink)
+    activity_log_writer_state['replayed'] += len(operations)
+    logger.info(f"[ACTIVITY] {len(operations)} registros do spill regravados")
+
+async def activity_log_writer():
+    try:
+        await replay_activity_log_spill()
+    except Exception as e:
+        logger.error(f"[ACTIVITY] Erro ao reprocessar spill: {e}")
+    
+    while not (activity_log_stop.is_set() and activity_log_queue.empty()):
+        batch = await collect_activity_log_batch()
+        if batch:
+            await flush_activity_logs(batch)
+        if activity_log_overflow:
+            overflow = activity_log_overflow[:]
+            activity_log_overflow.clear()
+            await spill_activity_logs(overflow)
+
+def start_activity_log_writer():
+    activity_log_stop.clear()
+    activity_log_writer_state['task'] = asyncio.create_task(activity_log_writer())
+
+async def stop_activity_log_writer():
+    """Drena a fila no shutdown; o que não couber no timeout vai para o spill"""
+    task = activity_log_writer_state['task']
+    if not task:
+        return
+    activity_log_stop.set()
+    try:
+        await asyncio.wait_for(task, timeout=ACTIVITY_LOG_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("[ACTIVITY] Timeout drenando a fila - restante vai para o spill")
+    
+    remaining = activity_log_overflow[:]
+    activity_log_overflow.clear()
+    while not activity_log_queue.empty():
+        remaining.append(activity_log_queue.get_nowait())
+    if remaining:
+        await spill_activity_logs(remaining)
+    activity_log_writer_state['task'] = None
+
 async def log_activity(user_id: str, username: str, action: str, entity_type: str, entity_id: str = None, entity_name: str = None, details: str = None):
     """Log user activity"""
+    now = datetime.now(timezone.utc)
     log = {
         'id': str(uuid.uuid4()),
         'action': action,
@@ -1435,15 +2480,34 @@ async def log_activity(user_id: str, username: str, action: str, entity_type: st
         'user_id': user_id,
         'username': username,
         'details': details,
-        'created_at': datetime.now(timezone.utc).isoformat()
+        'created_at': now.isoformat()
+        # logged_at (índice TTL) é gravado só depois da consolidação diária (apply_log_expiry)
+    }
+    try:
+        activity_log_queue.put_nowait(log)
+    except asyncio.QueueFull:
+        # Sobrecarga: o writer manda para o disco; nunca bloqueia a requisição
+        if len(activity_log_overflow) < ACTIVITY_LOG_QUEUE_SIZE:
+            activity_log_overflow.append(log)
+        else:
+            activity_log_writer_state['dropped'] += 1
+
+@api_router.get("/admin/activity-logs/writer")
+async def get_activity_log_writer_status(admin: dict = Depends(get_admin_user)):
+    """Estado do writer em lote das atividades"""
+    return {
+        'running': activity_log_writer_state['task'] is not None and not activity_log_writer_state['task'].done(),
+        'queued': activity_log_queue.qsize(),
+        'overflow': len(activity_log_overflow),
+        'spill_file': str(ACTIVITY_LOG_SPILL_FILE),
+        **{key: value for key, value in activity_log_writer_state.items() if key != 'task'}
     }
-    await db.activity_logs.insert_one(log)
 
 @api_router.get("/activity-logs")
 async def get_activity_logs(limit: int = 50, user: dict = Depends(get_current_user)):
     """Get recent activity logs"""
     query = {} if user['role'] == 'admin' else {'user_id': user['id']}
-    logs = await db.activity_logs.find(query, {'_id': 0}).sort('created_at', -1).limit(limit).to_list(limit)
+    logs = await db.activity_logs.find(query, {'_id': 0, 'logged_at': 0}).sort('created_at', -1).limit(limit).to_list(limit)
     return logs
 
 @api_router.get("/activity-logs/paginated")
@@ -1471,7 +2535,7 @@ async def get_activity_logs_paginated(
     
     skip = (page - 1) * limit
     total = await db.activity_logs.count_documents(query)
-    logs = await db.activity_logs.find(query, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
+    logs = await db.activity_logs.find(query, {'_id': 0, 'logged_at': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
     
     return {
         'logs': logs,
@@ -1481,26 +2545,444 @@ async def get_activity_logs_paginated(
         'total_pages': (total + limit - 1) // limit
     }
 
-# ============= Dashboard Stats =============
+# ============= Send Logs =============
 
-@api_router.get("/stats/dashboard")
-async def get_dashboard_stats(days: int = 7, user: dict = Depends(get_current_user)):
-    """Get dashboard statistics"""
-    import pytz
+# send_logs é uma coleção time-series (MongoDB 5.0+): sent_at é datetime BSON e
+# usuário/campanha/conexão ficam no metaField 'meta'. Em servidores sem
+# time-series a coleção continua normal, mas com o mesmo formato de documento.
+SEND_LOGS_LEGACY_COLLECTION = 'send_logs_legacy'
+SEND_LOGS_MIGRATION_BATCH = 1000
+
+send_logs_storage = {'timeseries': False, 'migrated': 0}
+
+async def get_collection_info(name: str) -> Optional[dict]:
+    result = await db.command('listCollections', filter={'name': name})
+    batch = result['cursor']['firstBatch']
+    return batch[0] if batch else None
+
+def build_send_log(campaign: dict, group_id: str, group_name: str, status: str, error: str = None) -> dict:
+    log = {
+        'id': str(uuid.uuid4()),
+        'sent_at': datetime.now(timezone.utc),
+        'meta': {
+            'user_id': campaign.get('user_id'),
+            'campaign_id': campaign['id'],
+            'connection_id': campaign['connection_id']
+        },
+        'group_id': group_id,
+        'group_name': group_name,
+        'status': status
+    }
+    if error:
+        log['error'] = error
+    return log
+
+async def record_send_log(campaign: dict, group_id: str, group_name: str, status: str, error: str = None):
+    """Registra um envio (sucesso ou falha) para as estatísticas do dashboard"""
+    await db.send_logs.insert_one(build_send_log(campaign, group_id, group_name, status, error))
+
+def send_logs_user_filter(user: dict) -> dict:
+    return {} if user['role'] == 'admin' else {'meta.user_id': user['id']}
+
+def parse_legacy_timestamp(value, fallback: datetime) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return fallback
+
+def legacy_send_log_to_timeseries(doc: dict) -> dict:
+    """Converte um send_log antigo (sent_at string, campos no topo) para o formato novo"""
+    converted = {
+        'id': doc.get('id') or str(doc['_id']),  # determinístico: a retomada da migração compara ids
+        'sent_at': parse_legacy_timestamp(doc.get('sent_at'), doc['_id'].generation_time),
+        'meta': doc.get('meta') or {
+            'user_id': doc.get('user_id'),
+            'campaign_id': doc.get('campaign_id'),
+            'connection_id': doc.get('connection_id')
+        },
+        'group_id': doc.get('group_id'),
+        'group_name': doc.get('group_name', ''),
+        'status': doc.get('status')
+    }
+    if doc.get('error'):
+        converted['error'] = doc['error']
+    return converted
+
+async def prepare_send_logs_collection():
+    """Garante send_logs como time-series; a coleção antiga é renomeada para migração em background"""
+    info = await get_collection_info('send_logs')
+    if info and info.get('type') == 'timeseries':
+        send_logs_storage['timeseries'] = True
+        return
     
-    sp_tz = pytz.timezone('America/Sao_Paulo')
-    now_sp = datetime.now(sp_tz)
-    now_utc = datetime.now(timezone.utc)
+    server_info = await client.server_info()
+    if server_info.get('versionArray', [0])[0] < 5:
+        logger.warning("[SEND_LOGS] MongoDB < 5.0 sem suporte a time-series - mantendo coleção normal")
+        return
     
-    from_date = now_utc - timedelta(days=days)
-    from_date_str = from_date.isoformat()
+    if info:
+        target = SEND_LOGS_LEGACY_COLLECTION
+        if await get_collection_info(target):
+            # Migração anterior interrompida: o que foi escrito depois vira um segundo
+            # legado (rename é instantâneo; a cópia fica para a migração em background)
+            target = f"{SEND_LOGS_LEGACY_COLLECTION}_{int(time.time())}"
+        await db.send_logs.rename(target)
+        logger.info(f"[SEND_LOGS] Coleção antiga renomeada para {target}")
+    
+    await db.create_collection(
+        'send_logs',
+        timeseries={'timeField': 'sent_at', 'metaField': 'meta', 'granularity': 'seconds'}
+    )
+    send_logs_storage['timeseries'] = True
+    logger.info("[SEND_LOGS] Coleção time-series criada")
+
+async def migrate_legacy_send_logs():
+    """Migra send_logs com sent_at em string ISO para datetime BSON (em lotes, retomável)"""
+    if not send_logs_storage['timeseries']:
+        # Sem time-series: converte no lugar
+        result = await db.send_logs.update_many(
+            {'sent_at': {'$type': 'string'}},
+            [
+                {'$set': {
+                    'sent_at': {'$toDate': '$sent_at'},
+                    'meta': {'user_id': '$user_id', 'campaign_id': '$campaign_id', 'connection_id': '$connection_id'}
+                }},
+                {'$unset': ['user_id', 'campaign_id', 'connection_id']}
+            ]
+        )
+        send_logs_storage['migrated'] = result.modified_count
+        logger.info(f"[SEND_LOGS] {result.modified_count} registros convertidos para datetime")
+        return
     
-    # Start of today in São Paulo timezone, converted to UTC
-    today_start_sp = sp_tz.localize(datetime.combine(now_sp.date(), datetime.min.time()))
+    names = await db.list_collection_names(filter={'name': {'$regex': f'^{SEND_LOGS_LEGACY_COLLECTION}'}})
+    if not names:
+        return
+    
+    for name in sorted(names):
+        await migrate_legacy_send_log_collection(name)
+    logger.info(f"[SEND_LOGS] Migração concluída: {send_logs_storage['migrated']} registros")
+
+async def skip_migrated_send_logs(docs: list, in_flight: set) -> list:
+    """Remove do lote os registros do lote interrompido que já chegaram em send_logs"""
+    candidates = [doc for doc in docs if doc['id'] in in_flight]
+    if not candidates:
+        return docs
+    times = [doc['sent_at'] for doc in candidates]
+    existing = await db.send_logs.find(
+        {'sent_at': {'$gte': min(times), '$lte': max(times)}, 'id': {'$in': [doc['id'] for doc in candidates]}},
+        {'_id': 0, 'id': 1}
+    ).to_list(None)
+    copied = {row['id'] for row in existing}
+    return [doc for doc in docs if doc['id'] not in copied]
+
+async def migrate_legacy_send_log_collection(name: str):
+    """Copia uma coleção legada para send_logs em lotes, de forma retomável.
+    
+    Time-series não tem índice único nem upsert: antes de cada insert os ids do lote
+    ficam em migration_state. Se o processo cair entre o insert e o delete, o mesmo
+    lote volta na próxima execução e os registros já copiados são pulados.
+    """
+    legacy = db[name]
+    state_id = f"send_logs:{name}"
+    state = await db.migration_state.find_one({'id': state_id})
+    in_flight = set(state.get('in_flight', [])) if state else set()
+    
+    while True:
+        batch = await legacy.find({}).sort('_id', 1).limit(SEND_LOGS_MIGRATION_BATCH).to_list(SEND_LOGS_MIGRATION_BATCH)
+        if not batch:
+            break
+        docs = [legacy_send_log_to_timeseries(doc) for doc in batch]
+        if in_flight:
+            docs = await skip_migrated_send_logs(docs, in_flight)
+            in_flight = set()
+        
+        await db.migration_state.update_one(
+            {'id': state_id},
+            {'$set': {'in_flight': [doc['id'] for doc in docs], 'updated_at': datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        if docs:
+            await db.send_logs.insert_many(docs, ordered=False)
+        await legacy.delete_many({'_id': {'$in': [doc['_id'] for doc in batch]}})
+        send_logs_storage['migrated'] += len(docs)
+    
+    await legacy.drop()
+    await db.migration_state.delete_one({'id': state_id})
+
+# ============= Log Retention =============
+
+# Registros brutos mais antigos que N dias são consolidados em agregados diários
+# (send_logs_daily / activity_logs_daily) e depois expirados. 0 = sem expiração.
+SEND_LOGS_RETENTION_DAYS = int(os.environ.get('SEND_LOGS_RETENTION_DAYS', '90'))
+ACTIVITY_LOGS_RETENTION_DAYS = int(os.environ.get('ACTIVITY_LOGS_RETENTION_DAYS', '180'))
+LOG_RETENTION_INTERVAL_HOURS = int(os.environ.get('LOG_RETENTION_INTERVAL_HOURS', '24'))
+# Exportação opcional dos registros brutos para auditoria (NDJSON gzip, um arquivo por dia)
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', '')
+LOG_ARCHIVE_BATCH = 1000
+LOG_RETENTION_TIMEZONE = 'America/Sao_Paulo'
+
+LOG_ROLLUP_SOURCES = {
+    'send_logs': {
+        'time_field': 'sent_at',
+        'daily_collection': 'send_logs_daily',
+        'group_keys': {'user_id': '$meta.user_id', 'campaign_id': '$meta.campaign_id', 'connection_id': '$meta.connection_id'},
+        'counters': {
+            'sent': {'$sum': {'$cond': [{'$eq': ['$status', 'sent']}, 1, 0]}},
+            'failed': {'$sum': {'$cond': [{'$eq': ['$status', 'failed']}, 1, 0]}}
+        }
+    },
+    'activity_logs': {
+        # created_at é string ISO em UTC - ordem lexicográfica == ordem cronológica
+        'time_field': 'created_at',
+        'string_time': True,
+        'daily_collection': 'activity_logs_daily',
+        'group_keys': {'user_id': '$user_id', 'action': '$action'},
+        'counters': {'count': {'$sum': 1}}
+    }
+}
+
+log_retention_lock = asyncio.Lock()
+log_retention_state = {'last_run_at': None, 'last_error': None, 'results': {}}
+
+def local_day_start(moment: datetime) -> datetime:
+    """Início (em UTC) do dia de São Paulo que contém o instante"""
+    import pytz
+    
+    sp_tz = pytz.timezone(LOG_RETENTION_TIMEZONE)
+    local_date = moment.astimezone(sp_tz).date()
+    return sp_tz.localize(datetime.combine(local_date, datetime.min.time())).astimezone(timezone.utc)
+
+def local_date_string(day_start: datetime) -> str:
+    import pytz
+    return day_start.astimezone(pytz.timezone(LOG_RETENTION_TIMEZONE)).date().isoformat()
+
+def log_day_match(source: dict, day_start: datetime, day_end: datetime) -> dict:
+    if source.get('string_time'):
+        return {source['time_field']: {'$gte': day_start.isoformat(), '$lt': day_end.isoformat()}}
+    return {source['time_field']: {'$gte': day_start, '$lt': day_end}}
+
+async def get_rollup_watermark(name: str) -> Optional[datetime]:
+    """Tudo antes desta marca já foi consolidado nos agregados diários"""
+    state = await tz_aware_db.log_retention_state.find_one({'id': name})
+    return state.get('rolled_up_until') if state else None
+
+async def export_log_day(name: str, match: dict, date: str) -> int:
+    """Grava os registros brutos do dia em LOG_ARCHIVE_DIR/<coleção>/<data>.ndjson.gz"""
+    directory = Path(LOG_ARCHIVE_DIR) / name
+    await asyncio.to_thread(directory.mkdir, parents=True, exist_ok=True)
+    target = directory / f"{date}.ndjson.gz"
+    partial = directory / f"{date}.ndjson.gz.partial"
+    
+    exported = 0
+    archive = await asyncio.to_thread(gzip.open, partial, 'wt', encoding='utf-8')
+    try:
+        lines = []
+        async for doc in tz_aware_db[name].find(match, {'_id': 0}).batch_size(LOG_ARCHIVE_BATCH):
+            lines.append(json.dumps(doc, ensure_ascii=False, default=str))
+            if len(lines) >= LOG_ARCHIVE_BATCH:
+                await asyncio.to_thread(archive.write, '\n'.join(lines) + '\n')
+                exported += len(lines)
+                lines = []
+        if lines:
+            await asyncio.to_thread(archive.write, '\n'.join(lines) + '\n')
+            exported += len(lines)
+    finally:
+        await asyncio.to_thread(archive.close)
+    
+    # Arquivo só aparece completo (reexecução sobrescreve)
+    await asyncio.to_thread(os.replace, partial, target)
+    return exported
+
+async def rollup_log_day(name: str, source: dict, day_start: datetime, day_end: datetime) -> dict:
+    """Consolida um dia completo em agregados (upsert idempotente) e exporta se configurado"""
+    match = log_day_match(source, day_start, day_end)
+    rows = await db[name].aggregate([
+        {'$match': match},
+        {'$group': {'_id': source['group_keys'], **source['counters']}}
+    ]).to_list(None)
+    if not rows:
+        return {'groups': 0, 'exported': 0}
+    
+    date = local_date_string(day_start)
+    exported = await export_log_day(name, match, date) if LOG_ARCHIVE_DIR else 0
+    
+    operations = []
+    for row in rows:
+        group = row.pop('_id')
+        key = {'date': date, **{field: group.get(field) for field in source['group_keys']}}
+        operations.append(UpdateOne(key, {'$set': {**row, 'day_start': day_start}}, upsert=True))
+    await db[source['daily_collection']].bulk_write(operations, ordered=False)
+    
+    return {'groups': len(operations), 'exported': exported}
+
+async def rollup_log_source(name: str, source: dict) -> dict:
+    """Consolida todos os dias completos desde a última marca (o dia atual fica de fora)"""
+    watermark = await get_rollup_watermark(name)
+    if watermark is None:
+        time_field = source['time_field']
+        oldest = await tz_aware_db[name].find_one({}, {time_field: 1}, sort=[(time_field, 1)])
+        if not oldest:
+            return {'rolled_up_until': None, 'days': 0, 'exported': 0}
+        watermark = local_day_start(parse_legacy_timestamp(oldest.get(time_field), oldest['_id'].generation_time))
+    
+    today_start = local_day_start(datetime.now(timezone.utc))
+    days = exported = 0
+    day_start = watermark
+    while day_start < today_start:
+        # +36h cai sempre no dia seguinte, mesmo em dias de 23h/25h (horário de verão)
+        day_end = local_day_start(day_start + timedelta(hours=36))
+        result = await rollup_log_day(name, source, day_start, day_end)
+        exported += result['exported']
+        await db.log_retention_state.update_one(
+            {'id': name},
+            {'$set': {'rolled_up_until': day_end, 'updated_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        day_start = day_end
+        days += 1
+    
+    return {'rolled_up_until': day_start.isoformat(), 'days': days, 'exported': exported}
+
+async def apply_log_expiry():
+    """Expiração dos registros brutos - nunca antes da consolidação: com a consolidação
+    atrasada (erros repetidos) os brutos ficam até os agregados alcançarem o prazo"""
+    if send_logs_storage['timeseries']:
+        # Time-series: expiração nativa por bucket via expireAfterSeconds da coleção, ligada só
+        # enquanto tudo que é mais antigo que o prazo já está consolidado
+        expire_after = 'off'
+        if SEND_LOGS_RETENTION_DAYS > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=SEND_LOGS_RETENTION_DAYS)
+            watermark = await get_rollup_watermark('send_logs')
+            if watermark and watermark >= cutoff:
+                expire_after = SEND_LOGS_RETENTION_DAYS * 86400
+            else:
+                logger.warning("[RETENTION] send_logs: consolidação atrás do prazo de retenção - expiração suspensa")
+        await db.command('collMod', 'send_logs', expireAfterSeconds=expire_after)
+    elif SEND_LOGS_RETENTION_DAYS > 0:
+        # Coleção normal (MongoDB < 5.0): remove só o que já foi consolidado
+        cutoff = datetime.now(timezone.utc) - timedelta(days=SEND_LOGS_RETENTION_DAYS)
+        watermark = await get_rollup_watermark('send_logs')
+        if watermark:
+            await db.send_logs.delete_many({'sent_at': {'$lt': min(cutoff, watermark)}})
+    
+    # activity_logs: índice TTL em logged_at (INDEX_REGISTRY). logged_at só existe em
+    # registros já consolidados (antes da marca); quem ainda não foi consolidado não tem o campo.
+    watermark = await get_rollup_watermark('activity_logs')
+    not_rolled_up = {'created_at': {'$gte': watermark.isoformat()}} if watermark else {}
+    # Registros gravados com logged_at na inserção (versões anteriores) voltam a esperar a consolidação
+    await db.activity_logs.update_many(
+        {'logged_at': {'$exists': True}, **not_rolled_up},
+        {'$unset': {'logged_at': ''}}
+    )
+    if watermark:
+        await db.activity_logs.update_many(
+            {'logged_at': {'$exists': False}, 'created_at': {'$lt': watermark.isoformat()}},
+            [{'$set': {'logged_at': {'$toDate': '$created_at'}}}]
+        )
+
+async def run_log_retention():
+    """Consolida dias completos, exporta (opcional) e aplica a expiração"""
+    if log_retention_lock.locked():
+        return
+    
+    async with log_retention_lock:
+        try:
+            for name, source in LOG_ROLLUP_SOURCES.items():
+                log_retention_state['results'][name] = await rollup_log_source(name, source)
+            await apply_log_expiry()
+            log_retention_state['last_error'] = None
+            logger.info(f"[RETENTION] Concluído: {log_retention_state['results']}")
+        except Exception as e:
+            log_retention_state['last_error'] = str(e)
+            logger.error(f"[RETENTION] Erro: {e}")
+            raise
+        finally:
+            log_retention_state['last_run_at'] = datetime.now(timezone.utc).isoformat()
+
+async def start_log_retention():
+    scheduler.add_job(
+        run_log_retention,
+        IntervalTrigger(hours=LOG_RETENTION_INTERVAL_HOURS),
+        id='log_retention',
+        replace_existing=True
+    )
+    await run_log_retention()
+
+async def count_send_statuses(user: dict, watermark: Optional[datetime]) -> dict:
+    """Totais por status: agregados diários antes da marca + registros brutos depois dela"""
+    totals = {'sent': 0, 'failed': 0}
+    raw_query = send_logs_user_filter(user)
+    
+    if watermark:
+        raw_query['sent_at'] = {'$gte': watermark}
+        daily_query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+        daily_query['day_start'] = {'$lt': watermark}
+        rows = await db.send_logs_daily.aggregate([
+            {'$match': daily_query},
+            {'$group': {'_id': None, 'sent': {'$sum': '$sent'}, 'failed': {'$sum': '$failed'}}}
+        ]).to_list(1)
+        if rows:
+            totals['sent'] += rows[0]['sent']
+            totals['failed'] += rows[0]['failed']
+    
+    rows = await db.send_logs.aggregate([
+        {'$match': raw_query},
+        {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+    ]).to_list(None)
+    for row in rows:
+        if row['_id'] in totals:
+            totals[row['_id']] += row['count']
+    
+    return totals
+
+@api_router.get("/admin/log-retention")
+async def get_log_retention_status(admin: dict = Depends(get_admin_user)):
+    """Configuração de retenção e progresso da consolidação"""
+    watermarks = {}
+    for name in LOG_ROLLUP_SOURCES:
+        watermark = await get_rollup_watermark(name)
+        watermarks[name] = watermark.isoformat() if watermark else None
+    
+    return {
+        'send_logs_retention_days': SEND_LOGS_RETENTION_DAYS,
+        'activity_logs_retention_days': ACTIVITY_LOGS_RETENTION_DAYS,
+        'interval_hours': LOG_RETENTION_INTERVAL_HOURS,
+        'archive_dir': LOG_ARCHIVE_DIR or None,
+        'running': log_retention_lock.locked(),
+        'rolled_up_until': watermarks,
+        **log_retention_state
+    }
+
+@api_router.post("/admin/log-retention/run")
+async def trigger_log_retention(admin: dict = Depends(get_admin_user)):
+    """Executa a consolidação/expiração agora (em background)"""
+    if log_retention_lock.locked():
+        raise HTTPException(status_code=409, detail="Retenção já está em execução")
+    spawn_background_task(run_log_retention())
+    return {'success': True, 'message': 'Retenção iniciada'}
+
+# ============= Dashboard Stats =============
+
+@api_router.get("/stats/dashboard")
+async def get_dashboard_stats(days: int = 7, user: dict = Depends(get_current_user)):
+    """Get dashboard statistics"""
+    import pytz
+    
+    sp_tz = pytz.timezone('America/Sao_Paulo')
+    now_sp = datetime.now(sp_tz)
+    now_utc = datetime.now(timezone.utc)
+    
+    from_date = now_utc - timedelta(days=days)
+    
+    # Start of today in São Paulo timezone, converted to UTC
+    today_start_sp = sp_tz.localize(datetime.combine(now_sp.date(), datetime.min.time()))
     today_start_utc = today_start_sp.astimezone(timezone.utc)
     
     # Query filter based on role
-    user_query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    user_query = send_logs_user_filter(user)
     
     # Count resellers
     resellers_count = 0
@@ -1510,51 +2992,58 @@ async def get_dashboard_stats(days: int = 7, user: dict = Depends(get_current_us
         resellers_count = await db.users.count_documents({'created_by': user['id']})
     
     # Get send logs for accurate stats
-    send_logs_query = user_query.copy()
-    send_logs_query['status'] = 'sent'
+    send_logs_query = {**user_query, 'status': 'sent'}
     
-    # Count total sends from send_logs
-    total_sends = await db.send_logs.count_documents(send_logs_query)
+    # Totais: agregados diários (dias já consolidados/expirados) + registros brutos
+    watermark = await get_rollup_watermark('send_logs')
+    totals = await count_send_statuses(user, watermark)
+    total_sends = totals['sent']
     
-    # Count sends today
-    today_query = send_logs_query.copy()
-    today_query['sent_at'] = {'$gte': today_start_utc.isoformat()}
-    sends_today = await db.send_logs.count_documents(today_query)
+    # Count sends today (sent_at é datetime BSON - comparação por data, não por string)
+    sends_today = await db.send_logs.count_documents({**send_logs_query, 'sent_at': {'$gte': today_start_utc}})
     
     # Count sends in period
-    period_query = send_logs_query.copy()
-    period_query['sent_at'] = {'$gte': from_date_str}
-    sends_period = await db.send_logs.count_documents(period_query)
-    
-    # Generate daily sends data for chart
-    daily_sends = []
-    for i in range(days):
-        day_offset = days - 1 - i
-        day_date_sp = (now_sp - timedelta(days=day_offset)).date()
-        
-        # Start and end of day in São Paulo, converted to UTC
-        day_start_sp = sp_tz.localize(datetime.combine(day_date_sp, datetime.min.time()))
-        day_end_sp = sp_tz.localize(datetime.combine(day_date_sp + timedelta(days=1), datetime.min.time()))
-        
-        day_start_utc = day_start_sp.astimezone(timezone.utc).isoformat()
-        day_end_utc = day_end_sp.astimezone(timezone.utc).isoformat()
-        
-        day_query = send_logs_query.copy()
-        day_query['sent_at'] = {'$gte': day_start_utc, '$lt': day_end_utc}
-        day_count = await db.send_logs.count_documents(day_query)
-        daily_sends.append(day_count)
+    sends_period = await db.send_logs.count_documents({**send_logs_query, 'sent_at': {'$gte': from_date}})
+    
+    # Daily sends for chart - uma agregação agrupando por dia no fuso de São Paulo
+    first_day_sp = (now_sp - timedelta(days=days - 1)).date()
+    first_day_start_utc = sp_tz.localize(datetime.combine(first_day_sp, datetime.min.time())).astimezone(timezone.utc)
+    
+    raw_since = max(first_day_start_utc, watermark) if watermark else first_day_start_utc
+    daily_pipeline = [
+        {'$match': {**send_logs_query, 'sent_at': {'$gte': raw_since}}},
+        {'$group': {
+            '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$sent_at', 'timezone': 'America/Sao_Paulo'}},
+            'count': {'$sum': 1}
+        }}
+    ]
+    counts_by_day = {row['_id']: row['count'] for row in await db.send_logs.aggregate(daily_pipeline).to_list(None)}
+    
+    # Dias anteriores à marca de consolidação vêm de send_logs_daily
+    if watermark and watermark > first_day_start_utc:
+        rollup_query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+        rollup_query['day_start'] = {'$gte': first_day_start_utc, '$lt': watermark}
+        rollup_rows = await db.send_logs_daily.aggregate([
+            {'$match': rollup_query},
+            {'$group': {'_id': '$date', 'count': {'$sum': '$sent'}}}
+        ]).to_list(None)
+        for row in rollup_rows:
+            counts_by_day[row['_id']] = counts_by_day.get(row['_id'], 0) + row['count']
+    daily_sends = [counts_by_day.get((first_day_sp + timedelta(days=i)).isoformat(), 0) for i in range(days)]
     
     # Success rate from send_logs
-    total_logs = await db.send_logs.count_documents(user_query)
-    failed_logs = await db.send_logs.count_documents({**user_query, 'status': 'failed'})
+    failed_logs = totals['failed']
+    total_logs = totals['sent'] + failed_logs
     success_rate = int(((total_logs - failed_logs) / total_logs * 100) if total_logs > 0 else 100)
     
     # Get last 5 errors for expandable view
     recent_errors = []
     error_query = {**user_query, 'status': 'failed'}
-    error_logs = await db.send_logs.find(error_query, {'_id': 0}).sort('sent_at', -1).limit(5).to_list(5)
+    error_logs = await tz_aware_db.send_logs.find(error_query, {'_id': 0}).sort('sent_at', -1).limit(5).to_list(5)
     
     for error_log in error_logs:
+        meta = error_log.get('meta') or {}
+        
         # Get group name if available
         group_name = error_log.get('group_name', 'Grupo desconhecido')
         if not group_name and error_log.get('group_id'):
@@ -1563,17 +3052,18 @@ async def get_dashboard_stats(days: int = 7, user: dict = Depends(get_current_us
         
         # Get campaign name if available
         campaign_name = None
-        if error_log.get('campaign_id'):
-            campaign = await db.campaigns.find_one({'id': error_log['campaign_id']})
+        if meta.get('campaign_id'):
+            campaign = await db.campaigns.find_one({'id': meta['campaign_id']})
             campaign_name = campaign.get('title') if campaign else None
         
+        sent_at = error_log.get('sent_at')
         recent_errors.append({
             'id': error_log.get('id'),
-            'sent_at': error_log.get('sent_at'),
+            'sent_at': sent_at.isoformat() if isinstance(sent_at, datetime) else sent_at,
             'group_name': group_name,
             'campaign_name': campaign_name,
             'error': error_log.get('error', 'Erro desconhecido'),
-            'connection_id': error_log.get('connection_id')
+            'connection_id': meta.get('connection_id')
         })
     
     return {
@@ -1753,7 +3243,7 @@ async def purchase_plan(plan_id: str, user: dict = Depends(get_current_user)):
         logger.error(f"Erro ao gerar PIX para plano: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao gerar pagamento: {str(e)}")
     
-    await db.transactions.insert_one(transaction)
+    await insert_transaction(transaction)
     return transaction
 
 # ============= MONETIZATION - GATEWAYS =============
@@ -1906,20 +3396,91 @@ async def delete_credit_plan(plan_id: str, admin: dict = Depends(get_admin_user)
         raise HTTPException(status_code=404, detail="Plano não encontrado")
     return {'message': 'Plano deletado'}
 
+# ============= QR Blobs =============
+
+# Imagens de QR (WhatsApp e PIX) ficam fora de connections/transactions, em qr_blobs com
+# TTL curto: as listagens não carregam blobs e só os endpoints de item único os buscam.
+CONNECTION_QR_TTL = int(os.environ.get('CONNECTION_QR_TTL', '120'))
+PIX_QR_TTL = int(os.environ.get('PIX_QR_TTL', '3600'))
+QR_BLOB_TTLS = {'connection': CONNECTION_QR_TTL, 'pix': PIX_QR_TTL}
+# Campos blob de cada coleção de origem. Da transação só a imagem do PIX (qr_code, base64);
+# o copia e cola (qr_code_text) é curto e continua no documento da transação
+CONNECTION_QR_FIELDS = ('qr_code', 'qr_image')
+TRANSACTION_QR_FIELDS = ('qr_code',)
+
+def qr_blob_upsert(kind: str, owner_id: str, fields: dict) -> UpdateOne:
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=QR_BLOB_TTLS[kind])
+    return UpdateOne(
+        {'_id': f"{kind}:{owner_id}"},
+        {'$set': {'kind': kind, 'owner_id': owner_id, 'expires_at': expires_at, **fields}},
+        upsert=True
+    )
+
+async def store_qr_blob(kind: str, owner_id: str, fields: dict):
+    await db.qr_blobs.bulk_write([qr_blob_upsert(kind, owner_id, fields)])
+
+async def load_qr_blob(kind: str, owner_id: str) -> dict:
+    """Campos do blob ainda válido ({} se expirou; o monitor de TTL do Mongo roda a cada ~60s)"""
+    blob = await db.qr_blobs.find_one(
+        {'_id': f"{kind}:{owner_id}", 'expires_at': {'$gt': datetime.now(timezone.utc)}},
+        {'_id': 0, 'kind': 0, 'owner_id': 0, 'expires_at': 0}
+    )
+    return blob or {}
+
+async def delete_qr_blob(kind: str, owner_id: str):
+    await db.qr_blobs.delete_one({'_id': f"{kind}:{owner_id}"})
+
+async def insert_transaction(transaction: dict):
+    """Grava a transação sem a imagem do PIX (vai para qr_blobs); o dict original segue para a resposta"""
+    document = {key: value for key, value in transaction.items() if key not in TRANSACTION_QR_FIELDS}
+    if transaction.get('qr_code'):
+        await store_qr_blob('pix', transaction['id'], {'qr_code': transaction['qr_code']})
+    await db.transactions.insert_one(document)
+
+async def migrate_qr_blobs():
+    """Remove os blobs legados de connections/transactions (QRs de PIX pendentes vão para qr_blobs)"""
+    operations = []
+    moved = 0
+    async for transaction in db.transactions.find(
+        {'qr_code': {'$type': 'string'}, 'status': 'pending'},
+        {'_id': 0, 'id': 1, 'qr_code': 1}
+    ):
+        operations.append(qr_blob_upsert('pix', transaction['id'], {'qr_code': transaction['qr_code']}))
+        if len(operations) >= 500:
+            await db.qr_blobs.bulk_write(operations, ordered=False)
+            moved += len(operations)
+            operations = []
+    if operations:
+        await db.qr_blobs.bulk_write(operations, ordered=False)
+        moved += len(operations)
+    
+    transactions = await db.transactions.update_many(
+        {'qr_code': {'$exists': True}}, {'$unset': {field: '' for field in TRANSACTION_QR_FIELDS}}
+    )
+    # QR de conexão gravado no documento já está vencido: só remove
+    connections = await db.connections.update_many(
+        {'$or': [{field: {'$exists': True}} for field in CONNECTION_QR_FIELDS]},
+        {'$unset': {field: '' for field in CONNECTION_QR_FIELDS}}
+    )
+    if moved or transactions.modified_count or connections.modified_count:
+        logger.info(f"[QR BLOBS] {moved} QR(s) de PIX movido(s); blobs removidos de {transactions.modified_count} transação(ões) e {connections.modified_count} conexão(ões)")
+
 # ============= MONETIZATION - TRANSACTIONS & RENEWALS =============
 
 @api_router.get("/transactions", response_model=List[TransactionResponse])
 async def get_transactions(user: dict = Depends(get_current_user)):
     """Get user's transactions"""
+    # Imagem do PIX só no endpoint do item (GET /transactions/{id})
+    projection = {"_id": 0, **{field: 0 for field in TRANSACTION_QR_FIELDS}}
     if user['role'] == 'admin':
-        transactions = await db.transactions.find({}, {"_id": 0}).to_list(1000)
+        transactions = await db.transactions.find({}, projection).to_list(1000)
     elif user['role'] == 'master':
         transactions = await db.transactions.find(
             {'$or': [{'user_id': user['id']}, {'master_id': user['id']}]},
-            {"_id": 0}
+            projection
         ).to_list(1000)
     else:
-        transactions = await db.transactions.find({'user_id': user['id']}, {"_id": 0}).to_list(1000)
+        transactions = await db.transactions.find({'user_id': user['id']}, projection).to_list(1000)
     
     # Enrich with usernames
     for tx in transactions:
@@ -1934,6 +3495,22 @@ async def get_transactions(user: dict = Depends(get_current_user)):
     
     return sorted(transactions, key=lambda x: x['created_at'], reverse=True)
 
+@api_router.get("/transactions/{transaction_id}", response_model=TransactionResponse)
+async def get_transaction(transaction_id: str, user: dict = Depends(get_current_user)):
+    """Transação com o QR do PIX (enquanto válido em qr_blobs)"""
+    query = {'id': transaction_id}
+    if user['role'] == 'master':
+        query['$or'] = [{'user_id': user['id']}, {'master_id': user['id']}]
+    elif user['role'] != 'admin':
+        query['user_id'] = user['id']
+    
+    transaction = await db.transactions.find_one(query, {"_id": 0})
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transação não encontrada")
+    if transaction['status'] == 'pending':
+        transaction.update(await load_qr_blob('pix', transaction_id))
+    return transaction
+
 @api_router.post("/renew/{user_id}")
 async def initiate_renewal(user_id: str, current_user: dict = Depends(get_current_user)):
     """Initiate renewal payment (master renews reseller, user renews self)"""
@@ -2001,7 +3578,7 @@ async def initiate_renewal(user_id: str, current_user: dict = Depends(get_curren
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar pagamento: {str(e)}")
     
-    await db.transactions.insert_one(transaction)
+    await insert_transaction(transaction)
     return transaction
 
 @api_router.post("/purchase-credits/{plan_id}")
@@ -2056,7 +3633,7 @@ async def purchase_credits(plan_id: str, user: dict = Depends(get_current_user))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar pagamento: {str(e)}")
     
-    await db.transactions.insert_one(transaction)
+    await insert_transaction(transaction)
     return transaction
 
 @api_router.post("/webhook/mercadopago")
@@ -2102,6 +3679,7 @@ async def mercadopago_webhook(data: dict):
                     'paid_at': datetime.now(timezone.utc).isoformat()
                 }}
             )
+            await delete_qr_blob('pix', transaction['id'])
             
             # Process payment
             if transaction['type'] == 'renewal':
@@ -2193,6 +3771,7 @@ async def mercadopago_webhook(data: dict):
                 {'id': transaction['id']},
                 {'$set': {'status': status}}
             )
+            await delete_qr_blob('pix', transaction['id'])
     
     return {'status': 'ok'}
 
@@ -2931,8 +4510,169 @@ async def delete_reseller(user_id: str, master: dict = Depends(get_master_user))
     
     return {'message': 'Revendedor deletado'}
 
+# ============= Connection Events (Bridge Webhook) =============
+
+# O WhatsApp service avisa mudanças de status, QR e telefone em POST /internal/bridge-events
+# (header X-Bridge-Secret). As mudanças são mescladas por conexão, gravadas em lote em
+# db.connections e repassadas aos assinantes SSE de /connections/events.
+# Sem BRIDGE_WEBHOOK_SECRET o webhook fica desligado e a UI continua no polling.
+BRIDGE_WEBHOOK_SECRET = os.environ.get('BRIDGE_WEBHOOK_SECRET', '')
+BRIDGE_EVENTS_FLUSH_INTERVAL = float(os.environ.get('BRIDGE_EVENTS_FLUSH_INTERVAL', '0.5'))
+# Evento autenticado recebido há menos que isso = webhook comprovadamente ativo
+BRIDGE_WEBHOOK_LIVE_WINDOW = int(os.environ.get('BRIDGE_WEBHOOK_LIVE_WINDOW', '600'))
+# Campos do evento gravados na conexão (o QR vai para qr_blobs)
+BRIDGE_EVENT_PERSISTED_FIELDS = ('status', 'phone_number', 'last_error')
+
+connection_event_subscribers = set()
+bridge_events_pending = {}  # connection_id -> campos mesclados desde o último flush
+bridge_events_state = {'flush_scheduled': False, 'received': 0, 'last_received_at': None, 'flushed': 0, 'last_flush_at': None, 'last_error': None}
+
+class BridgeEvent(BaseModel):
+    connection_id: str
+    status: Optional[str] = None
+    phone_number: Optional[str] = None
+    qr_image: Optional[str] = None
+    last_error: Optional[str] = None
+    at: Optional[str] = None
+
+class BridgeEventBatch(BaseModel):
+    events: List[BridgeEvent]
+
+def queue_bridge_event(connection_id: str, fields: dict):
+    """Mescla o evento no pendente da conexão (o mais recente vence) e agenda o flush"""
+    bridge_events_pending.setdefault(connection_id, {}).update(fields)
+    if not bridge_events_state['flush_scheduled']:
+        bridge_events_state['flush_scheduled'] = True
+        spawn_background_task(flush_bridge_events_later())
+
+async def flush_bridge_events_later():
+    await asyncio.sleep(BRIDGE_EVENTS_FLUSH_INTERVAL)
+    bridge_events_state['flush_scheduled'] = False
+    pending = dict(bridge_events_pending)
+    bridge_events_pending.clear()
+    try:
+        await flush_bridge_events(pending)
+    except Exception as e:
+        bridge_events_state['last_error'] = str(e)
+        logger.error(f"[BRIDGE EVENTS] Erro ao aplicar eventos: {e}")
+        # Devolve à fila sem sobrescrever eventos mais novos
+        for connection_id, fields in pending.items():
+            queue_bridge_event(connection_id, {**fields, **bridge_events_pending.get(connection_id, {})})
+
+def publish_connection_event(connection_id: str, user_id: str, fields: dict, event: str = 'connection'):
+    data = {'connection_id': connection_id, **fields}
+    for subscriber in list(connection_event_subscribers):
+        if subscriber.user_id is None or subscriber.user_id == user_id:
+            subscriber.push(event, data)
+
+async def flush_bridge_events(pending: dict):
+    """Um bulk_write para todas as conexões alteradas e fan-out para a UI"""
+    if not pending:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    operations = []
+    for connection_id, fields in pending.items():
+        update = {field: fields[field] for field in BRIDGE_EVENT_PERSISTED_FIELDS if field in fields}
+        if update:
+            update['status_updated_at'] = now
+            operations.append(UpdateOne({'id': connection_id}, {'$set': update}))
+    if operations:
+        await db.connections.bulk_write(operations, ordered=False)
+    
+    # QR vai para qr_blobs (TTL curto); null = QR consumido/expirado
+    qr_operations = [
+        qr_blob_upsert('connection', connection_id, {'qr_image': fields['qr_image']}) if fields['qr_image']
+        else DeleteOne({'_id': f"connection:{connection_id}"})
+        for connection_id, fields in pending.items() if 'qr_image' in fields
+    ]
+    if qr_operations:
+        await db.qr_blobs.bulk_write(qr_operations, ordered=False)
+    
+    owners = {
+        connection['id']: connection['user_id']
+        async for connection in db.connections.find({'id': {'$in': list(pending)}}, {'_id': 0, 'id': 1, 'user_id': 1})
+    }
+    for connection_id, fields in pending.items():
+        # Conexão removida no backend: nada a publicar
+        if connection_id in owners:
+            publish_connection_event(connection_id, owners[connection_id], fields)
+    
+    bridge_events_state['flushed'] += len(pending)
+    bridge_events_state['last_flush_at'] = now
+
+@api_router.post("/internal/bridge-events", include_in_schema=False)
+async def receive_bridge_events(data: BridgeEventBatch, x_bridge_secret: str = Header(default='')):
+    """Webhook interno do WhatsApp service (autenticado por segredo compartilhado)"""
+    if not BRIDGE_WEBHOOK_SECRET or not hmac.compare_digest(x_bridge_secret, BRIDGE_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    for event in data.events:
+        # exclude_unset: null explícito (ex.: qr_image limpo ao conectar) também é aplicado
+        fields = event.model_dump(exclude_unset=True, exclude={'connection_id', 'at'})
+        if fields:
+            queue_bridge_event(event.connection_id, fields)
+    bridge_events_state['received'] += len(data.events)
+    bridge_events_state['last_received_at'] = datetime.now(timezone.utc).isoformat()
+    return {'accepted': len(data.events)}
+
+def bridge_webhook_live() -> bool:
+    """Webhook só conta depois de visto funcionando: evento recebido há pouco ou o /health do
+    bridge mostrando entregas aceitas e sem falha pendente. Segredo configurado não basta
+    (bridge sem segredo, segredo diferente, backend inacessível) - nesses casos a UI segue no polling"""
+    if not BRIDGE_WEBHOOK_SECRET:
+        return False
+    last_received_at = bridge_events_state['last_received_at']
+    if last_received_at:
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(last_received_at)).total_seconds()
+        if age < BRIDGE_WEBHOOK_LIVE_WINDOW:
+            return True
+    webhook = (bridge_health_cache['data'] or {}).get('webhook') or {}
+    return bool(bridge_health_cache['healthy'] and webhook.get('deliveredAt') and not webhook.get('failing'))
+
+async def stream_connection_events(subscriber: "CampaignEventSubscriber"):
+    connection_event_subscribers.add(subscriber)
+    try:
+        yield sse_event('ready', {'webhook': bridge_webhook_live()})
+        while True:
+            try:
+                event, data = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield sse_keepalive()
+                continue
+            yield sse_event(event, data)
+            if subscriber.overflowed and subscriber.queue.empty():
+                subscriber.overflowed = False
+                yield sse_event('resync', {'reason': 'overflow'})
+    finally:
+        connection_event_subscribers.discard(subscriber)
+
+@api_router.get("/connections/events")
+async def connection_events(owner_filter: str = "all", user: dict = Depends(get_current_user)):
+    """SSE com mudanças de status, QR e telefone das conexões do usuário"""
+    # Mesma fila com backpressure dos eventos de campanha; mesmo escopo de /connections
+    if user['role'] == 'admin' and owner_filter != 'mine':
+        subscriber = CampaignEventSubscriber(None)
+    else:
+        subscriber = CampaignEventSubscriber(user['id'])
+    return sse_response(stream_connection_events(subscriber))
+
+@api_router.get("/admin/bridge-events")
+async def get_bridge_events_state(admin: dict = Depends(get_admin_user)):
+    """Contadores do webhook de status do WhatsApp service"""
+    return {
+        'enabled': bool(BRIDGE_WEBHOOK_SECRET),
+        'live': bridge_webhook_live(),
+        'pending': len(bridge_events_pending),
+        'subscribers': len(connection_event_subscribers),
+        **bridge_events_state
+    }
+
 # ============= Connections =============
 
+# Listagens sem os blobs de QR (ficam em qr_blobs, lidos só por GET /connections/{id})
+# nem a marca interna do reconciliador
+CONNECTION_LIST_PROJECTION = {'_id': 0, 'reconciled_round': 0, **{field: 0 for field in CONNECTION_QR_FIELDS}}
+
 @api_router.get("/connections", response_model=List[ConnectionResponse])
 async def list_connections(user: dict = Depends(get_current_user), quick: bool = False, owner_filter: str = "all"):
     """List connections. Use quick=true for faster loading without status check. owner_filter: 'all' or 'mine' (admin only)"""
@@ -2945,7 +4685,7 @@ async def list_connections(user: dict = Depends(get_current_user), quick: bool =
     else:
         query = {'user_id': user['id']}
     
-    connections_list = await db.connections.find(query, {'_id': 0}).to_list(1000)
+    connections_list = await db.connections.find(query, CONNECTION_LIST_PROJECTION).to_list(1000)
     
     # Add owner username for admin view
     if user['role'] == 'admin' and owner_filter == 'all':
@@ -2972,7 +4712,7 @@ async def list_connections_quick(user: dict = Depends(get_current_user), owner_f
     else:
         query = {'user_id': user['id']}
     
-    connections_list = await db.connections.find(query, {'_id': 0}).to_list(1000)
+    connections_list = await db.connections.find(query, CONNECTION_LIST_PROJECTION).to_list(1000)
     
     # Add owner username for admin view
     if user['role'] == 'admin' and owner_filter == 'all':
@@ -2994,8 +4734,6 @@ async def create_connection(data: ConnectionCreate, user: dict = Depends(get_cur
         'name': data.name,
         'user_id': user['id'],
         'status': 'disconnected',
-        'qr_code': None,
-        'qr_image': None,
         'phone_number': None,
         'created_at': datetime.now(timezone.utc).isoformat()
     }
@@ -3009,48 +4747,162 @@ async def get_connection(connection_id: str, user: dict = Depends(get_current_us
     if user['role'] != 'admin':
         query['user_id'] = user['id']
     
-    connection = await db.connections.find_one(query, {'_id': 0})
+    connection = await db.connections.find_one(query, CONNECTION_LIST_PROJECTION)
     if not connection:
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
+    connection.update(await load_qr_blob('connection', connection_id))
     return connection
 
+# ============= Connection Jobs =============
+
+# connect e pairing-code viram jobs: a API responde na hora e o resultado chega por
+# GET /connection-jobs/{id} ou pelo SSE /connections/events (evento connection_job).
+# Semáforos global e por usuário seguram rajadas de conexões simultâneas no WhatsApp service.
+CONNECTION_JOB_CONCURRENCY = int(os.environ.get('CONNECTION_JOB_CONCURRENCY', '4'))
+CONNECTION_JOB_USER_CONCURRENCY = int(os.environ.get('CONNECTION_JOB_USER_CONCURRENCY', '2'))
+CONNECTION_JOB_MAX_QUEUED_PER_USER = int(os.environ.get('CONNECTION_JOB_MAX_QUEUED_PER_USER', '10'))
+# Jobs finalizados continuam consultáveis por este tempo (segundos)
+CONNECTION_JOB_TTL = int(os.environ.get('CONNECTION_JOB_TTL', '600'))
+# Criar a sessão / gerar o código no WhatsApp service pode demorar
+CONNECTION_JOB_TIMEOUT = 120.0
+
+connection_jobs = {}            # job_id -> estado público do job
+connection_job_tasks = {}       # job_id -> task
+connection_jobs_inflight = {}   # (connection_id, kind) -> job_id em andamento
+connection_job_slots = asyncio.Semaphore(CONNECTION_JOB_CONCURRENCY)
+connection_job_user_slots = {}  # user_id -> Semaphore
+
+def prune_connection_jobs():
+    """Remove jobs finalizados há mais de CONNECTION_JOB_TTL e os semáforos de usuários sem job ativo"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=CONNECTION_JOB_TTL)).isoformat()
+    for job_id, job in list(connection_jobs.items()):
+        if job['finished_at'] and job['finished_at'] < cutoff:
+            connection_jobs.pop(job_id, None)
+            connection_job_tasks.pop(job_id, None)
+    
+    # Sem job queued/running o semáforo do usuário está livre (ninguém segura nem espera)
+    active_users = {job['requested_by'] for job in connection_jobs.values() if job['status'] in ('queued', 'running')}
+    for user_id in list(connection_job_user_slots):
+        if user_id not in active_users:
+            connection_job_user_slots.pop(user_id, None)
+
+def publish_connection_job(job: dict):
+    publish_connection_event(job['connection_id'], job['owner_id'], connection_job_response(job), event='connection_job')
+
+def connection_job_response(job: dict) -> dict:
+    return {key: value for key, value in job.items() if key not in ('owner_id', 'requested_by')}
+
+async def run_connection_job(job: dict, runner):
+    user_slots = connection_job_user_slots.setdefault(job['requested_by'], asyncio.Semaphore(CONNECTION_JOB_USER_CONCURRENCY))
+    try:
+        async with user_slots, connection_job_slots:
+            job['status'] = 'running'
+            job['started_at'] = datetime.now(timezone.utc).isoformat()
+            publish_connection_job(job)
+            job['result'] = await runner()
+            if job['result'].get('success') is False:
+                job['status'] = 'failed'
+                job['error'] = job['result'].get('error') or 'Falha no WhatsApp service'
+            else:
+                job['status'] = 'done'
+    except asyncio.CancelledError:
+        job['status'] = 'cancelled'
+        raise
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = f"[{type(e).__name__}] {str(e) or 'Erro desconhecido'}"
+        logger.error(f"Erro no job {job['kind']} da conexão {job['connection_id']}: {job['error']}")
+    finally:
+        job['finished_at'] = datetime.now(timezone.utc).isoformat()
+        connection_jobs_inflight.pop((job['connection_id'], job['kind']), None)
+        publish_connection_job(job)
+
+def start_connection_job(kind: str, connection: dict, user: dict, runner, params: dict = None) -> dict:
+    """Enfileira o job (um por conexão e tipo: cliques repetidos entram no mesmo).
+    params diferencia pedidos do mesmo tipo (ex: número do pairing): outro valor com job em
+    andamento é recusado em vez de devolver o resultado do pedido anterior"""
+    prune_connection_jobs()
+    params = params or {}
+    job_id = connection_jobs_inflight.get((connection['id'], kind))
+    if job_id:
+        job = connection_jobs[job_id]
+        if job['params'] != params:
+            raise HTTPException(status_code=409, detail="Já existe uma solicitação em andamento para esta conexão com outros dados. Aguarde ela terminar.")
+        return job
+    
+    queued = sum(1 for job in connection_jobs.values() if job['requested_by'] == user['id'] and job['status'] == 'queued')
+    if queued >= CONNECTION_JOB_MAX_QUEUED_PER_USER:
+        raise HTTPException(status_code=429, detail="Muitas conexões aguardando. Tente novamente em instantes.")
+    
+    job = {
+        'id': str(uuid.uuid4()),
+        'kind': kind,  # connect, pairing_code
+        'params': params,
+        'connection_id': connection['id'],
+        'owner_id': connection['user_id'],
+        'requested_by': user['id'],
+        'status': 'queued',  # queued, running, done, failed, cancelled
+        'result': None,
+        'error': None,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'started_at': None,
+        'finished_at': None
+    }
+    connection_jobs[job['id']] = job
+    connection_jobs_inflight[(connection['id'], kind)] = job['id']
+    connection_job_tasks[job['id']] = spawn_background_task(run_connection_job(job, runner))
+    return job
+
+async def connection_job_result(job: dict):
+    """wait=true: aguarda o job e responde como antes (resultado do serviço ou HTTP 500)"""
+    task = connection_job_tasks.get(job['id'])
+    if task:
+        await asyncio.shield(task)
+    if job['status'] == 'failed' and job['result'] is None:
+        action = 'conectar' if job['kind'] == 'connect' else 'gerar código'
+        raise HTTPException(status_code=500, detail=f"Erro ao {action} {job['error']}")
+    return job['result']
+
+@api_router.get("/connection-jobs/{job_id}")
+async def get_connection_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Estado/resultado de um job de connect ou pairing-code"""
+    job = connection_jobs.get(job_id)
+    if not job or (user['role'] != 'admin' and user['id'] not in (job['requested_by'], job['owner_id'])):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return connection_job_response(job)
+
 @api_router.post("/connections/{connection_id}/connect")
-async def connect_whatsapp(connection_id: str, user: dict = Depends(get_current_user)):
-    """Iniciar conexão WhatsApp - com timeout maior para produção"""
-    logger.info(f"[DEBUG] /connect chamado para connection_id={connection_id}")
+async def connect_whatsapp(connection_id: str, wait: bool = False, user: dict = Depends(get_current_user)):
+    """Iniciar conexão WhatsApp em background (job); wait=true aguarda o resultado como antes"""
+    logger.debug(f"/connect chamado para connection_id={connection_id}")
     
     query = {'id': connection_id}
     if user['role'] != 'admin':
         query['user_id'] = user['id']
     
-    connection = await db.connections.find_one(query)
+    connection = await db.connections.find_one(query, {'_id': 0, 'id': 1, 'user_id': 1, 'name': 1, 'status': 1})
     if not connection:
-        logger.error(f"[DEBUG] Conexão não encontrada: {connection_id}")
+        logger.error(f"Conexão não encontrada: {connection_id}")
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
     
-    logger.info(f"[DEBUG] Conexão encontrada: {connection.get('name')}, status atual: {connection.get('status')}")
+    logger.debug(f"Conexão encontrada: {connection.get('name')}, status atual: {connection.get('status')}")
     
-    try:
-        logger.info(f"[DEBUG] Chamando WhatsApp service /connections/{connection_id}/start")
-        # Timeout maior (120s) pois criar conexão WhatsApp pode demorar
-        result = await whatsapp_request("POST", f"/connections/{connection_id}/start", timeout=120.0)
-        logger.info(f"[DEBUG] Resultado do start: {result}")
-        
+    async def start_session():
+        logger.debug(f"Chamando WhatsApp service /connections/{connection_id}/start")
+        result = await whatsapp_request("POST", f"/connections/{connection_id}/start", timeout=CONNECTION_JOB_TIMEOUT)
+        log_event(logger, logging.DEBUG, 'connect_start_result', connection_id=connection_id, result=result)
         await db.connections.update_one({'id': connection_id}, {'$set': {'status': 'connecting'}})
         return result
-    except httpx.ConnectError as e:
-        logger.error(f"[DEBUG] ERRO DE CONEXÃO com WhatsApp service: {e}")
-        raise HTTPException(status_code=500, detail=f"Serviço WhatsApp não está rodando. Vá em Configurações > Dependências e clique em 'Iniciar Serviço'")
-    except Exception as e:
-        error_type = type(e).__name__
-        error_msg = str(e) or "Erro desconhecido"
-        logger.error(f"[DEBUG] Erro ao conectar WhatsApp [{error_type}]: {error_msg}")
-        raise HTTPException(status_code=500, detail=f"Erro ao conectar [{error_type}]: {error_msg}")
+    
+    job = start_connection_job('connect', connection, user, start_session)
+    if wait:
+        return await connection_job_result(job)
+    return connection_job_response(job)
 
 @api_router.get("/connections/{connection_id}/qr")
 async def get_qr_code(connection_id: str, user: dict = Depends(get_current_user)):
     """Obter QR Code - direto e rápido"""
-    logger.info(f"[DEBUG] /qr chamado para connection_id={connection_id}")
+    logger.debug(f"/qr chamado para connection_id={connection_id}")
     
     query = {'id': connection_id}
     if user['role'] != 'admin':
@@ -3058,19 +4910,19 @@ async def get_qr_code(connection_id: str, user: dict = Depends(get_current_user)
     
     connection = await db.connections.find_one(query)
     if not connection:
-        logger.error(f"[DEBUG] Conexão não encontrada para QR: {connection_id}")
+        logger.error(f"Conexão não encontrada para QR: {connection_id}")
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
     
-    logger.info(f"[DEBUG] Buscando QR para conexão: {connection.get('name')}")
+    logger.debug(f"Buscando QR para conexão: {connection.get('name')}")
     
     try:
-        logger.info(f"[DEBUG] Chamando WhatsApp service /connections/{connection_id}/qr")
+        logger.debug(f"Chamando WhatsApp service /connections/{connection_id}/qr")
         result = await whatsapp_request("GET", f"/connections/{connection_id}/qr")
-        logger.info(f"[DEBUG] Resultado do QR: status={result.get('status')}, temQR={result.get('qrImage') is not None}")
+        logger.debug(f"Resultado do QR: status={result.get('status')}, temQR={result.get('qrImage') is not None}")
         
         # Atualiza status se conectou
         if result.get('status') == 'connected':
-            logger.info(f"[DEBUG] Conexão {connection_id} conectada! Phone: {result.get('phoneNumber')}")
+            logger.debug(f"Conexão {connection_id} conectada! Phone: {result.get('phoneNumber')}")
             await db.connections.update_one(
                 {'id': connection_id},
                 {'$set': {'status': 'connected', 'phone_number': result.get('phoneNumber')}}
@@ -3078,149 +4930,266 @@ async def get_qr_code(connection_id: str, user: dict = Depends(get_current_user)
         
         return result
     except Exception as e:
-        logger.error(f"[DEBUG] Erro ao obter QR: {e}")
+        logger.error(f"Erro ao obter QR: {e}")
         return {'qr': None, 'qrImage': None, 'status': 'error', 'error': str(e)}
 
 class PairingCodeRequest(BaseModel):
     phone_number: str
 
 @api_router.post("/connections/{connection_id}/pairing-code")
-async def request_pairing_code(connection_id: str, data: PairingCodeRequest, user: dict = Depends(get_current_user)):
-    """Solicitar código de pareamento (alternativa ao QR code)"""
+async def request_pairing_code(connection_id: str, data: PairingCodeRequest, wait: bool = False, user: dict = Depends(get_current_user)):
+    """Solicitar código de pareamento (alternativa ao QR code) em background (job)"""
     query = {'id': connection_id}
     if user['role'] != 'admin':
         query['user_id'] = user['id']
     
-    connection = await db.connections.find_one(query)
+    connection = await db.connections.find_one(query, {'_id': 0, 'id': 1, 'user_id': 1})
     if not connection:
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
     
-    try:
-        # Timeout maior (120s) pois criar conexão e gerar código pode demorar
+    async def generate_code():
         result = await whatsapp_request("POST", f"/connections/{connection_id}/pairing-code", {
             'phoneNumber': data.phone_number
-        }, timeout=120.0)
+        }, timeout=CONNECTION_JOB_TIMEOUT)
         
         if result.get('success'):
             await db.connections.update_one(
                 {'id': connection_id},
                 {'$set': {'status': 'waiting_code'}}
             )
-        
         return result
-    except Exception as e:
-        error_type = type(e).__name__
-        error_msg = str(e) or "Erro desconhecido"
-        logger.error(f"[DEBUG] Erro ao gerar pairing code [{error_type}]: {error_msg}")
-        raise HTTPException(status_code=500, detail=f"Erro ao gerar código [{error_type}]: {error_msg}")
+    
+    job = start_connection_job('pairing_code', connection, user, generate_code, {'phone_number': re.sub(r'\D', '', data.phone_number)})
+    if wait:
+        return await connection_job_result(job)
+    return connection_job_response(job)
+
+def group_list_hash(normalized: dict) -> str:
+    """Hash do conteúdo da lista de grupos (id, nome, participantes), independente da ordem"""
+    payload = json.dumps(sorted([group_id, name, count] for group_id, (name, count) in normalized.items()), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-async def sync_groups(connection_id: str, user_id: str):
-    """Sync groups from WhatsApp - mantém IDs existentes para preservar referências em campanhas"""
+async def sync_groups(connection_id: str, user_id: str, job: dict = None):
+    """Sync groups from WhatsApp - mantém IDs existentes para preservar referências em campanhas.
+    Com job, publica fase/progresso nele (ver start_group_sync)"""
+    job = job if job is not None else {}
     try:
-        logger.info(f"[DEBUG SYNC] Iniciando sync de grupos para conexão {connection_id}")
+        job['phase'] = 'fetching'
+        sync_logger.debug(f"Iniciando sync de grupos para conexão {connection_id}")
         result = await whatsapp_request("GET", f"/connections/{connection_id}/groups?refresh=true")
-        logger.info(f"[DEBUG SYNC] Resposta do WhatsApp service: {result}")
+        log_event(sync_logger, logging.DEBUG, 'sync_response', connection_id=connection_id, response=result)
         
         groups = result.get('groups', [])
         status = result.get('status', 'unknown')
         
-        logger.info(f"[DEBUG SYNC] Status da conexão: {status}, grupos encontrados: {len(groups)}")
+        sync_logger.debug(f"Status da conexão: {status}, grupos encontrados: {len(groups)}")
         
         if status != 'connected':
-            logger.warning(f"[DEBUG SYNC] Conexão não está ativa (status={status}). Grupos podem estar vazios.")
+            sync_logger.warning(f"Conexão não está ativa (status={status}). Grupos podem estar vazios.")
         
-        # IMPORTANTE: Ao invés de deletar tudo e recriar, fazer UPSERT para manter os IDs
-        # Isso preserva as referências das campanhas
+        # Lista normalizada (ordem e duplicatas do WhatsApp não importam) e seu hash
+        normalized = {g['id']: (g['name'], g['participants_count']) for g in groups}
+        groups_hash = group_list_hash(normalized)
+        job['total'] = len(normalized)
         
-        # Buscar grupos existentes no banco
-        existing_groups = await db.groups.find({'connection_id': connection_id}).to_list(1000)
-        existing_map = {g['group_id']: g for g in existing_groups}
+        connection = await db.connections.find_one({'id': connection_id}, {'_id': 0, 'groups_hash': 1})
+        if connection and connection.get('groups_hash') == groups_hash:
+            # Nada mudou desde o último sync: nenhuma escrita
+            job['processed'] = len(normalized)
+            job['unchanged'] = True
+            sync_logger.info(f"Grupos inalterados para conexão {connection_id} ({len(normalized)} grupos)")
+            return len(normalized)
         
-        synced_group_ids = []
+        # IMPORTANTE: Ao invés de deletar tudo e recriar, aplica só a diferença mantendo os IDs
+        # Isso preserva as referências das campanhas
+        job['phase'] = 'saving'
+        existing_groups = await db.groups.find(
+            {'connection_id': connection_id},
+            {'_id': 0, 'id': 1, 'group_id': 1, 'name': 1, 'participants_count': 1}
+        ).to_list(None)
+        existing_map = {g['group_id']: g for g in existing_groups}
         
-        # Atualizar ou inserir cada grupo
-        for g in groups:
-            whatsapp_group_id = g['id']
-            synced_group_ids.append(whatsapp_group_id)
-            
-            if whatsapp_group_id in existing_map:
-                # Grupo já existe - apenas atualizar nome e contagem
-                existing_doc = existing_map[whatsapp_group_id]
-                await db.groups.update_one(
-                    {'id': existing_doc['id']},
-                    {'$set': {
-                        'name': g['name'],
-                        'participants_count': g['participants_count']
-                    }}
-                )
-                logger.info(f"[DEBUG SYNC] Grupo atualizado: {g['name']} (manteve UUID: {existing_doc['id']})")
+        operations = []
+        changes = {'inserted': 0, 'updated': 0, 'removed': 0}
+        for whatsapp_group_id, (name, participants_count) in normalized.items():
+            existing_doc = existing_map.get(whatsapp_group_id)
+            if existing_doc:
+                # Grupo já existe - atualiza só se nome ou contagem mudaram
+                if existing_doc.get('name') != name or existing_doc.get('participants_count') != participants_count:
+                    operations.append(UpdateOne(
+                        {'id': existing_doc['id']},
+                        {'$set': {'name': name, 'participants_count': participants_count, **group_search_fields(name)}}
+                    ))
+                    changes['updated'] += 1
+                    sync_logger.debug("Grupo atualizado: %s (manteve UUID: %s)", name, existing_doc['id'])
             else:
                 # Grupo novo - inserir com novo UUID
-                new_group = {
+                operations.append(InsertOne({
                     'id': str(uuid.uuid4()),
                     'connection_id': connection_id,
                     'user_id': user_id,
                     'group_id': whatsapp_group_id,
-                    'name': g['name'],
-                    'participants_count': g['participants_count']
-                }
-                await db.groups.insert_one(new_group)
-                logger.info(f"[DEBUG SYNC] Grupo novo inserido: {g['name']}")
+                    'name': name,
+                    'participants_count': participants_count,
+                    **group_search_fields(name)
+                }))
+                changes['inserted'] += 1
+                sync_logger.debug("Grupo novo inserido: %s", name)
+        
+        # Grupos que não existem mais no WhatsApp
+        removed_ids = [doc['id'] for doc in existing_groups if doc['group_id'] not in normalized]
+        if removed_ids:
+            operations.append(DeleteMany({'id': {'$in': removed_ids}}))
+            changes['removed'] = len(removed_ids)
+            sync_logger.debug("Grupos removidos (não existem mais no WhatsApp): %d", len(removed_ids))
         
-        # Deletar grupos que não existem mais no WhatsApp
-        groups_to_delete = [doc_id for wid, doc in existing_map.items() if wid not in synced_group_ids]
-        if groups_to_delete:
-            for doc in existing_groups:
-                if doc['group_id'] not in synced_group_ids:
-                    await db.groups.delete_one({'id': doc['id']})
-                    logger.info(f"[DEBUG SYNC] Grupo removido (não existe mais no WhatsApp): {doc['name']}")
+        if operations:
+            await db.groups.bulk_write(operations, ordered=False)
+        job['processed'] = len(normalized)
+        job['changes'] = changes
         
-        # Atualiza contador de grupos na conexão
+        # Contador e hash só depois das escritas (falha no meio = próximo sync refaz a diferença)
         await db.connections.update_one(
             {'id': connection_id},
-            {'$set': {'groups_count': len(groups)}}
+            {'$set': {'groups_count': len(normalized), 'groups_hash': groups_hash}}
         )
         
-        logger.info(f"[DEBUG SYNC] Sincronizados {len(groups)} grupos para conexão {connection_id}")
-        return len(groups)
+        sync_logger.info(f"Sincronizados {len(normalized)} grupos para conexão {connection_id} ({changes})")
+        return len(normalized)
     except Exception as e:
-        logger.error(f"[DEBUG SYNC] Erro ao sincronizar grupos: {type(e).__name__}: {e}")
+        sync_logger.error(f"Erro ao sincronizar grupos: {type(e).__name__}: {e}")
+        job['error'] = f"{type(e).__name__}: {e}"
         return 0
 
+# ============= Group Sync Jobs =============
+
+# Jobs finalizados continuam consultáveis por este tempo (segundos)
+GROUP_SYNC_JOB_TTL = int(os.environ.get('GROUP_SYNC_JOB_TTL', '600'))
+
+group_sync_jobs = {}      # job_id -> estado público do job
+group_sync_tasks = {}     # job_id -> task (para quem quer aguardar o resultado)
+group_sync_inflight = {}  # connection_id -> job_id em andamento
+group_sync_latest = {}    # connection_id -> job_id mais recente
+
+def prune_group_sync_jobs():
+    """Remove jobs finalizados há mais de GROUP_SYNC_JOB_TTL"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=GROUP_SYNC_JOB_TTL)).isoformat()
+    for job_id, job in list(group_sync_jobs.items()):
+        if job['finished_at'] and job['finished_at'] < cutoff:
+            group_sync_jobs.pop(job_id, None)
+            group_sync_tasks.pop(job_id, None)
+            if group_sync_latest.get(job['connection_id']) == job_id:
+                group_sync_latest.pop(job['connection_id'], None)
+
+async def run_group_sync_job(job: dict):
+    connection_id = job['connection_id']
+    try:
+        # Diagnóstico: status da conexão no whatsapp-service
+        try:
+            ws_status = await whatsapp_request("GET", f"/connections/{connection_id}/status", timeout=10.0, auto_recover=False)
+            job['whatsapp_service_status'] = ws_status.get('status', 'unknown')
+            logger.debug(f"Status no whatsapp-service: {job['whatsapp_service_status']}")
+        except Exception as e:
+            job['whatsapp_service_status'] = 'service_error'
+            logger.error(f"Erro ao verificar status no whatsapp-service: {e}")
+        
+        job['count'] = await sync_groups(connection_id, job['user_id'], job)
+        job['status'] = 'failed' if job.get('error') else 'done'
+        return job['count']
+    except asyncio.CancelledError:
+        job['status'] = 'cancelled'
+        raise
+    finally:
+        job['phase'] = None
+        job['finished_at'] = datetime.now(timezone.utc).isoformat()
+        group_sync_inflight.pop(connection_id, None)
+
+def start_group_sync(connection: dict) -> dict:
+    """Single-flight por conexão: com um sync em andamento, o chamador entra no mesmo job"""
+    prune_group_sync_jobs()
+    job_id = group_sync_inflight.get(connection['id'])
+    if job_id:
+        return group_sync_jobs[job_id]
+    
+    job = {
+        'id': str(uuid.uuid4()),
+        'connection_id': connection['id'],
+        'user_id': connection['user_id'],
+        'status': 'running',  # running, done, failed, cancelled
+        'phase': 'queued',    # queued, fetching, saving
+        'total': 0,
+        'processed': 0,
+        'count': None,
+        'unchanged': False,   # hash da lista igual ao último sync: nada foi escrito
+        'changes': None,      # {'inserted', 'updated', 'removed'}
+        'error': None,
+        'whatsapp_service_status': None,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'finished_at': None
+    }
+    group_sync_jobs[job['id']] = job
+    group_sync_inflight[connection['id']] = job['id']
+    group_sync_latest[connection['id']] = job['id']
+    group_sync_tasks[job['id']] = spawn_background_task(run_group_sync_job(job))
+    return job
+
+async def wait_group_sync(job: dict) -> int:
+    """Aguarda o resultado do job (shield: quem desiste não cancela o sync dos outros)"""
+    task = group_sync_tasks.get(job['id'])
+    if task:
+        await asyncio.shield(task)
+    return job['count'] or 0
+
+def group_sync_job_response(job: dict, connection: dict) -> dict:
+    response = {key: value for key, value in job.items() if key != 'user_id'}
+    response['connection_status'] = connection.get('status')
+    return response
+
 @api_router.post("/connections/{connection_id}/refresh-groups")
-async def refresh_groups(connection_id: str, user: dict = Depends(get_current_user)):
-    """Atualizar lista de grupos - com diagnóstico completo"""
+async def refresh_groups(connection_id: str, wait: bool = False, user: dict = Depends(get_current_user)):
+    """Atualizar lista de grupos em background (um sync por conexão; chamadas concorrentes entram no mesmo job).
+    Progresso em GET /connections/{id}/group-sync; wait=true mantém a resposta antiga com os grupos"""
     query = {'id': connection_id}
     if user['role'] != 'admin':
         query['user_id'] = user['id']
     
-    connection = await db.connections.find_one(query)
+    connection = await db.connections.find_one(query, {'_id': 0, 'id': 1, 'user_id': 1, 'status': 1})
     if not connection:
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
     
-    logger.info(f"[DEBUG] refresh-groups chamado para {connection_id}, status no banco: {connection.get('status')}")
+    logger.debug(f"refresh-groups chamado para {connection_id}, status no banco: {connection.get('status')}")
     
-    # Verifica status da conexão no whatsapp-service
-    try:
-        ws_status = await whatsapp_request("GET", f"/connections/{connection_id}/status", timeout=10.0, auto_recover=False)
-        ws_connection_status = ws_status.get('status', 'unknown')
-        logger.info(f"[DEBUG] Status no whatsapp-service: {ws_connection_status}")
-    except Exception as e:
-        ws_connection_status = 'service_error'
-        logger.error(f"[DEBUG] Erro ao verificar status no whatsapp-service: {e}")
+    job = start_group_sync(connection)
+    if not wait:
+        return group_sync_job_response(job, connection)
     
-    # Sincroniza grupos
-    count = await sync_groups(connection_id, user['id'])
-    groups = await db.groups.find({'connection_id': connection_id}, {'_id': 0}).to_list(1000)
+    count = await wait_group_sync(job)
+    groups = await db.groups.find({'connection_id': connection_id}, {'_id': 0}).to_list(None)
     
     return {
         'groups': groups, 
         'count': len(groups),
         'connection_status': connection.get('status'),
-        'whatsapp_service_status': ws_connection_status,
+        'whatsapp_service_status': job.get('whatsapp_service_status'),
         'message': 'Grupos sincronizados' if count > 0 else 'Nenhum grupo encontrado. Verifique se a conexão está ativa no WhatsApp.'
     }
 
+@api_router.get("/connections/{connection_id}/group-sync")
+async def get_group_sync(connection_id: str, user: dict = Depends(get_current_user)):
+    """Progresso do sync de grupos em andamento (ou o último) da conexão"""
+    query = {'id': connection_id}
+    if user['role'] != 'admin':
+        query['user_id'] = user['id']
+    
+    connection = await db.connections.find_one(query, {'_id': 0, 'id': 1, 'status': 1})
+    if not connection:
+        raise HTTPException(status_code=404, detail="Conexão não encontrada")
+    
+    job = group_sync_jobs.get(group_sync_latest.get(connection_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Nenhuma sincronização recente para esta conexão")
+    return group_sync_job_response(job, connection)
+
 @api_router.post("/connections/{connection_id}/disconnect")
 async def disconnect_whatsapp(connection_id: str, user: dict = Depends(get_current_user)):
     query = {'id': connection_id}
@@ -3238,8 +5207,9 @@ async def disconnect_whatsapp(connection_id: str, user: dict = Depends(get_curre
     
     await db.connections.update_one(
         {'id': connection_id},
-        {'$set': {'status': 'disconnected', 'qr_code': None, 'qr_image': None, 'phone_number': None}}
+        {'$set': {'status': 'disconnected', 'phone_number': None, 'groups_hash': None}}
     )
+    await delete_qr_blob('connection', connection_id)
     await db.groups.delete_many({'connection_id': connection_id})
     
     return {'status': 'disconnected'}
@@ -3260,6 +5230,7 @@ async def delete_connection(connection_id: str, user: dict = Depends(get_current
         pass
     
     await db.groups.delete_many({'connection_id': connection_id})
+    await delete_qr_blob('connection', connection_id)
     
     return {'message': 'Conexão deletada'}
 
@@ -3275,15 +5246,172 @@ async def list_groups(connection_id: str, user: dict = Depends(get_current_user)
     if not connection:
         raise HTTPException(status_code=404, detail="Conexão não encontrada")
     
-    groups = await db.groups.find({'connection_id': connection_id}, {'_id': 0}).to_list(1000)
+    groups = await db.groups.find({'connection_id': connection_id}, {'_id': 0}).to_list(None)
     return groups
 
 @api_router.get("/groups", response_model=List[GroupResponse])
 async def list_all_groups(user: dict = Depends(get_current_user)):
     query = {} if user['role'] == 'admin' else {'user_id': user['id']}
-    groups = await db.groups.find(query, {'_id': 0}).to_list(1000)
+    groups = await db.groups.find(query, {'_id': 0}).to_list(None)
     return groups
 
+GROUPS_PAGE_MAX_LIMIT = 500
+GROUP_SEARCH_MIGRATION_BATCH = 500
+
+def normalize_group_name(name: str) -> str:
+    """Minúsculas e sem acentos ("Promoção" -> "promocao") - base da busca e da ordenação"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+def group_search_fields(name: str) -> dict:
+    """Campos derivados do nome: name_search (ordenação) e name_tokens (busca por prefixo de palavra).
+    Índices (user_id, name_search)/(user_id, name_tokens) atendem a listagem sem collation"""
+    normalized = normalize_group_name(name)
+    return {
+        'name_search': normalized,
+        'name_tokens': list(dict.fromkeys(re.findall(r'\w+', normalized)))
+    }
+
+def group_search_query(search: str) -> Optional[dict]:
+    """Cada palavra buscada precisa ser prefixo de uma palavra do nome (regex ancorada usa o índice)"""
+    tokens = re.findall(r'\w+', normalize_group_name(search))
+    if not tokens:
+        return None
+    return {'$all': [re.compile('^' + re.escape(token)) for token in tokens]}
+
+async def migrate_group_search_fields():
+    """Preenche name_search/name_tokens dos grupos gravados antes desses campos existirem"""
+    operations = []
+    migrated = 0
+    async for group in db.groups.find({'name_search': {'$exists': False}}, {'_id': 0, 'id': 1, 'name': 1}):
+        operations.append(UpdateOne({'id': group['id']}, {'$set': group_search_fields(group.get('name', ''))}))
+        if len(operations) >= GROUP_SEARCH_MIGRATION_BATCH:
+            await db.groups.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        await db.groups.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    if migrated:
+        logger.info(f"[GROUPS] Campos de busca preenchidos em {migrated} grupo(s)")
+
+@api_router.get("/groups/paginated")
+async def list_groups_paginated(
+    page: int = 1,
+    limit: int = 50,
+    search: str = None,
+    connection_id: str = None,
+    min_participants: int = None,
+    max_participants: int = None,
+    ids_only: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """Grupos paginados com busca por nome e filtros. ids_only=true devolve só os ids
+    de todos os grupos que casam com o filtro (para "selecionar todos").
+    A busca ignora maiúsculas/acentos e casa por início de palavra ("promo" acha "Grupo Promoções")"""
+    query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    if connection_id:
+        query['connection_id'] = connection_id
+    if search:
+        tokens = group_search_query(search)
+        if tokens:
+            query['name_tokens'] = tokens
+    
+    participants = {}
+    if min_participants is not None:
+        participants['$gte'] = min_participants
+    if max_participants is not None:
+        participants['$lte'] = max_participants
+    if participants:
+        query['participants_count'] = participants
+    
+    if ids_only:
+        cursor = db.groups.find(query, {'_id': 0, 'id': 1}).sort('name_search', 1)
+        ids = [group['id'] async for group in cursor]
+        return {'ids': ids, 'total': len(ids)}
+    
+    page = max(page, 1)
+    limit = min(max(limit, 1), GROUPS_PAGE_MAX_LIMIT)
+    skip = (page - 1) * limit
+    
+    total = await db.groups.count_documents(query)
+    groups = await db.groups.find(query, {'_id': 0}).sort('name_search', 1).skip(skip).limit(limit).to_list(limit)
+    
+    return {
+        'groups': [GroupResponse(**group).model_dump() for group in groups],
+        'total': total,
+        'page': page,
+        'limit': limit,
+        'total_pages': (total + limit - 1) // limit
+    }
+
+# ============= Group Lists =============
+
+def unique_in_order(ids: list) -> list:
+    """Remove duplicatas mantendo a primeira ocorrência (ordem de envio)"""
+    return list(dict.fromkeys(ids))
+
+async def owned_group_ids(group_ids: list, user: dict) -> list:
+    """Ids (sem duplicatas, na ordem informada) que são grupos do usuário (admin: que existem)"""
+    requested = unique_in_order(group_ids)
+    owner_query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    owned = await db.groups.find(
+        {**owner_query, 'id': {'$in': requested}},
+        {'_id': 0, 'id': 1}
+    ).to_list(None)
+    owned_ids = {group['id'] for group in owned}
+    return [group_id for group_id in requested if group_id in owned_ids]
+
+@api_router.get("/group-lists")
+async def list_group_lists(user: dict = Depends(get_current_user)):
+    """Listas de grupos salvas (sem os ids - só a contagem)"""
+    query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    return await db.group_lists.aggregate([
+        {'$match': query},
+        {'$sort': {'created_at': -1}},
+        {'$project': {
+            '_id': 0, 'id': 1, 'name': 1, 'user_id': 1, 'created_at': 1,
+            'group_count': {'$size': {'$ifNull': ['$group_ids', []]}}
+        }}
+    ]).to_list(None)
+
+@api_router.post("/group-lists")
+async def create_group_list(data: GroupListCreate, user: dict = Depends(get_current_user)):
+    """Salvar uma seleção de grupos para reutilizar em campanhas"""
+    # Só grupos do usuário: listas salvas são fonte confiável do group-set
+    group_ids = await owned_group_ids(data.group_ids, user)
+    if not group_ids:
+        raise HTTPException(status_code=400, detail="A lista precisa de ao menos um grupo válido")
+    
+    group_list = {
+        'id': str(uuid.uuid4()),
+        'name': data.name,
+        'group_ids': group_ids,
+        'user_id': user['id'],
+        'created_at': datetime.now(timezone.utc).isoformat()
+    }
+    
+    await db.group_lists.insert_one(group_list)
+    await log_activity(user['id'], user['username'], 'create', 'group_list', group_list['id'], data.name, f"Lista com {len(group_list['group_ids'])} grupos")
+    
+    group_list.pop('_id', None)
+    return group_list
+
+@api_router.delete("/group-lists/{group_list_id}")
+async def delete_group_list(group_list_id: str, user: dict = Depends(get_current_user)):
+    query = {'id': group_list_id}
+    if user['role'] != 'admin':
+        query['user_id'] = user['id']
+    
+    group_list = await db.group_lists.find_one(query)
+    if not group_list:
+        raise HTTPException(status_code=404, detail="Lista de grupos não encontrada")
+    
+    await db.group_lists.delete_one({'id': group_list_id})
+    await log_activity(user['id'], user['username'], 'delete', 'group_list', group_list_id, group_list['name'], 'Lista de grupos excluída')
+    
+    return {'message': 'Lista de grupos deletada'}
+
 # ============= Images =============
 
 @api_router.post("/images", response_model=ImageResponse)
@@ -3499,14 +5627,19 @@ async def ensure_whatsapp_running():
     """Ensure WhatsApp service is running before campaign execution"""
     global whatsapp_process
     
-    # Check if WhatsApp service is responding
-    try:
-        async with httpx.AsyncClient(timeout=3.0) as http_client:
-            response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
-            if response.status_code == 200:
-                return True
-    except:
-        pass
+    # Check if WhatsApp service is responding (cache curto compartilhado com o circuito)
+    if await get_bridge_health():
+        return True
+    
+    # Falha em cache ou circuito aberto não provam que o processo caiu: só um /health
+    # real que falhe justifica subir outro node
+    async with bridge_health_lock:
+        probed = await probe_bridge_health()
+    if probed:
+        return True
+    if probed is None:
+        logger.warning(f"WhatsApp service indisponível (circuito {bridge_breaker['state']}) - não inicia outro processo")
+        return False
     
     logger.info("WhatsApp service não está rodando. Tentando iniciar...")
     
@@ -3540,7 +5673,7 @@ async def ensure_whatsapp_running():
         for i in range(10):
             await asyncio.sleep(1)
             try:
-                async with httpx.AsyncClient(timeout=2.0) as http_client:
+                async with whatsapp_http_client(2.0) as http_client:
                     response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
                     if response.status_code == 200:
                         logger.info("WhatsApp service iniciado automaticamente")
@@ -3554,196 +5687,413 @@ async def ensure_whatsapp_running():
         logger.error(f"Erro ao iniciar WhatsApp service: {e}")
         return False
 
-async def execute_campaign(campaign_id: str, resume_from_index: int = 0):
-    """Execute campaign - send messages to groups
-    
-    Args:
-        campaign_id: ID da campanha
-        resume_from_index: Índice do grupo para retomar (0 = início)
-    """
-    campaign = await db.campaigns.find_one({'id': campaign_id})
-    if not campaign:
-        logger.error(f"Campanha {campaign_id} não encontrada")
-        return
-    
-    if campaign['status'] == 'paused':
-        logger.info(f"Campanha {campaign_id} pausada, pulando execução")
-        return
-    
-    # Ensure WhatsApp service is running before execution
-    whatsapp_ready = await ensure_whatsapp_running()
-    if not whatsapp_ready:
-        logger.error(f"Campanha {campaign_id}: WhatsApp service não disponível")
-        await db.campaigns.update_one(
-            {'id': campaign_id},
-            {'$set': {'status': 'failed', 'error': 'WhatsApp service não disponível'}}
-        )
-        return
+# ============= Campaign Events (SSE) =============
+
+# Pub/sub em processo: execute_campaign publica progresso, mudanças de status e
+# erros de envio; cada conexão SSE assina com o escopo do usuário. Com mais de um
+# processo, CAMPAIGN_CHANGE_STREAMS=true passa a alimentar o pub/sub a partir do
+# change stream da coleção campaigns (requer replica set).
+CAMPAIGN_CHANGE_STREAMS = os.environ.get('CAMPAIGN_CHANGE_STREAMS', 'false').lower() == 'true'
+CAMPAIGN_EVENTS_QUEUE_SIZE = 256
+CAMPAIGN_PROGRESS_FIELDS = ('sent_count', 'current_group_index')
+CAMPAIGN_STATUS_FIELDS = ('error', 'last_run', 'next_run')
+
+campaign_event_subscribers = set()
+
+class CampaignEventSubscriber:
+    """Fila de eventos de uma conexão SSE (user_id None = todas as campanhas)"""
     
-    # Get current progress if resuming
-    current_sent = campaign.get('sent_count', 0) if resume_from_index > 0 else 0
-    current_group_index = campaign.get('current_group_index', 0) if resume_from_index > 0 else 0
+    def __init__(self, user_id: Optional[str]):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=CAMPAIGN_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
     
-    # Use the larger of resume_from_index or saved progress
-    start_index = max(resume_from_index, current_group_index)
+    def push(self, event: str, data: dict):
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            # Cliente lento: descarta e pede para recarregar a lista
+            self.overflowed = True
+
+def campaign_events_from_update(campaign: dict, updated: dict) -> list:
+    """Traduz os campos alterados de uma campanha em eventos (só deltas)"""
+    events = []
+    campaign_id = campaign['id']
     
-    await db.campaigns.update_one(
-        {'id': campaign_id},
-        {'$set': {
-            'status': 'running', 
-            'last_run': datetime.now(timezone.utc).isoformat(),
-            'current_group_index': start_index
-        }}
-    )
+    progress = {field: updated[field] for field in CAMPAIGN_PROGRESS_FIELDS if field in updated}
+    if progress:
+        events.append(('progress', {
+            'campaign_id': campaign_id,
+            'total_groups': len(campaign.get('group_ids', [])),
+            **progress
+        }))
     
-    sent_count = current_sent
-    connection_id = campaign['connection_id']
+    if 'status' in updated:
+        events.append(('status', {
+            'campaign_id': campaign_id,
+            'status': updated['status'],
+            **{field: updated[field] for field in CAMPAIGN_STATUS_FIELDS if field in updated}
+        }))
     
-    if start_index > 0:
-        logger.info(f"Campanha {campaign_id} retomando do grupo {start_index}/{len(campaign['group_ids'])}")
+    if updated.get('last_send_error'):
+        events.append(('send_error', {'campaign_id': campaign_id, **updated['last_send_error']}))
     
+    return events
+
+def push_campaign_events(campaign: dict, events: list):
+    if not events:
+        return
+    for subscriber in list(campaign_event_subscribers):
+        if subscriber.user_id is not None and subscriber.user_id != campaign.get('user_id'):
+            continue
+        for event, data in events:
+            subscriber.push(event, data)
+
+def dispatch_campaign_events(campaign: dict, updated: dict):
+    push_campaign_events(campaign, campaign_events_from_update(campaign, updated))
+
+def publish_campaign_update(campaign: dict, fields: dict):
+    """Eventos de um $set já gravado (com change streams eles vêm do próprio stream)"""
+    if not CAMPAIGN_CHANGE_STREAMS:
+        dispatch_campaign_events(campaign, fields)
+
+def publish_campaign_change(campaign: dict, action: str):
+    """created/updated/deleted: o cliente recarrega a lista. Mudanças de conteúdo não
+    viram eventos do change stream, então são publicadas sempre por aqui"""
+    push_campaign_events(campaign, [('changed', {'campaign_id': campaign['id'], 'action': action})])
+
+async def update_campaign_state(campaign: dict, fields: dict):
+    """$set na campanha + publicação dos eventos correspondentes"""
+    await db.campaigns.update_one({'id': campaign['id']}, {'$set': fields})
+    publish_campaign_update(campaign, fields)
+
+async def watch_campaign_changes():
+    """Alimenta o pub/sub a partir do change stream (eventos de todos os processos)"""
+    pipeline = [{'$match': {'operationType': 'update'}}]
+    while True:
+        try:
+            async with db.campaigns.watch(pipeline, full_document='updateLookup') as stream:
+                logger.info("[CAMPAIGN EVENTS] Change stream de campaigns ativo")
+                async for change in stream:
+                    campaign = change.get('fullDocument')
+                    if campaign:
+                        dispatch_campaign_events(campaign, change['updateDescription']['updatedFields'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[CAMPAIGN EVENTS] Change stream interrompido: {e}")
+            await asyncio.sleep(5)
+
+async def stream_campaign_events(subscriber: CampaignEventSubscriber):
+    campaign_event_subscribers.add(subscriber)
     try:
-        # Determine which message/image to send
-        message_to_send = None
-        image_base64 = None
-        
-        # Check if campaign has multiple messages
-        if campaign.get('messages') and len(campaign['messages']) > 0:
-            # Randomly select a message variation
-            import random
-            selected_msg = random.choice(campaign['messages'])
-            message_to_send = selected_msg.get('message')
-            
-            # Get image for selected message using helper function
-            if selected_msg.get('image_id'):
-                image_base64 = await get_image_base64(selected_msg['image_id'])
-        else:
-            # Single message mode
-            message_to_send = campaign.get('message')
-            
-            # Get image if exists using helper function
-            if campaign.get('image_id'):
-                image_base64 = await get_image_base64(campaign['image_id'])
-        
-        # Get groups to process, starting from the resume index
-        groups_to_process = campaign['group_ids'][start_index:]
-        
-        for idx, group_id in enumerate(groups_to_process):
-            current_index = start_index + idx
-            
+        yield sse_event('ready', {'change_streams': CAMPAIGN_CHANGE_STREAMS})
+        while True:
             try:
-                # Get actual group_id from our db
-                group = await db.groups.find_one({'id': group_id})
-                if not group:
-                    # Update index even if group not found
-                    await db.campaigns.update_one(
-                        {'id': campaign_id},
-                        {'$set': {'current_group_index': current_index + 1}}
-                    )
-                    continue
-                
-                await whatsapp_request("POST", f"/connections/{connection_id}/send", {
-                    'groupId': group['group_id'],
+                event, data = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield sse_keepalive()
+                continue
+            yield sse_event(event, data)
+            if subscriber.overflowed and subscriber.queue.empty():
+                subscriber.overflowed = False
+                yield sse_event('resync', {'reason': 'overflow'})
+    finally:
+        campaign_event_subscribers.discard(subscriber)
+
+@api_router.get("/campaigns/events")
+async def campaign_events(owner_filter: str = "all", user: dict = Depends(get_current_user)):
+    """SSE com progresso, status e erros de envio das campanhas do usuário"""
+    # Mesmo escopo de /campaigns/paginated
+    if user['role'] == 'admin' and owner_filter != 'mine':
+        subscriber = CampaignEventSubscriber(None)
+    else:
+        subscriber = CampaignEventSubscriber(user['id'])
+    return sse_response(stream_campaign_events(subscriber))
+
+# ============= Campaign Sending =============
+
+# Grupos por chamada ao /send-batch do WhatsApp service. Padrão 1 = um request por grupo
+# com checkpoint a cada envio. Em lote o progresso só é salvo por bloco: um restart no meio
+# reenvia os grupos já enviados do bloco, e timeout/erro do request marca o bloco inteiro como falha
+CAMPAIGN_SEND_BATCH_SIZE = int(os.environ.get('CAMPAIGN_SEND_BATCH_SIZE', '1'))
+# Folga de timeout por grupo do lote (reconexões/retentativas dentro do serviço)
+BATCH_SEND_TIMEOUT_PER_GROUP = 60
+
+async def send_campaign_sequentially(campaign: dict, start_index: int, sent_count: int, message_to_send: str, image_base64: str) -> int:
+    """Um request por grupo, salvando o progresso após cada envio"""
+    connection_id = campaign['connection_id']
+    
+    # Get groups to process, starting from the resume index
+    groups_to_process = campaign['group_ids'][start_index:]
+
+    for idx, group_id in enumerate(groups_to_process):
+        current_index = start_index + idx
+
+        try:
+            # Get actual group_id from our db
+            group = await db.groups.find_one({'id': group_id})
+            if not group:
+                # Update index even if group not found
+                await update_campaign_state(campaign, {'current_group_index': current_index + 1})
+                continue
+
+            deadline = bridge_wait_deadline()
+            while True:
+                # Circuito aberto: espera (sem avançar o índice); após BRIDGE_CAMPAIGN_MAX_WAIT para a campanha
+                await wait_for_bridge_circuit(deadline)
+                try:
+                    await whatsapp_request("POST", f"/connections/{connection_id}/send", {
+                        'groupId': group['group_id'],
+                        'message': message_to_send,
+                        'imageBase64': image_base64,
+                        'caption': message_to_send if image_base64 else None
+                    })
+                    break
+                except BridgeUnavailableError:
+                    # Circuito abriu antes do envio - nada foi enviado, tenta o mesmo grupo de novo
+                    # (dentro do mesmo prazo)
+                    check_bridge_wait_deadline(deadline)
+                    continue
+
+            sent_count += 1
+
+            # Save progress after each successful send
+            await update_campaign_state(campaign, {
+                'sent_count': sent_count,
+                'current_group_index': current_index + 1
+            })
+
+            # Log each send for dashboard stats
+            await record_send_log(campaign, group_id, group.get('name', ''), 'sent')
+
+            # Delay between messages
+            await asyncio.sleep(campaign['delay_seconds'])
+
+        except BridgeUnavailableError:
+            # Não marca o grupo como falho: a campanha para com o índice atual preservado
+            raise
+
+        except Exception as e:
+            error_msg = str(e) if str(e) else 'Erro desconhecido no envio'
+            logger.error(f"Erro ao enviar para grupo {group_id}: {error_msg}")
+
+            # Get group name for better error logging
+            group_name = ''
+            if group:
+                group_name = group.get('name', '')
+            else:
+                # Try to find group info
+                found_group = await db.groups.find_one({'id': group_id})
+                group_name = found_group.get('name', 'Grupo não encontrado') if found_group else 'Grupo não encontrado'
+
+            # Save progress even on error (último erro vai junto para os assinantes)
+            await update_campaign_state(campaign, {
+                'current_group_index': current_index + 1,
+                'last_send_error': {
+                    'group_id': group_id,
+                    'group_name': group_name,
+                    'error': error_msg,
+                    'at': datetime.now(timezone.utc).isoformat()
+                }
+            })
+
+            # Log failed send with detailed error
+            await record_send_log(campaign, group_id, group_name, 'failed', error_msg)
+    
+    return sent_count
+
+async def send_campaign_in_batches(campaign: dict, start_index: int, sent_count: int, message_to_send: str, image_base64: str) -> int:
+    """Envia blocos ordenados de grupos via /send-batch. O WhatsApp service espaça os envios
+    com o delay da campanha e devolve o resultado por grupo; o progresso é salvo a cada bloco."""
+    connection_id = campaign['connection_id']
+    group_ids = campaign['group_ids']
+    delay = campaign['delay_seconds']
+    index = start_index
+    
+    while index < len(group_ids):
+        chunk = group_ids[index:index + CAMPAIGN_SEND_BATCH_SIZE]
+        groups = await db.groups.find({'id': {'$in': chunk}}, {'_id': 0, 'id': 1, 'group_id': 1, 'name': 1}).to_list(None)
+        groups_by_id = {group['id']: group for group in groups}
+        # Grupos que não existem mais são pulados (mesmo comportamento do envio unitário)
+        targets = [group_id for group_id in chunk if group_id in groups_by_id]
+        
+        results = []
+        deadline = bridge_wait_deadline()
+        while targets:
+            # Circuito aberto: espera sem avançar o índice
+            await wait_for_bridge_circuit(deadline)
+            try:
+                response = await whatsapp_request("POST", f"/connections/{connection_id}/send-batch", {
+                    'groupIds': [groups_by_id[group_id]['group_id'] for group_id in targets],
                     'message': message_to_send,
                     'imageBase64': image_base64,
-                    'caption': message_to_send if image_base64 else None
-                })
-                
-                sent_count += 1
-                
-                # Save progress after each successful send
-                await db.campaigns.update_one(
-                    {'id': campaign_id},
-                    {'$set': {
-                        'sent_count': sent_count,
-                        'current_group_index': current_index + 1
-                    }}
-                )
-                
-                # Log each send for dashboard stats
-                await db.send_logs.insert_one({
-                    'id': str(uuid.uuid4()),
-                    'campaign_id': campaign_id,
-                    'user_id': campaign.get('user_id'),
-                    'group_id': group_id,
-                    'group_name': group.get('name', ''),
-                    'connection_id': connection_id,
-                    'sent_at': datetime.now(timezone.utc).isoformat(),
-                    'status': 'sent'
-                })
-                
-                # Delay between messages
-                await asyncio.sleep(campaign['delay_seconds'])
-                
+                    'caption': message_to_send if image_base64 else None,
+                    'delaySeconds': delay
+                }, timeout=len(targets) * (delay + BATCH_SEND_TIMEOUT_PER_GROUP), auto_recover=False)
+                if not response.get('success'):
+                    raise Exception(response.get('error') or 'Falha no envio em lote')
+                results = response.get('results') or []
+                break
+            except BridgeUnavailableError:
+                check_bridge_wait_deadline(deadline)
+                continue
             except Exception as e:
-                error_msg = str(e) if str(e) else 'Erro desconhecido no envio'
+                # Resultado do lote desconhecido: registra como falha em vez de reenviar (evita duplicar)
+                error_msg = str(e) if str(e) else 'Erro desconhecido no envio em lote'
+                results = [{'success': False, 'error': error_msg} for _ in targets]
+                break
+        
+        send_logs = []
+        last_send_error = None
+        for position, group_id in enumerate(targets):
+            result = results[position] if position < len(results) else {'success': False, 'error': 'Sem resultado do WhatsApp service'}
+            group_name = groups_by_id[group_id].get('name', '')
+            if result.get('success'):
+                sent_count += 1
+                send_logs.append(build_send_log(campaign, group_id, group_name, 'sent'))
+            else:
+                error_msg = result.get('error') or 'Erro desconhecido no envio'
                 logger.error(f"Erro ao enviar para grupo {group_id}: {error_msg}")
-                
-                # Save progress even on error
-                await db.campaigns.update_one(
-                    {'id': campaign_id},
-                    {'$set': {'current_group_index': current_index + 1}}
-                )
-                
-                # Get group name for better error logging
-                group_name = ''
-                if group:
-                    group_name = group.get('name', '')
-                else:
-                    # Try to find group info
-                    found_group = await db.groups.find_one({'id': group_id})
-                    group_name = found_group.get('name', 'Grupo não encontrado') if found_group else 'Grupo não encontrado'
-                
-                # Log failed send with detailed error
-                await db.send_logs.insert_one({
-                    'id': str(uuid.uuid4()),
-                    'campaign_id': campaign_id,
-                    'user_id': campaign.get('user_id'),
+                send_logs.append(build_send_log(campaign, group_id, group_name, 'failed', error_msg))
+                last_send_error = {
                     'group_id': group_id,
                     'group_name': group_name,
-                    'connection_id': connection_id,
-                    'sent_at': datetime.now(timezone.utc).isoformat(),
-                    'status': 'failed',
-                    'error': error_msg
-                })
+                    'error': error_msg,
+                    'at': datetime.now(timezone.utc).isoformat()
+                }
+        
+        # Checkpoint do bloco
+        index += len(chunk)
+        checkpoint = {'sent_count': sent_count, 'current_group_index': index}
+        if last_send_error:
+            checkpoint['last_send_error'] = last_send_error
+        await update_campaign_state(campaign, checkpoint)
+        if send_logs:
+            await db.send_logs.insert_many(send_logs)
+        
+        # Espaçamento entre o último envio do bloco e o primeiro do próximo
+        if index < len(group_ids) and results and results[-1].get('success'):
+            await asyncio.sleep(delay)
+    
+    return sent_count
+
+# Campanhas com execute_campaign em andamento neste processo - o status no banco
+# não basta (fica 'running' após um restart e durante a fila de retomada)
+executing_campaigns = set()
+
+def campaign_is_executing(campaign_id: str) -> bool:
+    return campaign_id in executing_campaigns
+
+async def execute_campaign(campaign_id: str, resume_from_index: int = 0):
+    """Execute campaign - send messages to groups
+    
+    Args:
+        campaign_id: ID da campanha
+        resume_from_index: Índice do grupo para retomar (0 = início)
+    """
+    if campaign_is_executing(campaign_id):
+        logger.info(f"Campanha {campaign_id} já está em execução, ignorando nova execução")
+        return
+    
+    executing_campaigns.add(campaign_id)
+    try:
+        await run_campaign_execution(campaign_id, resume_from_index)
+    finally:
+        executing_campaigns.discard(campaign_id)
+
+async def run_campaign_execution(campaign_id: str, resume_from_index: int):
+    campaign = await db.campaigns.find_one({'id': campaign_id})
+    if not campaign:
+        logger.error(f"Campanha {campaign_id} não encontrada")
+        return
+    
+    if campaign['status'] == 'paused':
+        logger.info(f"Campanha {campaign_id} pausada, pulando execução")
+        return
+    
+    # Ensure WhatsApp service is running before execution
+    whatsapp_ready = await ensure_whatsapp_running()
+    if not whatsapp_ready:
+        logger.error(f"Campanha {campaign_id}: WhatsApp service não disponível")
+        await update_campaign_state(campaign, {'status': 'failed', 'error': 'WhatsApp service não disponível'})
+        return
+    
+    # Get current progress if resuming
+    current_sent = campaign.get('sent_count', 0) if resume_from_index > 0 else 0
+    current_group_index = campaign.get('current_group_index', 0) if resume_from_index > 0 else 0
+    
+    # Use the larger of resume_from_index or saved progress
+    start_index = max(resume_from_index, current_group_index)
+    
+    await update_campaign_state(campaign, {
+        'status': 'running', 
+        'last_run': datetime.now(timezone.utc).isoformat(),
+        'current_group_index': start_index
+    })
+    
+    sent_count = current_sent
+    
+    if start_index > 0:
+        logger.info(f"Campanha {campaign_id} retomando do grupo {start_index}/{len(campaign['group_ids'])}")
+    
+    try:
+        # Determine which message/image to send
+        message_to_send = None
+        image_base64 = None
+        
+        # Check if campaign has multiple messages
+        if campaign.get('messages') and len(campaign['messages']) > 0:
+            # Randomly select a message variation
+            import random
+            selected_msg = random.choice(campaign['messages'])
+            message_to_send = selected_msg.get('message')
+            
+            # Get image for selected message using helper function
+            if selected_msg.get('image_id'):
+                image_base64 = await get_image_base64(selected_msg['image_id'])
+        else:
+            # Single message mode
+            message_to_send = campaign.get('message')
+            
+            # Get image if exists using helper function
+            if campaign.get('image_id'):
+                image_base64 = await get_image_base64(campaign['image_id'])
+        
+        # Lotes no WhatsApp service (espaçamento feito lá) ou um request por grupo
+        if CAMPAIGN_SEND_BATCH_SIZE > 1:
+            sent_count = await send_campaign_in_batches(campaign, start_index, sent_count, message_to_send, image_base64)
+        else:
+            sent_count = await send_campaign_sequentially(campaign, start_index, sent_count, message_to_send, image_base64)
         
         # Update status based on schedule type
         if campaign['schedule_type'] == 'once':
             new_status = 'completed'
-            await db.campaigns.update_one(
-                {'id': campaign_id},
-                {'$set': {
-                    'status': new_status, 
-                    'sent_count': sent_count, 
-                    'last_run': datetime.now(timezone.utc).isoformat(), 
-                    'next_run': None,
-                    'current_group_index': 0  # Reset index after completion
-                }}
-            )
+            await update_campaign_state(campaign, {
+                'status': new_status, 
+                'sent_count': sent_count, 
+                'last_run': datetime.now(timezone.utc).isoformat(), 
+                'next_run': None,
+                'current_group_index': 0  # Reset index after completion
+            })
         else:
             # Para campanhas recorrentes, reseta o contador para próxima execução
             new_status = 'active'
             next_run = calculate_next_run(campaign)
-            await db.campaigns.update_one(
-                {'id': campaign_id},
-                {'$set': {
-                    'status': new_status, 
-                    'sent_count': 0, 
-                    'last_run': datetime.now(timezone.utc).isoformat(), 
-                    'next_run': next_run,
-                    'current_group_index': 0  # Reset index for next run
-                }}
-            )
+            await update_campaign_state(campaign, {
+                'status': new_status, 
+                'sent_count': 0, 
+                'last_run': datetime.now(timezone.utc).isoformat(), 
+                'next_run': next_run,
+                'current_group_index': 0  # Reset index for next run
+            })
         
         logger.info(f"Campanha {campaign_id} executada. Enviado para {sent_count} grupos.")
         
     except Exception as e:
         logger.error(f"Campanha {campaign_id} falhou: {str(e)}")
         # Keep current_group_index so it can resume later
-        await db.campaigns.update_one(
-            {'id': campaign_id},
-            {'$set': {'status': 'failed', 'error': str(e)}}
-        )
+        await update_campaign_state(campaign, {'status': 'failed', 'error': str(e)})
 
 def calculate_next_run(campaign: dict) -> str:
     """Calculate next run time for recurring campaigns"""
@@ -3912,20 +6262,56 @@ async def create_campaign(data: CampaignCreate, background_tasks: BackgroundTask
     }
     
     await db.campaigns.insert_one(campaign)
+    publish_campaign_change(campaign, 'created')
     await log_activity(user['id'], user['username'], 'create', 'campaign', campaign['id'], data.title, 'Campanha criada')
     
     return campaign
 
-@api_router.get("/campaigns", response_model=List[CampaignResponse])
-async def list_campaigns(page: int = 1, limit: int = 20, user: dict = Depends(get_current_user)):
+# Projeção da listagem (view=summary): só os campos dos cards; group_ids e as
+# mensagens completas ficam no detalhe (GET /campaigns/{campaign_id})
+CAMPAIGN_PREVIEW_CHARS = 160
+CAMPAIGN_SUMMARY_COMPUTED = {
+    'group_count': {'$size': {'$ifNull': ['$group_ids', []]}},
+    'message_count': {'$size': {'$ifNull': ['$messages', []]}},
+    # Texto da primeira variação (ou da mensagem única), cortado
+    'message_preview': {'$substrCP': [
+        {'$ifNull': [{'$arrayElemAt': ['$messages.message', 0]}, {'$ifNull': ['$message', '']}]},
+        0, CAMPAIGN_PREVIEW_CHARS
+    ]},
+    # Imagem de cada variação, na ordem (None = variação sem imagem)
+    'message_image_ids': {'$map': {'input': {'$ifNull': ['$messages', []]}, 'as': 'msg', 'in': '$$msg.image_id'}}
+}
+CAMPAIGN_SUMMARY_PROJECTION = {
+    '_id': 0,
+    **{field: 1 for field in CampaignSummaryResponse.model_fields if field not in CAMPAIGN_SUMMARY_COMPUTED},
+    **CAMPAIGN_SUMMARY_COMPUTED
+}
+CAMPAIGN_LIST_VIEWS = ('full', 'summary')
+
+async def find_campaigns(query: dict, skip: int, limit: int, view: str) -> list:
+    if view not in CAMPAIGN_LIST_VIEWS:
+        raise HTTPException(status_code=400, detail="view inválido (use 'full' ou 'summary')")
+    
+    if view == 'summary':
+        return await db.campaigns.aggregate([
+            {'$match': query},
+            {'$sort': {'created_at': -1}},
+            {'$skip': skip},
+            {'$limit': limit},
+            {'$project': CAMPAIGN_SUMMARY_PROJECTION}
+        ]).to_list(limit)
+    
+    return await db.campaigns.find(query, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
+
+@api_router.get("/campaigns", response_model=List[Union[CampaignResponse, CampaignSummaryResponse]])
+async def list_campaigns(page: int = 1, limit: int = 20, view: str = "full", user: dict = Depends(get_current_user)):
     query = {} if user['role'] == 'admin' else {'user_id': user['id']}
     skip = (page - 1) * limit
-    campaigns = await db.campaigns.find(query, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
-    return campaigns
+    return await find_campaigns(query, skip, limit, view)
 
 @api_router.get("/campaigns/paginated")
-async def list_campaigns_paginated(page: int = 1, limit: int = 12, owner_filter: str = "all", user: dict = Depends(get_current_user)):
-    """List campaigns with pagination info. owner_filter: 'all' or 'mine' (admin only)"""
+async def list_campaigns_paginated(page: int = 1, limit: int = 12, owner_filter: str = "all", view: str = "full", user: dict = Depends(get_current_user)):
+    """List campaigns with pagination info. owner_filter: 'all' or 'mine' (admin only). view: 'full' or 'summary'"""
     # Build query based on role and filter
     if user['role'] == 'admin':
         # Admin can filter: all = todos, mine = apenas do admin
@@ -3938,13 +6324,15 @@ async def list_campaigns_paginated(page: int = 1, limit: int = 12, owner_filter:
     
     skip = (page - 1) * limit
     total = await db.campaigns.count_documents(query)
-    campaigns = await db.campaigns.find(query, {'_id': 0}).sort('created_at', -1).skip(skip).limit(limit).to_list(limit)
+    campaigns = await find_campaigns(query, skip, limit, view)
     
-    # Add owner username for admin view
+    # Add owner username for admin view (uma consulta para a página inteira)
     if user['role'] == 'admin' and owner_filter == 'all':
+        owner_ids = list({campaign.get('user_id') for campaign in campaigns})
+        owners = await db.users.find({'id': {'$in': owner_ids}}, {"_id": 0, "id": 1, "username": 1}).to_list(len(owner_ids))
+        usernames = {owner['id']: owner['username'] for owner in owners}
         for campaign in campaigns:
-            owner = await db.users.find_one({'id': campaign.get('user_id')}, {"_id": 0, "username": 1})
-            campaign['owner_username'] = owner['username'] if owner else 'Admin'
+            campaign['owner_username'] = usernames.get(campaign.get('user_id'), 'Admin')
     
     return {
         'campaigns': campaigns,
@@ -3976,16 +6364,7 @@ async def pause_campaign(campaign_id: str, user: dict = Depends(get_current_user
         raise HTTPException(status_code=404, detail="Campanha não encontrada")
     
     # Calculate remaining time if there's a next_run
-    remaining_seconds = None
-    if campaign.get('next_run'):
-        try:
-            next_run_dt = datetime.fromisoformat(campaign['next_run'].replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
-            remaining_seconds = int((next_run_dt - now).total_seconds())
-            if remaining_seconds < 0:
-                remaining_seconds = None
-        except:
-            pass
+    remaining_seconds = remaining_seconds_until(campaign.get('next_run'))
     
     try:
         scheduler.remove_job(campaign_id)
@@ -3997,14 +6376,11 @@ async def pause_campaign(campaign_id: str, user: dict = Depends(get_current_user
     except:
         pass
     
-    await db.campaigns.update_one(
-        {'id': campaign_id}, 
-        {'$set': {
-            'status': 'paused',
-            'paused_at': datetime.now(timezone.utc).isoformat(),
-            'remaining_time_on_pause': remaining_seconds
-        }}
-    )
+    await update_campaign_state(campaign, {
+        'status': 'paused',
+        'paused_at': datetime.now(timezone.utc).isoformat(),
+        'remaining_time_on_pause': remaining_seconds
+    })
     
     await log_activity(user['id'], user['username'], 'pause', 'campaign', campaign_id, campaign['title'], 'Campanha pausada')
     
@@ -4028,7 +6404,7 @@ async def update_campaign(campaign_id: str, data: CampaignCreate, user: dict = D
     logger.info(f"[UPDATE_CAMPAIGN] Current specific_times in DB: {campaign.get('specific_times')}")
     
     # Não permitir edição de campanhas em execução
-    if campaign['status'] == 'running':
+    if campaign['status'] in ('running', 'queued'):
         raise HTTPException(status_code=400, detail="Não é possível editar campanha em execução")
     
     # Get image URL if exists
@@ -4101,6 +6477,7 @@ async def update_campaign(campaign_id: str, data: CampaignCreate, user: dict = D
     
     updated = await db.campaigns.find_one({'id': campaign_id}, {'_id': 0})
     logger.info(f"[UPDATE_CAMPAIGN] After update, specific_times in DB: {updated.get('specific_times')}")
+    publish_campaign_change(updated, 'updated')
     
     # IMPORTANTE: Se a campanha estava ativa, reagendar os jobs com os novos horários
     if campaign['status'] == 'active':
@@ -4147,20 +6524,19 @@ async def start_campaign_now(campaign_id: str, background_tasks: BackgroundTasks
     campaign = await db.campaigns.find_one(query, {'_id': 0})
     if not campaign:
         raise HTTPException(status_code=404, detail="Campanha não encontrada")
+    if campaign_is_executing(campaign_id):
+        raise HTTPException(status_code=409, detail="Campanha já em execução")
     
     # Se for horários específicos, ativa a campanha mas não executa agora
     if campaign['schedule_type'] == 'specific_times':
         next_run = calculate_next_run(campaign)
         schedule_campaign(campaign)
-        await db.campaigns.update_one(
-            {'id': campaign_id}, 
-            {'$set': {
-                'status': 'active',
-                'next_run': next_run,
-                'paused_at': None,
-                'remaining_time_on_pause': None
-            }}
-        )
+        await update_campaign_state(campaign, {
+            'status': 'active',
+            'next_run': next_run,
+            'paused_at': None,
+            'remaining_time_on_pause': None
+        })
         await log_activity(user['id'], user['username'], 'start', 'campaign', campaign_id, campaign['title'], 'Campanha ativada (horários específicos)')
         return {'status': 'active', 'message': 'Campanha ativada. Enviará nos horários configurados.', 'next_run': next_run}
     
@@ -4171,17 +6547,14 @@ async def start_campaign_now(campaign_id: str, background_tasks: BackgroundTasks
         next_run = (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
     
     # Para outros tipos, executa imediatamente e reseta contador
-    await db.campaigns.update_one(
-        {'id': campaign_id}, 
-        {'$set': {
-            'status': 'running',
-            'sent_count': 0,
-            'last_run': datetime.now(timezone.utc).isoformat(),
-            'next_run': next_run,
-            'paused_at': None,
-            'remaining_time_on_pause': None
-        }}
-    )
+    await update_campaign_state(campaign, {
+        'status': 'running',
+        'sent_count': 0,
+        'last_run': datetime.now(timezone.utc).isoformat(),
+        'next_run': next_run,
+        'paused_at': None,
+        'remaining_time_on_pause': None
+    })
     background_tasks.add_task(execute_campaign, campaign_id)
     
     # Se for intervalo, também agenda as próximas execuções
@@ -4233,25 +6606,48 @@ async def duplicate_campaign(campaign_id: str, user: dict = Depends(get_current_
     }
     
     await db.campaigns.insert_one(new_campaign)
+    publish_campaign_change(new_campaign, 'created')
     await log_activity(user['id'], user['username'], 'duplicate', 'campaign', new_campaign['id'], new_campaign['title'], 'Campanha duplicada')
     
     return new_campaign
 
 @api_router.get("/campaigns/{campaign_id}/groups-info")
-async def get_campaign_groups_info(campaign_id: str, user: dict = Depends(get_current_user)):
-    """Obter informações dos grupos de uma campanha"""
+async def get_campaign_groups_info(campaign_id: str, page: int = 1, limit: int = 0, user: dict = Depends(get_current_user)):
+    """Obter informações dos grupos de uma campanha (na ordem da campanha).
+    limit=0 devolve todos; missing_group_ids lista ids que não existem mais (ex: após resync)"""
     query = {'id': campaign_id}
     if user['role'] != 'admin':
         query['user_id'] = user['id']
     
-    campaign = await db.campaigns.find_one(query)
+    campaign = await db.campaigns.find_one(query, {'_id': 0, 'title': 1, 'group_ids': 1})
     if not campaign:
         raise HTTPException(status_code=404, detail="Campanha não encontrada")
     
-    # Buscar detalhes dos grupos
+    group_ids = campaign.get('group_ids', [])
+    
+    # Ids ainda existentes - consulta só no índice de id
+    existing = await db.groups.find({'id': {'$in': group_ids}}, {'_id': 0, 'id': 1}).to_list(None)
+    existing_ids = {group['id'] for group in existing}
+    missing_group_ids = [group_id for group_id in group_ids if group_id not in existing_ids]
+    
+    page = max(page, 1)
+    if limit > 0:
+        page_ids = group_ids[(page - 1) * limit:page * limit]
+        total_pages = (len(group_ids) + limit - 1) // limit
+    else:
+        page_ids = group_ids
+        total_pages = 1
+    
+    # Buscar detalhes dos grupos da página em uma consulta ($in) mantendo a ordem da campanha
+    groups = await db.groups.find(
+        {'id': {'$in': page_ids}},
+        {'_id': 0, 'id': 1, 'name': 1, 'group_id': 1, 'participants_count': 1}
+    ).to_list(None)
+    groups_by_id = {group['id']: group for group in groups}
+    
     groups_info = []
-    for group_id in campaign.get('group_ids', []):
-        group = await db.groups.find_one({'id': group_id}, {'_id': 0})
+    for group_id in page_ids:
+        group = groups_by_id.get(group_id)
         if group:
             groups_info.append({
                 'id': group['id'],
@@ -4263,54 +6659,166 @@ async def get_campaign_groups_info(campaign_id: str, user: dict = Depends(get_cu
     return {
         'campaign_id': campaign_id,
         'campaign_title': campaign.get('title'),
-        'total_groups': len(campaign.get('group_ids', [])),
-        'groups': groups_info
+        'total_groups': len(group_ids),
+        'groups': groups_info,
+        'page': page,
+        'limit': limit,
+        'total_pages': total_pages,
+        'missing_group_ids': missing_group_ids,
+        'missing_count': len(missing_group_ids)
     }
 
 class CopyGroupsRequest(BaseModel):
     source_campaign_id: str
 
-@api_router.post("/campaigns/{campaign_id}/copy-groups")
-async def copy_groups_from_campaign(
-    campaign_id: str, 
-    data: CopyGroupsRequest,
-    user: dict = Depends(get_current_user)
-):
-    """Copiar grupos de outra campanha para esta campanha"""
-    # Verificar campanha destino
-    dest_query = {'id': campaign_id}
-    if user['role'] != 'admin':
-        dest_query['user_id'] = user['id']
-    
-    dest_campaign = await db.campaigns.find_one(dest_query)
-    if not dest_campaign:
-        raise HTTPException(status_code=404, detail="Campanha de destino não encontrada")
+class GroupSetRequest(BaseModel):
+    operation: str  # union, intersection, difference, replace
+    source_campaign_ids: List[str] = []
+    group_list_ids: List[str] = []
+    group_ids: List[str] = []  # ids avulsos
+
+GROUP_SET_OPERATIONS = ('union', 'intersection', 'difference', 'replace')
+GROUP_SET_MAX_RETRIES = 3
+
+def apply_group_set_operation(current: list, source: list, operation: str) -> list:
+    """Operação de conjunto preservando a ordem (atual primeiro, depois a das fontes) e sem duplicatas"""
+    current = unique_in_order(current)
+    source_set = set(source)
+    
+    if operation == 'union':
+        current_set = set(current)
+        return current + [group_id for group_id in unique_in_order(source) if group_id not in current_set]
+    if operation == 'intersection':
+        return [group_id for group_id in current if group_id in source_set]
+    if operation == 'difference':
+        return [group_id for group_id in current if group_id not in source_set]
+    return unique_in_order(source)  # replace
+
+async def collect_group_set_source(data: GroupSetRequest, user: dict) -> tuple:
+    """Junta os ids das fontes na ordem informada: campanhas, listas salvas e ids avulsos"""
+    if not (data.source_campaign_ids or data.group_list_ids or data.group_ids):
+        # Sem fonte, replace/intersection zerariam os grupos da campanha
+        raise HTTPException(status_code=400, detail="Informe ao menos uma campanha, lista ou grupo de origem")
+    
+    owner_query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    source = []
+    names = []
+    
+    if data.source_campaign_ids:
+        campaigns = await db.campaigns.find(
+            {**owner_query, 'id': {'$in': data.source_campaign_ids}},
+            {'_id': 0, 'id': 1, 'title': 1, 'group_ids': 1}
+        ).to_list(None)
+        by_id = {campaign['id']: campaign for campaign in campaigns}
+        missing = [campaign_id for campaign_id in data.source_campaign_ids if campaign_id not in by_id]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Campanha de origem não encontrada: {', '.join(missing)}")
+        for campaign_id in data.source_campaign_ids:
+            source.extend(by_id[campaign_id].get('group_ids', []))
+            names.append(by_id[campaign_id].get('title'))
+    
+    if data.group_list_ids:
+        group_lists = await db.group_lists.find(
+            {**owner_query, 'id': {'$in': data.group_list_ids}},
+            {'_id': 0, 'id': 1, 'name': 1, 'group_ids': 1}
+        ).to_list(None)
+        by_id = {group_list['id']: group_list for group_list in group_lists}
+        missing = [list_id for list_id in data.group_list_ids if list_id not in by_id]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Lista de grupos não encontrada: {', '.join(missing)}")
+        empty = [by_id[list_id].get('name') or list_id for list_id in data.group_list_ids if not by_id[list_id].get('group_ids')]
+        if empty:
+            # Listas antigas vazias zerariam a campanha em replace/intersection
+            raise HTTPException(status_code=400, detail=f"Lista de grupos vazia: {', '.join(empty)}")
+        for list_id in data.group_list_ids:
+            source.extend(by_id[list_id].get('group_ids', []))
+            names.append(by_id[list_id].get('name'))
+    
+    if data.group_ids:
+        # Ids avulsos só de grupos do próprio usuário
+        owned_ids = set(await owned_group_ids(data.group_ids, user))
+        missing = [group_id for group_id in unique_in_order(data.group_ids) if group_id not in owned_ids]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Grupo não encontrado: {', '.join(missing)}")
+        source.extend(data.group_ids)
+    return source, names
+
+async def update_campaign_group_set(campaign_id: str, user: dict, operation: str, source: list) -> tuple:
+    """Calcula e grava o novo group_ids em um único update atômico.
+    O filtro inclui o group_ids lido (compare-and-swap): edição concorrente faz recalcular.
+    Campanha em execução/na fila é recusada, inclusive se começar a rodar entre a leitura e o update."""
+    if operation not in GROUP_SET_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Operação inválida (use {', '.join(GROUP_SET_OPERATIONS)})")
     
-    # Verificar campanha origem
-    source_query = {'id': data.source_campaign_id}
+    query = {'id': campaign_id}
     if user['role'] != 'admin':
-        source_query['user_id'] = user['id']
+        query['user_id'] = user['id']
     
-    source_campaign = await db.campaigns.find_one(source_query)
-    if not source_campaign:
-        raise HTTPException(status_code=404, detail="Campanha de origem não encontrada")
+    for _ in range(GROUP_SET_MAX_RETRIES):
+        campaign = await db.campaigns.find_one(query, {'_id': 0, 'id': 1, 'user_id': 1, 'title': 1, 'status': 1, 'group_ids': 1})
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campanha de destino não encontrada")
+        # Mesma regra do PUT: o checkpoint current_group_index aponta para a lista atual
+        if campaign.get('status') in ('running', 'queued'):
+            raise HTTPException(status_code=400, detail="Não é possível editar campanha em execução")
+        
+        current = campaign.get('group_ids') or []
+        new_groups = apply_group_set_operation(current, source, operation)
+        
+        # Campanha sem o campo: o CAS compara com "não existe" (igualdade com [] nunca casaria)
+        expected = campaign['group_ids'] if 'group_ids' in campaign else {'$exists': False}
+        result = await db.campaigns.update_one(
+            {'id': campaign_id, 'group_ids': expected, 'status': {'$nin': ['running', 'queued']}},
+            {'$set': {'group_ids': new_groups, 'total_count': len(new_groups)}}
+        )
+        if result.matched_count:
+            publish_campaign_change(campaign, 'updated')
+            return campaign, current, new_groups
     
-    # Copiar grupos
-    source_groups = source_campaign.get('group_ids', [])
-    dest_groups = dest_campaign.get('group_ids', [])
+    raise HTTPException(status_code=409, detail="Grupos da campanha alterados durante a operação, tente novamente")
+
+@api_router.post("/campaigns/{campaign_id}/group-set")
+async def apply_campaign_group_set(campaign_id: str, data: GroupSetRequest, user: dict = Depends(get_current_user)):
+    """União, interseção, diferença ou substituição dos grupos da campanha a partir de
+    várias campanhas, listas salvas e ids avulsos"""
+    source, source_names = await collect_group_set_source(data, user)
+    campaign, previous, new_groups = await update_campaign_group_set(campaign_id, user, data.operation, source)
     
-    # Adicionar grupos que não existem ainda (evitar duplicatas)
-    new_groups = list(set(dest_groups + source_groups))
+    previous_set = set(previous)
+    new_set = set(new_groups)
+    added_count = len(new_set - previous_set)
+    removed_count = len(previous_set - new_set)
     
-    await db.campaigns.update_one(
-        {'id': campaign_id},
-        {'$set': {
-            'group_ids': new_groups,
-            'total_count': len(new_groups)
-        }}
+    await log_activity(
+        user['id'],
+        user['username'],
+        f'group_set_{data.operation}',
+        'campaign',
+        campaign_id,
+        campaign.get('title'),
+        f'{data.operation}: +{added_count} / -{removed_count} grupos ({len(new_groups)} no total)'
     )
     
-    added_count = len(new_groups) - len(dest_groups)
+    return {
+        'operation': data.operation,
+        'previous_count': len(previous),
+        'new_count': len(new_groups),
+        'added_count': added_count,
+        'removed_count': removed_count,
+        'sources': source_names
+    }
+
+@api_router.post("/campaigns/{campaign_id}/copy-groups")
+async def copy_groups_from_campaign(
+    campaign_id: str, 
+    data: CopyGroupsRequest,
+    user: dict = Depends(get_current_user)
+):
+    """Copiar grupos de outra campanha para esta campanha (união mantendo a ordem)"""
+    source, source_names = await collect_group_set_source(GroupSetRequest(operation='union', source_campaign_ids=[data.source_campaign_id]), user)
+    dest_campaign, dest_groups, new_groups = await update_campaign_group_set(campaign_id, user, 'union', source)
+    
+    added_count = len(new_groups) - len(unique_in_order(dest_groups))
     
     await log_activity(
         user['id'], 
@@ -4319,14 +6827,14 @@ async def copy_groups_from_campaign(
         'campaign', 
         campaign_id, 
         dest_campaign.get('title'),
-        f'Copiados {added_count} grupos de "{source_campaign.get("title")}"'
+        f'Copiados {added_count} grupos de "{source_names[0]}"'
     )
     
     return {
         'message': f'{added_count} grupos adicionados',
         'previous_count': len(dest_groups),
         'new_count': len(new_groups),
-        'source_campaign': source_campaign.get('title')
+        'source_campaign': source_names[0]
     }
 
 @api_router.post("/campaigns/{campaign_id}/replace-groups")
@@ -4336,34 +6844,8 @@ async def replace_groups_from_campaign(
     user: dict = Depends(get_current_user)
 ):
     """Substituir grupos desta campanha pelos grupos de outra campanha"""
-    # Verificar campanha destino
-    dest_query = {'id': campaign_id}
-    if user['role'] != 'admin':
-        dest_query['user_id'] = user['id']
-    
-    dest_campaign = await db.campaigns.find_one(dest_query)
-    if not dest_campaign:
-        raise HTTPException(status_code=404, detail="Campanha de destino não encontrada")
-    
-    # Verificar campanha origem
-    source_query = {'id': data.source_campaign_id}
-    if user['role'] != 'admin':
-        source_query['user_id'] = user['id']
-    
-    source_campaign = await db.campaigns.find_one(source_query)
-    if not source_campaign:
-        raise HTTPException(status_code=404, detail="Campanha de origem não encontrada")
-    
-    # Substituir grupos
-    source_groups = source_campaign.get('group_ids', [])
-    
-    await db.campaigns.update_one(
-        {'id': campaign_id},
-        {'$set': {
-            'group_ids': source_groups,
-            'total_count': len(source_groups)
-        }}
-    )
+    source, source_names = await collect_group_set_source(GroupSetRequest(operation='replace', source_campaign_ids=[data.source_campaign_id]), user)
+    dest_campaign, _, new_groups = await update_campaign_group_set(campaign_id, user, 'replace', source)
     
     await log_activity(
         user['id'], 
@@ -4372,13 +6854,13 @@ async def replace_groups_from_campaign(
         'campaign', 
         campaign_id, 
         dest_campaign.get('title'),
-        f'Grupos substituídos por "{source_campaign.get("title")}" ({len(source_groups)} grupos)'
+        f'Grupos substituídos por "{source_names[0]}" ({len(new_groups)} grupos)'
     )
     
     return {
         'message': f'Grupos substituídos com sucesso',
-        'new_count': len(source_groups),
-        'source_campaign': source_campaign.get('title')
+        'new_count': len(new_groups),
+        'source_campaign': source_names[0]
     }
 
 @api_router.post("/campaigns/{campaign_id}/resume")
@@ -4402,15 +6884,12 @@ async def resume_campaign(campaign_id: str, background_tasks: BackgroundTasks, u
         next_run = calculate_next_run(campaign)
     
     schedule_campaign(campaign)
-    await db.campaigns.update_one(
-        {'id': campaign_id}, 
-        {'$set': {
-            'status': 'active',
-            'next_run': next_run,
-            'paused_at': None,
-            'remaining_time_on_pause': None
-        }}
-    )
+    await update_campaign_state(campaign, {
+        'status': 'active',
+        'next_run': next_run,
+        'paused_at': None,
+        'remaining_time_on_pause': None
+    })
     
     await log_activity(user['id'], user['username'], 'resume', 'campaign', campaign_id, campaign['title'], 'Campanha retomada')
     
@@ -4438,8 +6917,346 @@ async def delete_campaign(campaign_id: str, user: dict = Depends(get_current_use
         pass
     
     await db.campaigns.delete_one({'id': campaign_id})
+    publish_campaign_change(campaign, 'deleted')
     return {'message': 'Campanha deletada'}
 
+# ============= Bulk Campaign Operations =============
+
+class CampaignBulkFilter(BaseModel):
+    status: Optional[List[str]] = None
+    connection_id: Optional[str] = None
+    schedule_type: Optional[str] = None
+    user_id: Optional[str] = None  # admin only
+
+class CampaignBulkRequest(BaseModel):
+    action: str  # pause, resume, start, delete
+    campaign_ids: Optional[List[str]] = None
+    filter: Optional[CampaignBulkFilter] = None
+
+CAMPAIGN_BULK_ACTIONS = ('pause', 'resume', 'start', 'delete')
+CAMPAIGN_BULK_MAX = 1000
+
+def remaining_seconds_until(next_run: Optional[str]) -> Optional[int]:
+    """Segundos até o próximo envio (None se não houver ou já passou)"""
+    if not next_run:
+        return None
+    try:
+        next_run_dt = datetime.fromisoformat(next_run.replace('Z', '+00:00'))
+        remaining = int((next_run_dt - datetime.now(timezone.utc)).total_seconds())
+        return remaining if remaining >= 0 else None
+    except (TypeError, ValueError):
+        return None
+
+def remove_campaign_jobs(campaign_ids: list) -> int:
+    """Remove os jobs (principal e _time_N) das campanhas em uma única passada pelo scheduler"""
+    targets = set(campaign_ids)
+    removed = 0
+    for job in scheduler.get_jobs():
+        if job.id.split('_time_')[0] in targets:
+            job.remove()
+            removed += 1
+    return removed
+
+async def run_bulk_campaign_starts(campaigns: list):
+    """Executa as campanhas iniciadas em lote: sequencial por conexão, conexões em paralelo limitado"""
+    lanes = {}
+    for campaign in campaigns:
+        lanes.setdefault(campaign['connection_id'], []).append(campaign['id'])
+    
+    semaphore = asyncio.Semaphore(CAMPAIGN_RESUME_CONCURRENCY)
+    
+    async def run_lane(campaign_ids: list):
+        async with semaphore:
+            for campaign_id in campaign_ids:
+                try:
+                    await execute_campaign(campaign_id)
+                except Exception as e:
+                    logger.error(f"[BULK] Erro ao executar campanha {campaign_id}: {e}")
+    
+    await asyncio.gather(*(run_lane(lane) for lane in lanes.values()))
+
+def plan_bulk_campaign_action(campaign: dict, action: str, now: datetime) -> tuple:
+    """Retorna ($set, resultado) de uma campanha; $set None = nada a fazer"""
+    now_iso = now.isoformat()
+    
+    if action == 'pause':
+        if campaign['status'] == 'paused':
+            return None, {'status': 'skipped', 'reason': 'Campanha já pausada'}
+        remaining = remaining_seconds_until(campaign.get('next_run'))
+        return (
+            {'status': 'paused', 'paused_at': now_iso, 'remaining_time_on_pause': remaining},
+            {'status': 'ok', 'new_status': 'paused', 'remaining_seconds': remaining}
+        )
+    
+    if action == 'resume':
+        if campaign['status'] != 'paused':
+            return None, {'status': 'skipped', 'reason': 'Campanha não está pausada'}
+        remaining = campaign.get('remaining_time_on_pause')
+        if remaining and remaining > 0:
+            next_run = (now + timedelta(seconds=remaining)).isoformat()
+        else:
+            next_run = calculate_next_run(campaign)
+        return (
+            {'status': 'active', 'next_run': next_run, 'paused_at': None, 'remaining_time_on_pause': None},
+            {'status': 'ok', 'new_status': 'active', 'next_run': next_run}
+        )
+    
+    # start - mesma regra do /start: só recusa quem está executando agora
+    # (status 'running' sem execução ativa, ex: interrompida, é reiniciada)
+    if campaign_is_executing(campaign['id']):
+        return None, {'status': 'skipped', 'reason': 'Campanha já em execução'}
+    if campaign['schedule_type'] == 'specific_times':
+        next_run = calculate_next_run(campaign)
+        return (
+            {'status': 'active', 'next_run': next_run, 'paused_at': None, 'remaining_time_on_pause': None},
+            {'status': 'ok', 'new_status': 'active', 'next_run': next_run}
+        )
+    next_run = None
+    if campaign['schedule_type'] == 'interval':
+        next_run = (now + timedelta(hours=campaign.get('interval_hours', 1))).isoformat()
+    return (
+        {'status': 'running', 'sent_count': 0, 'last_run': now_iso, 'next_run': next_run,
+         'paused_at': None, 'remaining_time_on_pause': None},
+        {'status': 'ok', 'new_status': 'running', 'next_run': next_run}
+    )
+
+@api_router.post("/campaigns/bulk")
+async def bulk_campaign_action(data: CampaignBulkRequest, user: dict = Depends(get_current_user)):
+    """Pausar, retomar, iniciar ou excluir várias campanhas (lista de ids ou filtro)"""
+    if data.action not in CAMPAIGN_BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Ação inválida (use {', '.join(CAMPAIGN_BULK_ACTIONS)})")
+    if not data.campaign_ids and not data.filter:
+        raise HTTPException(status_code=400, detail="Informe campaign_ids ou filter")
+    
+    query = {} if user['role'] == 'admin' else {'user_id': user['id']}
+    if data.campaign_ids:
+        query['id'] = {'$in': data.campaign_ids}
+    if data.filter:
+        if data.filter.status:
+            query['status'] = {'$in': data.filter.status}
+        if data.filter.connection_id:
+            query['connection_id'] = data.filter.connection_id
+        if data.filter.schedule_type:
+            query['schedule_type'] = data.filter.schedule_type
+        if data.filter.user_id and user['role'] == 'admin':
+            query['user_id'] = data.filter.user_id
+    
+    campaigns = await db.campaigns.find(query, {'_id': 0}).to_list(CAMPAIGN_BULK_MAX + 1)
+    if len(campaigns) > CAMPAIGN_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo de {CAMPAIGN_BULK_MAX} campanhas por operação")
+    
+    results = {}
+    if data.campaign_ids:
+        found = {campaign['id'] for campaign in campaigns}
+        for campaign_id in data.campaign_ids:
+            if campaign_id not in found:
+                results[campaign_id] = {'campaign_id': campaign_id, 'status': 'not_found'}
+    
+    now = datetime.now(timezone.utc)
+    
+    if data.action == 'delete':
+        campaign_ids = [campaign['id'] for campaign in campaigns]
+        remove_campaign_jobs(campaign_ids)
+        if campaign_ids:
+            await db.campaigns.delete_many({'id': {'$in': campaign_ids}})
+        for campaign in campaigns:
+            results[campaign['id']] = {'campaign_id': campaign['id'], 'title': campaign.get('title'), 'status': 'ok', 'new_status': 'deleted'}
+            publish_campaign_change(campaign, 'deleted')
+        affected = campaigns
+    else:
+        operations = []
+        affected = []
+        for campaign in campaigns:
+            fields, result = plan_bulk_campaign_action(campaign, data.action, now)
+            results[campaign['id']] = {'campaign_id': campaign['id'], 'title': campaign.get('title'), **result}
+            if fields:
+                operations.append(UpdateOne({'id': campaign['id']}, {'$set': fields}))
+                affected.append({**campaign, **fields})
+        
+        # Scheduler: uma passada removendo os jobs, depois reagenda quem volta a rodar
+        remove_campaign_jobs([campaign['id'] for campaign in affected])
+        if operations:
+            await db.campaigns.bulk_write(operations, ordered=False)
+        
+        # start agenda só interval/specific_times, como o /start: 'once' executa agora e
+        # reagendar o scheduled_time enviaria de novo (ou falharia sem scheduled_time)
+        if data.action == 'resume':
+            to_schedule = affected
+        elif data.action == 'start':
+            to_schedule = [campaign for campaign in affected if campaign['schedule_type'] in ('interval', 'specific_times')]
+        else:
+            to_schedule = []
+        for campaign in to_schedule:
+            try:
+                schedule_campaign(campaign)
+            except Exception as e:
+                results[campaign['id']]['schedule_error'] = str(e)
+                logger.error(f"[BULK] Erro ao agendar campanha {campaign['id']}: {e}")
+        
+        if data.action == 'start':
+            to_run = [campaign for campaign in affected if campaign['status'] == 'running']
+            if to_run:
+                spawn_background_task(run_bulk_campaign_starts(to_run))
+        
+        for campaign in affected:
+            publish_campaign_update(campaign, {'status': campaign['status'], 'next_run': campaign.get('next_run')})
+    
+    action_labels = {'pause': 'Campanha pausada', 'resume': 'Campanha retomada', 'start': 'Campanha iniciada', 'delete': 'Campanha excluída'}
+    for campaign in affected:
+        await log_activity(user['id'], user['username'], data.action, 'campaign', campaign['id'], campaign.get('title'), f"{action_labels[data.action]} (em lote)")
+    
+    counts = {}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    
+    return {
+        'action': data.action,
+        'matched': len(campaigns),
+        'counts': counts,
+        'results': list(results.values())
+    }
+
+# ============= Campaign Resume Queue =============
+
+# Quantas campanhas interrompidas são retomadas ao mesmo tempo após um restart
+CAMPAIGN_RESUME_CONCURRENCY = int(os.environ.get('CAMPAIGN_RESUME_CONCURRENCY', '3'))
+
+campaign_resume_state = {
+    'status': 'idle',  # idle, running, done
+    'started_at': None,
+    'finished_at': None,
+    'concurrency': CAMPAIGN_RESUME_CONCURRENCY,
+    'campaigns': {}
+}
+
+def campaign_progress(campaign: dict) -> float:
+    """Fração dos grupos já processados na execução atual"""
+    total = len(campaign.get('group_ids', []))
+    if not total:
+        return 0.0
+    return campaign.get('current_group_index', 0) / total
+
+async def resume_connection_lane(campaigns: list):
+    """Retoma, em sequência, as campanhas de uma mesma conexão.
+    
+    Enquanto esperam a vez as campanhas ficam 'queued' no banco; quando a vez chega,
+    só retoma as que continuam na fila (pausa, exclusão ou início manual tiram da fila).
+    """
+    for campaign in campaigns:
+        entry = campaign_resume_state['campaigns'][campaign['id']]
+        entry['started_at'] = datetime.now(timezone.utc).isoformat()
+        try:
+            current = await db.campaigns.find_one({'id': campaign['id']}, {'_id': 0, 'status': 1, 'current_group_index': 1})
+            if campaign_is_executing(campaign['id']):
+                entry['status'] = 'skipped'
+                entry['error'] = 'Campanha já em execução'
+                continue
+            if not current or current.get('status') != 'queued':
+                entry['status'] = 'skipped'
+                entry['error'] = 'Campanha saiu da fila' if current else 'Campanha excluída'
+                continue
+            
+            entry['status'] = 'running'
+            await execute_campaign(campaign['id'], resume_from_index=current.get('current_group_index', 0))
+            entry['status'] = 'done'
+        except asyncio.CancelledError:
+            entry['status'] = 'cancelled'
+            raise
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = str(e)
+            logger.error(f"[RESUME] Erro ao retomar campanha {campaign['id']}: {e}")
+        finally:
+            entry['finished_at'] = datetime.now(timezone.utc).isoformat()
+            try:
+                final = await db.campaigns.find_one({'id': campaign['id']}, {'_id': 0, 'status': 1, 'sent_count': 1})
+                if final:
+                    entry['campaign_status'] = final.get('status')
+                    entry['sent_count'] = final.get('sent_count', 0)
+            except Exception:
+                pass
+
+async def run_campaign_resume_queue(campaigns: list):
+    """Retoma campanhas interrompidas com concorrência limitada.
+    
+    As campanhas são agrupadas por conexão (nunca duas ao mesmo tempo na mesma
+    conexão) e ordenadas pelo progresso: as que estavam mais perto do fim saem primeiro.
+    """
+    lanes = {}
+    for campaign in campaigns:
+        lanes.setdefault(campaign['connection_id'], []).append(campaign)
+    for lane in lanes.values():
+        lane.sort(key=campaign_progress, reverse=True)
+    
+    queue = asyncio.Queue()
+    for lane in sorted(lanes.values(), key=lambda lane: campaign_progress(lane[0]), reverse=True):
+        queue.put_nowait(lane)
+    
+    campaign_resume_state['status'] = 'running'
+    campaign_resume_state['started_at'] = datetime.now(timezone.utc).isoformat()
+    campaign_resume_state['finished_at'] = None
+    logger.info(f"[RESUME] {len(campaigns)} campanha(s) em {len(lanes)} conexão(ões), concorrência {CAMPAIGN_RESUME_CONCURRENCY}")
+    
+    async def worker():
+        while True:
+            try:
+                lane = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await resume_connection_lane(lane)
+    
+    workers = [asyncio.create_task(worker()) for _ in range(min(CAMPAIGN_RESUME_CONCURRENCY, len(lanes)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        campaign_resume_state['status'] = 'done'
+        campaign_resume_state['finished_at'] = datetime.now(timezone.utc).isoformat()
+        logger.info("[RESUME] Retomada de campanhas concluída")
+
+async def enqueue_campaign_resume(campaigns: list):
+    """Registra as campanhas no estado de retomada e dispara a fila em background.
+    
+    Todas passam a 'queued' no banco - só voltam a 'running' quando execute_campaign começa.
+    """
+    await db.campaigns.update_many(
+        {'id': {'$in': [campaign['id'] for campaign in campaigns]}, 'status': {'$in': ['running', 'queued']}},
+        {'$set': {'status': 'queued'}}
+    )
+    for campaign in campaigns:
+        publish_campaign_update(campaign, {'status': 'queued'})
+        campaign_resume_state['campaigns'][campaign['id']] = {
+            'campaign_id': campaign['id'],
+            'title': campaign.get('title'),
+            'connection_id': campaign.get('connection_id'),
+            'current_group_index': campaign.get('current_group_index', 0),
+            'total_groups': len(campaign.get('group_ids', [])),
+            'progress': round(campaign_progress(campaign) * 100, 1),
+            'status': 'queued',
+            'started_at': None,
+            'finished_at': None,
+            'error': None
+        }
+    spawn_background_task(run_campaign_resume_queue(campaigns))
+
+@api_router.get("/admin/campaigns/resume-status")
+async def get_campaign_resume_status(admin: dict = Depends(get_admin_user)):
+    """Estado da retomada de campanhas interrompidas (após restart do servidor)"""
+    entries = list(campaign_resume_state['campaigns'].values())
+    counts = {}
+    for entry in entries:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    
+    return {
+        'status': campaign_resume_state['status'],
+        'started_at': campaign_resume_state['started_at'],
+        'finished_at': campaign_resume_state['finished_at'],
+        'concurrency': campaign_resume_state['concurrency'],
+        'counts': counts,
+        'campaigns': entries
+    }
+
 # ============= Dashboard Stats =============
 
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
@@ -4491,12 +7308,190 @@ async def get_admin_stats(admin: dict = Depends(get_admin_user)):
         'recent_campaigns': recent_campaigns
     }
 
+# ============= Database Indexes =============
+
+# Registro declarativo de todos os índices usados pelas consultas quentes.
+# Aplicado de forma idempotente no startup (create_index é no-op se já existe).
+INDEX_REGISTRY = [
+    # users
+    {'collection': 'users', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'users', 'keys': [('username', 1)], 'unique': True},
+    {'collection': 'users', 'keys': [('created_by', 1), ('created_at', -1)]},
+    {'collection': 'users', 'keys': [('role', 1)]},
+    # connections
+    {'collection': 'connections', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'connections', 'keys': [('user_id', 1)]},
+    # campaigns
+    {'collection': 'campaigns', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'campaigns', 'keys': [('user_id', 1), ('created_at', -1)]},
+    {'collection': 'campaigns', 'keys': [('created_at', -1)]},
+    {'collection': 'campaigns', 'keys': [('status', 1)]},
+    # groups
+    {'collection': 'groups', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'groups', 'keys': [('connection_id', 1), ('group_id', 1)]},
+    {'collection': 'groups', 'keys': [('user_id', 1)]},
+    # listagem paginada: ordenação por name_search e busca por prefixo em name_tokens (sem collation)
+    {'collection': 'groups', 'keys': [('user_id', 1), ('name_search', 1)]},
+    {'collection': 'groups', 'keys': [('connection_id', 1), ('name_search', 1)]},
+    {'collection': 'groups', 'keys': [('user_id', 1), ('name_tokens', 1)]},
+    {'collection': 'groups', 'keys': [('connection_id', 1), ('name_tokens', 1)]},
+    {'collection': 'groups', 'keys': [('name_tokens', 1)]},
+    # images
+    {'collection': 'images', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'images', 'keys': [('filename', 1)]},
+    {'collection': 'images', 'keys': [('user_id', 1), ('created_at', -1)]},
+    # transactions (payment_id é null até o PIX ser gerado)
+    {'collection': 'transactions', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'transactions', 'keys': [('payment_id', 1)], 'unique': True,
+     'partialFilterExpression': {'payment_id': {'$type': 'string'}}},
+    {'collection': 'transactions', 'keys': [('user_id', 1)]},
+    {'collection': 'transactions', 'keys': [('master_id', 1)]},
+    # invite_links
+    {'collection': 'invite_links', 'keys': [('code', 1)], 'unique': True},
+    {'collection': 'invite_links', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'invite_links', 'keys': [('created_by', 1)]},
+    # activity_logs
+    {'collection': 'activity_logs', 'keys': [('user_id', 1), ('created_at', -1)]},
+    {'collection': 'activity_logs', 'keys': [('created_at', -1)]},
+    {'collection': 'activity_logs', 'keys': [('id', 1)]},
+    # group_lists (seleções de grupos salvas)
+    {'collection': 'group_lists', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'group_lists', 'keys': [('user_id', 1), ('created_at', -1)]},
+    # templates
+    {'collection': 'templates', 'keys': [('id', 1)], 'unique': True},
+    {'collection': 'templates', 'keys': [('user_id', 1), ('created_at', -1)]},
+    # send_logs (time-series: índices secundários no metaField + timeField)
+    {'collection': 'send_logs', 'keys': [('meta.user_id', 1), ('sent_at', -1)]},
+    {'collection': 'send_logs', 'keys': [('meta.campaign_id', 1), ('sent_at', -1)]},
+    {'collection': 'send_logs', 'keys': [('sent_at', -1)]},
+    # agregados diários da retenção (chave do upsert)
+    {'collection': 'send_logs_daily', 'keys': [('date', 1), ('user_id', 1), ('campaign_id', 1), ('connection_id', 1)], 'unique': True},
+    {'collection': 'send_logs_daily', 'keys': [('user_id', 1), ('day_start', 1)]},
+    {'collection': 'activity_logs_daily', 'keys': [('date', 1), ('user_id', 1), ('action', 1)], 'unique': True},
+    {'collection': 'log_retention_state', 'keys': [('id', 1)], 'unique': True},
+    # qr_blobs (QRs de conexão e PIX; expiram em expires_at)
+    {'collection': 'qr_blobs', 'keys': [('expires_at', 1)], 'expireAfterSeconds': 0},
+    # sessões do WhatsApp service (lidas a cada operação de auth state)
+    {'collection': 'whatsapp_sessions', 'keys': [('connectionId', 1), ('key', 1)], 'unique': True},
+]
+
+# TTL das atividades (só existe com retenção ativa)
+if ACTIVITY_LOGS_RETENTION_DAYS > 0:
+    INDEX_REGISTRY.append({
+        'collection': 'activity_logs', 'keys': [('logged_at', 1)],
+        'expireAfterSeconds': ACTIVITY_LOGS_RETENTION_DAYS * 86400
+    })
+
+INDEX_OPTION_KEYS = ('unique', 'partialFilterExpression', 'expireAfterSeconds', 'sparse', 'collation')
+
+index_registry_state = {'applied_at': None, 'results': []}
+
+def index_name(keys: list) -> str:
+    """Mesmo nome gerado pelo MongoDB por padrão (ex: user_id_1_created_at_-1)"""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+async def apply_index_registry():
+    """Cria todos os índices registrados. Falha em um índice não impede os demais."""
+    results = []
+    for spec in INDEX_REGISTRY:
+        name = index_name(spec['keys'])
+        options = {key: spec[key] for key in INDEX_OPTION_KEYS if key in spec}
+        try:
+            if 'expireAfterSeconds' in spec:
+                existing = (await db[spec['collection']].index_information()).get(name)
+                if existing and existing.get('expireAfterSeconds') != spec['expireAfterSeconds']:
+                    # Retenção alterada: collMod ajusta o TTL sem recriar o índice
+                    await db.command('collMod', spec['collection'], index={'name': name, 'expireAfterSeconds': spec['expireAfterSeconds']})
+            await db[spec['collection']].create_index(spec['keys'], name=name, **options)
+            results.append({'collection': spec['collection'], 'name': name, 'status': 'ok'})
+        except Exception as e:
+            # Ex: duplicatas impedem índice único, ou índice existente com opções diferentes
+            logger.warning(f"[INDEXES] Erro ao criar {spec['collection']}.{name}: {e}")
+            results.append({'collection': spec['collection'], 'name': name, 'status': 'error', 'error': str(e)})
+    
+    index_registry_state['applied_at'] = datetime.now(timezone.utc).isoformat()
+    index_registry_state['results'] = results
+    
+    # Erros ficam no relatório (/admin/indexes) - não bloqueiam o startup
+    failed = [r for r in results if r['status'] == 'error']
+    logger.info(f"[INDEXES] {len(results) - len(failed)}/{len(results)} índices aplicados")
+
+@api_router.get("/admin/indexes")
+async def get_index_report(admin: dict = Depends(get_admin_user)):
+    """Relatório dos índices: registrados ausentes, não utilizados e não registrados"""
+    registered = {}
+    for spec in INDEX_REGISTRY:
+        registered.setdefault(spec['collection'], {})[index_name(spec['keys'])] = spec
+    
+    collections = []
+    for collection_name, specs in registered.items():
+        existing = await db[collection_name].index_information()
+        
+        # $indexStats: acessos desde o último restart do mongod
+        usage = {}
+        try:
+            stats = await db[collection_name].aggregate([{'$indexStats': {}}]).to_list(None)
+            usage = {
+                stat['name']: {'ops': stat['accesses']['ops'], 'since': stat['accesses']['since']}
+                for stat in stats
+            }
+        except Exception as e:
+            logger.warning(f"[INDEXES] $indexStats indisponível para {collection_name}: {e}")
+        
+        indexes = []
+        for name, spec in specs.items():
+            indexes.append({
+                'name': name,
+                'keys': spec['keys'],
+                'unique': spec.get('unique', False),
+                'present': name in existing,
+                'ops': usage.get(name, {}).get('ops'),
+                'since': usage.get(name, {}).get('since')
+            })
+        
+        collections.append({
+            'collection': collection_name,
+            'indexes': indexes,
+            'missing': [i['name'] for i in indexes if not i['present']],
+            'unused': [i['name'] for i in indexes if i['present'] and i['ops'] == 0],
+            'unregistered': [name for name in existing if name != '_id_' and name not in specs]
+        })
+    
+    return {
+        'applied_at': index_registry_state['applied_at'],
+        'apply_errors': [r for r in index_registry_state['results'] if r['status'] == 'error'],
+        'missing_total': sum(len(c['missing']) for c in collections),
+        'unused_total': sum(len(c['unused']) for c in collections),
+        'collections': collections
+    }
+
 # ============= Health Check =============
 
 @api_router.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+@api_router.get("/health/ready")
+async def readiness_check():
+    """Readiness por fase do startup (separado do /health de liveness)"""
+    from fastapi.responses import JSONResponse
+    
+    ready = all(startup_state[phase]['status'] == 'done' for phase in CRITICAL_STARTUP_PHASES)
+    background_complete = all(
+        startup_state[phase]['status'] not in ('pending', 'running')
+        for phase in STARTUP_PHASES if phase not in CRITICAL_STARTUP_PHASES
+    )
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            'ready': ready,
+            'background_complete': background_complete,
+            'phases': startup_state,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    )
+
 # ============= Media Endpoint (serves from MongoDB if not in filesystem) =============
 
 @api_router.get("/media/{filename}")
@@ -4538,21 +7533,48 @@ app.include_router(api_router)
 # Serve uploaded files - fallback to static files if available
 app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 
-@app.on_event("startup")
-async def startup_event():
-    scheduler.start()
-    logger.info("Scheduler iniciado")
-    
-    # Create indexes for better query performance
+# ============= Startup / Readiness =============
+
+# Tempo máximo do auto_setup.py (instalação de dependências do WhatsApp service)
+AUTO_SETUP_TIMEOUT = int(os.environ.get('AUTO_SETUP_TIMEOUT', '300'))
+
+# Fases do startup: as críticas rodam antes da API aceitar requisições,
+# as demais rodam em background
+STARTUP_PHASES = ['send_logs_collection', 'indexes', 'admin_seed', 'scheduler', 'send_logs_migration', 'log_retention', 'qr_blob_migration', 'group_search_migration', 'whatsapp_bridge', 'bridge_restore', 'campaign_resume']
+CRITICAL_STARTUP_PHASES = ['send_logs_collection', 'indexes', 'admin_seed', 'scheduler']
+
+startup_state = {
+    phase: {'status': 'pending', 'started_at': None, 'finished_at': None, 'error': None}
+    for phase in STARTUP_PHASES
+}
+startup_background_tasks = set()
+
+async def run_startup_phase(phase: str, func):
+    """Executa uma fase do startup registrando status, tempos e erro"""
+    state = startup_state[phase]
+    state['status'] = 'running'
+    state['started_at'] = datetime.now(timezone.utc).isoformat()
     try:
-        await db.send_logs.create_index([("user_id", 1), ("sent_at", -1)])
-        await db.send_logs.create_index([("sent_at", -1)])
-        await db.send_logs.create_index([("campaign_id", 1)])
-        await db.send_logs.create_index([("status", 1)])
-        logger.info("Indexes criados para send_logs")
+        await func()
+        state['status'] = 'done'
+    except asyncio.CancelledError:
+        state['status'] = 'cancelled'
+        raise
     except Exception as e:
-        logger.warning(f"Erro ao criar indexes: {e}")
-    
+        state['status'] = 'failed'
+        state['error'] = str(e)
+        logger.error(f"[STARTUP] Fase '{phase}' falhou: {e}")
+    finally:
+        state['finished_at'] = datetime.now(timezone.utc).isoformat()
+
+def spawn_background_task(coro):
+    """Cria task mantendo referência forte (cancelada no shutdown)"""
+    task = asyncio.create_task(coro)
+    startup_background_tasks.add(task)
+    task.add_done_callback(startup_background_tasks.discard)
+    return task
+
+async def seed_admin_user():
     admin = await db.users.find_one({'username': 'admin'})
     if not admin:
         admin_user = {
@@ -4566,12 +7588,23 @@ async def startup_event():
         }
         await db.users.insert_one(admin_user)
         logger.info("Usuário admin criado: admin / admin123")
+
+async def start_scheduler():
+    scheduler.start()
+    logger.info("Scheduler iniciado")
     
-    # Start WhatsApp service if not running
-    await start_whatsapp_service()
-    
-    # Resume campaigns that were running when server stopped
-    running_campaigns = await db.campaigns.find({'status': 'running'}, {'_id': 0}).to_list(1000)
+    # Reload active campaigns (scheduled ones)
+    active_campaigns = await db.campaigns.find({'status': {'$in': ['active', 'pending']}}, {'_id': 0}).to_list(1000)
+    for campaign in active_campaigns:
+        try:
+            schedule_campaign(campaign)
+        except Exception as e:
+            logger.error(f"Erro ao recarregar campanha {campaign['id']}: {e}")
+
+async def resume_running_campaigns():
+    """Resume campaigns that were running when server stopped"""
+    running_campaigns = await db.campaigns.find({'status': {'$in': ['running', 'queued']}}, {'_id': 0}).to_list(1000)
+    to_resume = []
     for campaign in running_campaigns:
         try:
             current_index = campaign.get('current_group_index', 0)
@@ -4579,9 +7612,7 @@ async def startup_event():
             
             if current_index < total_groups:
                 logger.info(f"Retomando campanha {campaign['id']} do grupo {current_index}/{total_groups}")
-                # Use background task to resume campaign
-                import asyncio
-                asyncio.create_task(execute_campaign(campaign['id'], resume_from_index=current_index))
+                to_resume.append(campaign)
             else:
                 # Campaign was completed but status wasn't updated
                 logger.info(f"Campanha {campaign['id']} já foi concluída, atualizando status")
@@ -4599,24 +7630,44 @@ async def startup_event():
         except Exception as e:
             logger.error(f"Erro ao retomar campanha {campaign['id']}: {e}")
     
-    # Reload active campaigns (scheduled ones)
-    active_campaigns = await db.campaigns.find({'status': {'$in': ['active', 'pending']}}, {'_id': 0}).to_list(1000)
-    for campaign in active_campaigns:
-        try:
-            schedule_campaign(campaign)
-        except Exception as e:
-            logger.error(f"Erro ao recarregar campanha {campaign['id']}: {e}")
+    # Fila com concorrência limitada - não dispara todas de uma vez contra o bridge
+    if to_resume:
+        await enqueue_campaign_resume(to_resume)
 
-async def start_whatsapp_service():
+async def run_log_maintenance_startup():
+    """Migração dos send_logs antes da primeira consolidação/expiração"""
+    await run_startup_phase('send_logs_migration', migrate_legacy_send_logs)
+    await run_startup_phase('log_retention', start_log_retention)
+
+async def run_background_startup():
+    """Fases lentas: bootstrap do WhatsApp service, restauração das sessões e retomada das campanhas"""
+    await run_startup_phase('whatsapp_bridge', bootstrap_whatsapp_service)
+    await run_startup_phase('bridge_restore', start_bridge_session_restore)
+    await run_startup_phase('campaign_resume', resume_running_campaigns)
+
+@app.on_event("startup")
+async def startup_event():
+    start_activity_log_writer()
+    
+    # Caminho crítico - rápido, a API só começa a responder depois disso
+    await run_startup_phase('send_logs_collection', prepare_send_logs_collection)
+    await run_startup_phase('indexes', apply_index_registry)
+    await run_startup_phase('admin_seed', seed_admin_user)
+    await run_startup_phase('scheduler', start_scheduler)
+    
+    # Migração de dados, bridge e retomada de campanhas não seguram o startup
+    spawn_background_task(run_log_maintenance_startup())
+    spawn_background_task(run_startup_phase('qr_blob_migration', migrate_qr_blobs))
+    spawn_background_task(run_startup_phase('group_search_migration', migrate_group_search_fields))
+    if CAMPAIGN_CHANGE_STREAMS:
+        spawn_background_task(watch_campaign_changes())
+    spawn_background_task(run_background_startup())
+
+async def bootstrap_whatsapp_service():
     """Ensure WhatsApp service is running - with auto-setup"""
-    import subprocess
-    import asyncio
-    
-    global whatsapp_process
-    
     # Check if WhatsApp service is responding
     try:
-        async with httpx.AsyncClient(timeout=3.0) as http_client:
+        async with whatsapp_http_client(3.0) as http_client:
             response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
             if response.status_code == 200:
                 logger.info("WhatsApp service já está rodando")
@@ -4626,45 +7677,49 @@ async def start_whatsapp_service():
     
     logger.info("WhatsApp service não está rodando. Iniciando auto-setup...")
     
-    # Run auto-setup script
+    # Run auto-setup script (subprocesso assíncrono - não bloqueia o event loop)
+    process = await asyncio.create_subprocess_exec(
+        'python3', '/app/backend/auto_setup.py',
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd='/app/backend'
+    )
+    
     try:
-        result = subprocess.run(
-            ['python3', '/app/backend/auto_setup.py'],
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5 minutes max
-            cwd='/app/backend'
-        )
-        
-        if result.stdout:
-            for line in result.stdout.split('\n'):
-                if line.strip():
-                    logger.info(f"[auto-setup] {line}")
-        
-        if result.stderr:
-            for line in result.stderr.split('\n'):
-                if line.strip():
-                    logger.warning(f"[auto-setup] {line}")
-        
-        # Check if service is now running
-        await asyncio.sleep(2)
-        try:
-            async with httpx.AsyncClient(timeout=3.0) as http_client:
-                response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
-                if response.status_code == 200:
-                    logger.info("WhatsApp service iniciado com sucesso via auto-setup")
-                    return
-        except:
-            pass
-        
-        logger.warning("Auto-setup concluído, mas serviço ainda não responde. Pode estar iniciando...")
-        
-    except subprocess.TimeoutExpired:
-        logger.error("Auto-setup timeout - pode demorar mais para instalar dependências")
-    except Exception as e:
-        logger.error(f"Erro no auto-setup: {e}")
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=AUTO_SETUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise Exception(f"Auto-setup timeout ({AUTO_SETUP_TIMEOUT}s) - pode demorar mais para instalar dependências")
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    
+    for line in stdout.decode('utf-8', errors='replace').split('\n'):
+        if line.strip():
+            logger.info(f"[auto-setup] {line}")
+    
+    for line in stderr.decode('utf-8', errors='replace').split('\n'):
+        if line.strip():
+            logger.warning(f"[auto-setup] {line}")
+    
+    # Check if service is now running
+    await asyncio.sleep(2)
+    try:
+        async with whatsapp_http_client(3.0) as http_client:
+            response = await http_client.get(f"{WHATSAPP_SERVICE_URL}/health")
+            if response.status_code == 200:
+                logger.info("WhatsApp service iniciado com sucesso via auto-setup")
+                return
+    except:
+        pass
+    
+    raise Exception("Auto-setup concluído, mas serviço ainda não responde. Pode estar iniciando...")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task in list(startup_background_tasks):
+        task.cancel()
     scheduler.shutdown()
+    await stop_activity_log_writer()
     client.close()
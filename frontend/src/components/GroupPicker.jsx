@@ -0,0 +1,189 @@
+import { useEffect, useState } from 'react';
+import { useGroupsStore } from '@/store';
+import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
+import { toast } from 'sonner';
+import { Search, Users } from 'lucide-react';
+
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+
+// Seleção de grupos de uma conexão via /groups/paginated: carrega por página
+// (nunca a lista inteira) e "Selecionar todos" busca só os ids do filtro atual
+export default function GroupPicker({ connectionId, selectedGroups, onChange }) {
+  const { fetchGroupsPage, fetchGroupIds } = useGroupsStore();
+
+  const [search, setSearch] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
+  const [groups, setGroups] = useState([]);
+  const [page, setPage] = useState(1);
+  const [total, setTotal] = useState(0);
+  const [totalPages, setTotalPages] = useState(0);
+  const [loading, setLoading] = useState(false);
+  const [selectingAll, setSelectingAll] = useState(false);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  // Troca de conexão limpa a busca
+  useEffect(() => {
+    setSearch('');
+    setDebouncedSearch('');
+  }, [connectionId]);
+
+  // Nova conexão ou busca: recomeça da primeira página
+  useEffect(() => {
+    setGroups([]);
+    setPage(1);
+    setTotal(0);
+    setTotalPages(0);
+  }, [connectionId, debouncedSearch]);
+
+  useEffect(() => {
+    if (!connectionId) return;
+    let cancelled = false;
+
+    const loadPage = async () => {
+      setLoading(true);
+      try {
+        const data = await fetchGroupsPage({ connectionId, search: debouncedSearch, page, limit: PAGE_SIZE });
+        if (cancelled) return;
+        setGroups((prev) => (page === 1 ? data.groups : [...prev, ...data.groups]));
+        setTotal(data.total);
+        setTotalPages(data.total_pages);
+      } catch (error) {
+        if (!cancelled) {
+          console.error('Erro ao carregar grupos:', error);
+          toast.error('Erro ao carregar grupos');
+        }
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+
+    loadPage();
+    return () => {
+      cancelled = true;
+    };
+  }, [connectionId, debouncedSearch, page, fetchGroupsPage]);
+
+  const toggleGroup = (groupId) => {
+    onChange((prev) =>
+      prev.includes(groupId)
+        ? prev.filter((id) => id !== groupId)
+        : [...prev, groupId]
+    );
+  };
+
+  const selectAllGroups = async () => {
+    setSelectingAll(true);
+    try {
+      const ids = await fetchGroupIds({ connectionId, search: debouncedSearch });
+      onChange((prev) => [...new Set([...prev, ...ids])]);
+    } catch (error) {
+      toast.error('Erro ao selecionar grupos');
+    } finally {
+      setSelectingAll(false);
+    }
+  };
+
+  return (
+    <>
+      <div className="flex items-center justify-between mb-3">
+        <div className="flex items-center gap-2 text-primary">
+          <Users className="w-4 h-4" />
+          <span className="font-medium text-sm">Grupos ({selectedGroups.length} selecionados)</span>
+        </div>
+        {connectionId && (
+          <div className="flex items-center -mr-2">
+            {selectedGroups.length > 0 && (
+              <Button type="button" variant="ghost" size="sm" onClick={() => onChange([])} className="text-muted-foreground">
+                Limpar
+              </Button>
+            )}
+            {total > 0 && (
+              <Button type="button" variant="ghost" size="sm" onClick={selectAllGroups} disabled={selectingAll} className="text-primary">
+                {debouncedSearch ? `Selecionar ${total} encontrados` : 'Selecionar Todos'}
+              </Button>
+            )}
+          </div>
+        )}
+      </div>
+
+      {!connectionId ? (
+        <p className="text-center py-6 text-muted-foreground text-sm">
+          Selecione uma conexão para ver os grupos
+        </p>
+      ) : (
+        <>
+          <div className="relative mb-3">
+            <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-4 h-4 text-muted-foreground" />
+            <Input
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              placeholder="Buscar grupo pelo nome..."
+              className="pl-9"
+            />
+          </div>
+
+          {loading && groups.length === 0 ? (
+            <div className="text-center py-6">
+              <div className="w-6 h-6 border-2 border-primary border-t-transparent rounded-full animate-spin mx-auto" />
+            </div>
+          ) : groups.length === 0 ? (
+            <p className="text-center py-6 text-muted-foreground text-sm">
+              Nenhum grupo encontrado
+            </p>
+          ) : (
+            <div className="max-h-64 overflow-y-auto">
+              <div className="grid grid-cols-1 sm:grid-cols-2 gap-2">
+                {groups.map((group) => {
+                  const isSelected = selectedGroups.includes(group.id);
+                  return (
+                    <div
+                      key={group.id}
+                      onClick={() => toggleGroup(group.id)}
+                      className={`flex items-center gap-3 p-3 rounded-lg cursor-pointer transition-all ${
+                        isSelected
+                          ? 'bg-primary/15 border border-primary/30'
+                          : 'bg-muted/30 border border-transparent hover:border-border'
+                      }`}
+                    >
+                      <div className={`w-5 h-5 rounded border-2 flex items-center justify-center flex-shrink-0 ${
+                        isSelected ? 'bg-primary border-primary' : 'border-muted-foreground'
+                      }`}>
+                        {isSelected && (
+                          <svg className="w-3 h-3 text-primary-foreground" fill="none" viewBox="0 0 24 24" stroke="currentColor" strokeWidth={3}>
+                            <path strokeLinecap="round" strokeLinejoin="round" d="M5 13l4 4L19 7" />
+                          </svg>
+                        )}
+                      </div>
+                      <div className="min-w-0 flex-1">
+                        <p className="text-sm font-medium text-foreground truncate">{group.name}</p>
+                        <p className="text-xs text-muted-foreground">{group.participants_count} participantes</p>
+                      </div>
+                    </div>
+                  );
+                })}
+              </div>
+              {page < totalPages && (
+                <Button
+                  type="button"
+                  variant="ghost"
+                  size="sm"
+                  onClick={() => setPage((prev) => prev + 1)}
+                  disabled={loading}
+                  className="w-full mt-2 text-primary"
+                >
+                  {loading ? 'Carregando...' : `Carregar mais (${groups.length} de ${total})`}
+                </Button>
+              )}
+            </div>
+          )}
+        </>
+      )}
+    </>
+  );
+}
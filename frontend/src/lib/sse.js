@@ -0,0 +1,30 @@
+// Lê uma resposta text/event-stream (fetch + ReadableStream) e chama onEvent(event, data)
+// para cada evento com JSON em data. Comentários (": keepalive") são ignorados.
+// Resolve quando o servidor fecha o stream; rejeita em erro/abort do fetch.
+export async function readServerSentEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let separator;
+    while ((separator = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, separator);
+      buffer = buffer.slice(separator + 2);
+
+      let event = 'message';
+      let dataLine = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) dataLine += line.slice(6);
+      }
+      if (dataLine) {
+        onEvent(event, JSON.parse(dataLine));
+      }
+    }
+  }
+}
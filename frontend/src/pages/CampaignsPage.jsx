@@ -1,4 +1,4 @@
-import { useEffect, useState, useCallback, useMemo } from 'react';
+import { useEffect, useState, useCallback, useMemo, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useCampaignsStore, useAuthStore } from '@/store';
 import { Card, CardContent } from '@/components/ui/card';
@@ -38,6 +38,7 @@ import {
 import { toast } from 'sonner';
 import { Plus, Clock, CheckCircle, XCircle, Send, Trash2, Pause, Play, Image, Copy, Zap, Calendar, Users, Edit2, Timer, ChevronLeft, ChevronRight, FolderInput, Replace, MoreVertical, Filter } from 'lucide-react';
 import { api } from '@/store';
+import { readServerSentEvents } from '@/lib/sse';
 
 // Componente de timer em tempo real para cada card
 function CampaignTimer({ campaign }) {
@@ -172,12 +173,21 @@ function NextScheduleTime({ campaign }) {
   );
 }
 
+// Variações da campanha para o preview: a listagem (view=summary) traz só as imagens
+// de cada variação; o detalhe completo traz as mensagens
+function campaignVariations(campaign) {
+  if (campaign.message_image_ids) {
+    return campaign.message_image_ids.map(image_id => ({ image_id }));
+  }
+  return campaign.messages || [];
+}
+
 // Componente de preview animado para campanhas com múltiplas variações
 function AnimatedCampaignPreview({ campaign, imageCache, loadImagePreview }) {
   const [currentIndex, setCurrentIndex] = useState(0);
   const [isTransitioning, setIsTransitioning] = useState(false);
   
-  const messages = campaign.messages || [];
+  const messages = useMemo(() => campaignVariations(campaign), [campaign.message_image_ids, campaign.messages]);
   const hasMultiple = messages.length > 1;
   
   // Calculate current image from cache
@@ -275,6 +285,7 @@ export default function CampaignsPage() {
   const [totalPages, setTotalPages] = useState(1);
   const [paginatedCampaigns, setPaginatedCampaigns] = useState([]);
   const [ownerFilter, setOwnerFilter] = useState('mine');
+  const [liveUpdates, setLiveUpdates] = useState(false);
   const limit = 12;
 
   const isAdmin = user?.role === 'admin';
@@ -288,7 +299,7 @@ export default function CampaignsPage() {
 
   const fetchPaginatedCampaigns = useCallback(async () => {
     try {
-      const response = await api.get(`/campaigns/paginated?page=${page}&limit=${limit}&owner_filter=${ownerFilter}`);
+      const response = await api.get(`/campaigns/paginated?page=${page}&limit=${limit}&owner_filter=${ownerFilter}&view=summary`);
       setPaginatedCampaigns(response.data.campaigns);
       setTotalPages(response.data.total_pages);
     } catch (error) {
@@ -300,10 +311,64 @@ export default function CampaignsPage() {
     fetchPaginatedCampaigns();
     fetchCampaigns(); // Also fetch for store
     
-    // Refresh every 10 seconds to update timers and status
-    const interval = setInterval(fetchPaginatedCampaigns, 10000);
+    // Com o SSE conectado as mudanças chegam por push; o polling lento continua como
+    // rede de segurança (outros processos, exclusão de usuários)
+    const interval = setInterval(fetchPaginatedCampaigns, liveUpdates ? 60000 : 10000);
     return () => clearInterval(interval);
-  }, [fetchPaginatedCampaigns, fetchCampaigns]);
+  }, [fetchPaginatedCampaigns, fetchCampaigns, liveUpdates]);
+
+  // Progresso, status e erros de envio em tempo real (SSE)
+  const fetchPaginatedRef = useRef(fetchPaginatedCampaigns);
+  fetchPaginatedRef.current = fetchPaginatedCampaigns;
+
+  useEffect(() => {
+    const controller = new AbortController();
+    let retryTimeout;
+
+    const applyEvent = (event, data) => {
+      if (event === 'progress' || event === 'status') {
+        const { campaign_id, total_groups, ...fields } = data;
+        setPaginatedCampaigns(prev => prev.map(c => c.id === campaign_id ? { ...c, ...fields } : c));
+      } else if (event === 'send_error') {
+        setPaginatedCampaigns(prev => prev.map(c => c.id === data.campaign_id ? { ...c, last_send_error: data } : c));
+      } else if (event === 'changed' || event === 'resync') {
+        // Criação, edição, duplicação ou exclusão: recarrega a página atual
+        fetchPaginatedRef.current();
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const token = localStorage.getItem('nexus-token');
+        const response = await fetch(`${api.defaults.baseURL}/campaigns/events?owner_filter=${ownerFilter}`, {
+          headers: { Authorization: `Bearer ${token}` },
+          signal: controller.signal
+        });
+        if (!response.ok || !response.body) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+        setLiveUpdates(true);
+
+        await readServerSentEvents(response, applyEvent);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Campaign events stream error:', error);
+      }
+
+      // Conexão caiu: volta para o polling e tenta reconectar
+      setLiveUpdates(false);
+      if (!controller.signal.aborted) {
+        retryTimeout = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimeout);
+      setLiveUpdates(false);
+    };
+  }, [ownerFilter]);
 
   // Reset page when filter changes
   useEffect(() => {
@@ -417,6 +482,7 @@ export default function CampaignsPage() {
     const config = {
       pending: { class: 'status-pending', label: 'Pendente', icon: Clock },
       running: { class: 'status-running', label: 'Enviando', icon: Send },
+      queued: { class: 'status-pending', label: 'Na fila', icon: Clock },
       completed: { class: 'status-completed', label: 'Concluída', icon: CheckCircle },
       failed: { class: 'status-failed', label: 'Falhou', icon: XCircle },
       active: { class: 'status-active', label: 'Ativa', icon: Play },
@@ -446,12 +512,12 @@ export default function CampaignsPage() {
 
   const stats = [
     { label: 'Total', value: campaigns.length },
-    { label: 'Ativas', value: campaigns.filter(c => ['pending', 'active', 'running'].includes(c.status)).length, color: 'text-blue-400' },
+    { label: 'Ativas', value: campaigns.filter(c => ['pending', 'active', 'running', 'queued'].includes(c.status)).length, color: 'text-blue-400' },
     { label: 'Concluídas', value: campaigns.filter(c => c.status === 'completed').length, color: 'text-primary' },
   ];
 
   const canStart = (status) => ['pending', 'paused'].includes(status);
-  const canPause = (status) => ['active', 'running'].includes(status);
+  const canPause = (status) => ['active', 'running', 'queued'].includes(status);
   const canResume = (status) => status === 'paused';
   const canEdit = (status) => ['pending', 'paused', 'completed', 'active'].includes(status);
   
@@ -477,8 +543,9 @@ export default function CampaignsPage() {
   useEffect(() => {
     paginatedCampaigns.forEach(campaign => {
       // Load images for campaigns with multiple messages
-      if (campaign.messages && campaign.messages.length > 0) {
-        campaign.messages.forEach((msg, idx) => {
+      const variations = campaignVariations(campaign);
+      if (variations.length > 0) {
+        variations.forEach((msg, idx) => {
           if (msg.image_id) {
             const cacheKey = `${campaign.id}_${idx}`;
             if (!imageCache[cacheKey]) {
@@ -498,6 +565,9 @@ export default function CampaignsPage() {
 
   // Get current message text for preview
   const getCurrentMessage = (campaign) => {
+    if (campaign.message_preview !== undefined) {
+      return campaign.message_preview;
+    }
     if (campaign.messages && campaign.messages.length > 0) {
       return campaign.messages[0]?.message || '';
     }
@@ -569,7 +639,8 @@ export default function CampaignsPage() {
         <div className="grid grid-cols-1 md:grid-cols-2 xl:grid-cols-4 gap-4">
           {paginatedCampaigns.map((campaign, index) => {
             const scheduleInfo = getScheduleInfo(campaign);
-            const hasMultipleVariations = campaign.messages && campaign.messages.length > 1;
+            const variationCount = campaign.message_count ?? (campaign.messages || []).length;
+            const hasMultipleVariations = variationCount > 1;
             
             return (
               <Card
@@ -596,7 +667,7 @@ export default function CampaignsPage() {
                   {hasMultipleVariations && (
                     <div className="absolute bottom-10 right-2 z-10">
                       <span className="text-[10px] bg-purple-500/80 text-white px-1.5 py-0.5 rounded font-medium">
-                        {campaign.messages.length} variações
+                        {variationCount} variações
                       </span>
                     </div>
                   )}
@@ -823,7 +894,7 @@ export default function CampaignsPage() {
                       <div className="flex items-center justify-between gap-2">
                         <span className="truncate">{camp.title}</span>
                         <span className="text-xs text-muted-foreground">
-                          ({camp.total_count || camp.group_ids?.length || 0} grupos)
+                          ({camp.total_count || camp.group_count || 0} grupos)
                         </span>
                       </div>
                     </SelectItem>
@@ -837,7 +908,7 @@ export default function CampaignsPage() {
                 <p className="text-muted-foreground">
                   <strong className="text-foreground">{targetCampaign.title}</strong> atualmente tem{' '}
                   <strong className="text-primary">
-                    {targetCampaign.total_count || targetCampaign.group_ids?.length || 0}
+                    {targetCampaign.total_count || targetCampaign.group_count || 0}
                   </strong>{' '}
                   grupos configurados.
                 </p>
@@ -12,6 +12,7 @@ import {
   SelectValue,
 } from '@/components/ui/select';
 import { toast } from 'sonner';
+import { readServerSentEvents } from '@/lib/sse';
 import { Plus, Wifi, WifiOff, Trash2, RefreshCw, Loader2, Phone, Filter } from 'lucide-react';
 
 export default function ConnectionsPage() {
@@ -27,6 +28,8 @@ export default function ConnectionsPage() {
   // Estado para QR codes - cada conexão pode ter seu próprio QR
   const [qrStates, setQrStates] = useState({});
   const pollingRefs = useRef({});
+  // true com o stream de eventos ativo e o webhook do WhatsApp service ligado
+  const liveUpdatesRef = useRef(false);
 
   useEffect(() => {
     fetchConnections(false, ownerFilter);
@@ -67,6 +70,98 @@ export default function ConnectionsPage() {
     }
   };
 
+  // Status, QR e telefone das conexões em tempo real (SSE alimentado pelo webhook do WhatsApp service)
+  const fetchConnectionsRef = useRef(fetchConnections);
+  fetchConnectionsRef.current = fetchConnections;
+  const qrStatesRef = useRef(qrStates);
+  qrStatesRef.current = qrStates;
+
+  useEffect(() => {
+    const controller = new AbortController();
+    let retryTimeout;
+
+    const applyEvent = (event, data) => {
+      if (event === 'ready') {
+        liveUpdatesRef.current = data.webhook;
+        if (data.webhook) {
+          // Pollings em andamento passam a ser desnecessários
+          Object.values(pollingRefs.current).forEach(clearInterval);
+          pollingRefs.current = {};
+        }
+      } else if (event === 'connection') {
+        const { connection_id: connectionId } = data;
+        if (qrStatesRef.current[connectionId]) {
+          if (data.status === 'connected') {
+            toast.success('WhatsApp conectado!');
+            setQrStates(prev => {
+              const next = { ...prev };
+              delete next[connectionId];
+              return next;
+            });
+          } else {
+            setQrStates(prev => ({
+              ...prev,
+              [connectionId]: {
+                ...prev[connectionId],
+                ...('qr_image' in data ? { qrImage: data.qr_image } : {}),
+                ...(data.status ? { status: data.status } : {}),
+                loading: false
+              }
+            }));
+          }
+        }
+        if ('status' in data || 'phone_number' in data) {
+          fetchConnectionsRef.current(false, ownerFilter);
+        }
+      } else if (event === 'connection_job') {
+        // Job de connect falhou (o resultado de sucesso chega como QR/status)
+        if (data.kind === 'connect' && data.status === 'failed' && qrStatesRef.current[data.connection_id]) {
+          toast.error(data.error || 'Erro ao iniciar conexão');
+          setQrStates(prev => ({
+            ...prev,
+            [data.connection_id]: { ...prev[data.connection_id], loading: false, status: 'error' }
+          }));
+        }
+      } else if (event === 'resync') {
+        fetchConnectionsRef.current(false, ownerFilter);
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const token = localStorage.getItem('nexus-token');
+        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/connections/events?owner_filter=${ownerFilter}`, {
+          headers: { Authorization: `Bearer ${token}` },
+          signal: controller.signal
+        });
+        if (!response.ok || !response.body) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+
+        await readServerSentEvents(response, applyEvent);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Connection events stream error:', error);
+      }
+
+      // Conexão caiu: QRs abertos voltam para o polling e tenta reconectar
+      liveUpdatesRef.current = false;
+      if (!controller.signal.aborted) {
+        Object.keys(qrStatesRef.current).forEach(connectionId => {
+          if (!pollingRefs.current[connectionId]) startPolling(connectionId);
+        });
+        retryTimeout = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimeout);
+      liveUpdatesRef.current = false;
+    };
+  }, [ownerFilter]);
+
   // Iniciar polling para uma conexão
   const startPolling = (connectionId) => {
     if (pollingRefs.current[connectionId]) {
@@ -76,7 +171,10 @@ export default function ConnectionsPage() {
     // Busca imediata
     fetchQR(connectionId);
     
-    // Polling a cada 2 segundos
+    // Com eventos em tempo real o QR e o status chegam por push
+    if (liveUpdatesRef.current) return;
+    
+    // Polling a cada 2 segundos (fallback)
     pollingRefs.current[connectionId] = setInterval(() => {
       fetchQR(connectionId);
     }, 2000);
@@ -99,15 +197,19 @@ export default function ConnectionsPage() {
 
     try {
       const token = localStorage.getItem('nexus-token');
-      await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/connections/${connectionId}/connect`, {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/connections/${connectionId}/connect`, {
         method: 'POST',
         headers: { Authorization: `Bearer ${token}` }
       });
+      if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.detail);
+      }
       
-      // Inicia polling para buscar QR
+      // A conexão é criada em background (job); o QR chega por push ou polling
       startPolling(connectionId);
     } catch (error) {
-      toast.error('Erro ao iniciar conexão');
+      toast.error(error.message || 'Erro ao iniciar conexão');
       setQrStates(prev => ({
         ...prev,
         [connectionId]: { loading: false, status: 'error' }
@@ -172,36 +274,46 @@ export default function ConnectionsPage() {
     }
   };
 
-  // Sincronizar grupos
+  // Sincronizar grupos (job em background no backend; acompanha o progresso)
   const handleSyncGroups = async (connectionId) => {
+    const token = localStorage.getItem('nexus-token');
+    const headers = { Authorization: `Bearer ${token}` };
+    const toastId = toast.loading('Sincronizando grupos...');
+    
     try {
-      const token = localStorage.getItem('nexus-token');
-      toast.loading('Sincronizando grupos...');
-      console.log(`[DEBUG] Sincronizando grupos para: ${connectionId}`);
-      
       const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/connections/${connectionId}/refresh-groups`, {
         method: 'POST',
-        headers: { Authorization: `Bearer ${token}` }
+        headers
       });
-      toast.dismiss();
+      let job = await response.json();
       
-      const data = await response.json();
-      console.log(`[DEBUG] Resposta sync grupos:`, data);
+      if (!response.ok) {
+        toast.error(job.detail || 'Erro ao sincronizar', { id: toastId });
+        return;
+      }
+      
+      while (job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        const progressResponse = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/connections/${connectionId}/group-sync`, { headers });
+        if (!progressResponse.ok) break;
+        job = await progressResponse.json();
+        if (job.status === 'running' && job.total) {
+          toast.loading(`Sincronizando grupos... ${job.processed}/${job.total}`, { id: toastId });
+        }
+      }
       
-      if (response.ok) {
-        toast.success(`${data.count || 0} grupos sincronizados!`);
-        if (data.count === 0) {
+      if (job.status === 'done') {
+        toast.success(`${job.count || 0} grupos sincronizados!`, { id: toastId });
+        if (!job.count) {
           toast.warning('Nenhum grupo encontrado. Verifique se a conexão está ativa.');
         }
       } else {
-        console.error(`[DEBUG] Erro ao sincronizar:`, data);
-        toast.error(data.detail || 'Erro ao sincronizar');
+        toast.error(job.error || 'Erro ao sincronizar', { id: toastId });
       }
       
       fetchConnections();
     } catch (error) {
-      toast.dismiss();
-      toast.error('Erro ao sincronizar');
+      toast.error('Erro ao sincronizar', { id: toastId });
     }
   };
 
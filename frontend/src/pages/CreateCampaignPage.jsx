@@ -1,6 +1,6 @@
-import { useEffect, useState, useCallback } from 'react';
+import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { useConnectionsStore, useGroupsStore, useCampaignsStore, useImagesStore } from '@/store';
+import { useConnectionsStore, useCampaignsStore, useImagesStore } from '@/store';
 import { Card, CardContent } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -13,19 +13,18 @@ import {
   SelectTrigger,
   SelectValue,
 } from '@/components/ui/select';
+import GroupPicker from '@/components/GroupPicker';
 import { toast } from 'sonner';
-import { ArrowLeft, Upload, Info, Clock, Users, Image, MessageSquare, X, Plus, Trash2 } from 'lucide-react';
+import { ArrowLeft, Upload, Info, Clock, Image, MessageSquare, X, Plus, Trash2 } from 'lucide-react';
 
 export default function CreateCampaignPage() {
   const navigate = useNavigate();
   const { connections, fetchConnections } = useConnectionsStore();
-  const { fetchGroupsByConnection } = useGroupsStore();
   const { createCampaign } = useCampaignsStore();
   const { images, fetchImages, uploadImage } = useImagesStore();
   
   const [title, setTitle] = useState('');
   const [selectedConnection, setSelectedConnection] = useState('');
-  const [groups, setGroups] = useState([]);
   const [selectedGroups, setSelectedGroups] = useState([]);
   
   // Múltiplas mensagens/imagens
@@ -40,7 +39,6 @@ export default function CreateCampaignPage() {
   const [endDate, setEndDate] = useState('');
   const [delaySeconds, setDelaySeconds] = useState(5);
   const [loading, setLoading] = useState(false);
-  const [loadingGroups, setLoadingGroups] = useState(false);
   const [uploadingIndex, setUploadingIndex] = useState(null);
 
   // Preview animado
@@ -62,26 +60,10 @@ export default function CreateCampaignPage() {
     return () => clearInterval(interval);
   }, [messageItems.length]);
 
-  const loadGroups = useCallback(async (connectionId) => {
-    setLoadingGroups(true);
-    try {
-      const data = await fetchGroupsByConnection(connectionId);
-      setGroups(data);
-    } catch (error) {
-      toast.error('Erro ao carregar grupos');
-    } finally {
-      setLoadingGroups(false);
-    }
-  }, [fetchGroupsByConnection]);
-
+  // Grupos pertencem à conexão: trocar de conexão limpa a seleção
   useEffect(() => {
-    if (selectedConnection) {
-      loadGroups(selectedConnection);
-    } else {
-      setGroups([]);
-      setSelectedGroups([]);
-    }
-  }, [selectedConnection, loadGroups]);
+    setSelectedGroups([]);
+  }, [selectedConnection]);
 
   const handleImageUpload = async (e, index) => {
     const file = e.target.files?.[0];
@@ -171,22 +153,6 @@ export default function CreateCampaignPage() {
     setMessageItems(newItems);
   };
 
-  const toggleGroup = (groupId) => {
-    setSelectedGroups((prev) =>
-      prev.includes(groupId)
-        ? prev.filter((id) => id !== groupId)
-        : [...prev, groupId]
-    );
-  };
-
-  const selectAllGroups = () => {
-    if (selectedGroups.length === groups.length) {
-      setSelectedGroups([]);
-    } else {
-      setSelectedGroups(groups.map((g) => g.id));
-    }
-  };
-
   const addSpecificTime = () => {
     setSpecificTimes([...specificTimes, '12:00']);
   };
@@ -339,62 +305,11 @@ export default function CreateCampaignPage() {
         {/* Groups Selection */}
         <Card className="glass-card">
           <CardContent className="p-4">
-            <div className="flex items-center justify-between mb-3">
-              <div className="flex items-center gap-2 text-primary">
-                <Users className="w-4 h-4" />
-                <span className="font-medium text-sm">Grupos ({selectedGroups.length} selecionados)</span>
-              </div>
-              {groups.length > 0 && (
-                <Button type="button" variant="ghost" size="sm" onClick={selectAllGroups} className="text-primary -mr-2">
-                  {selectedGroups.length === groups.length ? 'Desmarcar' : 'Selecionar'} Todos
-                </Button>
-              )}
-            </div>
-            
-            {!selectedConnection ? (
-              <p className="text-center py-6 text-muted-foreground text-sm">
-                Selecione uma conexão para ver os grupos
-              </p>
-            ) : loadingGroups ? (
-              <div className="text-center py-6">
-                <div className="w-6 h-6 border-2 border-primary border-t-transparent rounded-full animate-spin mx-auto" />
-              </div>
-            ) : groups.length === 0 ? (
-              <p className="text-center py-6 text-muted-foreground text-sm">
-                Nenhum grupo encontrado
-              </p>
-            ) : (
-              <div className="grid grid-cols-1 sm:grid-cols-2 gap-2 max-h-48 overflow-y-auto">
-                {groups.map((group) => {
-                  const isSelected = selectedGroups.includes(group.id);
-                  return (
-                    <div
-                      key={group.id}
-                      onClick={() => toggleGroup(group.id)}
-                      className={`flex items-center gap-3 p-3 rounded-lg cursor-pointer transition-all ${
-                        isSelected
-                          ? 'bg-primary/15 border border-primary/30'
-                          : 'bg-muted/30 border border-transparent hover:border-border'
-                      }`}
-                    >
-                      <div className={`w-5 h-5 rounded border-2 flex items-center justify-center flex-shrink-0 ${
-                        isSelected ? 'bg-primary border-primary' : 'border-muted-foreground'
-                      }`}>
-                        {isSelected && (
-                          <svg className="w-3 h-3 text-primary-foreground" fill="none" viewBox="0 0 24 24" stroke="currentColor" strokeWidth={3}>
-                            <path strokeLinecap="round" strokeLinejoin="round" d="M5 13l4 4L19 7" />
-                          </svg>
-                        )}
-                      </div>
-                      <div className="min-w-0 flex-1">
-                        <p className="text-sm font-medium text-foreground truncate">{group.name}</p>
-                        <p className="text-xs text-muted-foreground">{group.participants_count} participantes</p>
-                      </div>
-                    </div>
-                  );
-                })}
-              </div>
-            )}
+            <GroupPicker
+              connectionId={selectedConnection}
+              selectedGroups={selectedGroups}
+              onChange={setSelectedGroups}
+            />
           </CardContent>
         </Card>
 
@@ -229,7 +229,7 @@ export default function DashboardPage() {
   }, [fetchConnections, fetchCampaigns, fetchStats]);
 
   const connectedCount = connections.filter(c => c.status === 'connected').length;
-  const activeCampaigns = campaigns.filter(c => ['active', 'running'].includes(c.status)).length;
+  const activeCampaigns = campaigns.filter(c => ['active', 'running', 'queued'].includes(c.status)).length;
 
   return (
     <div data-testid="dashboard-page" className="space-y-6 animate-fade-in">
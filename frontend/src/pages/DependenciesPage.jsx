@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from "react";
 import { Package, CheckCircle, XCircle, Loader2, Play, RefreshCw, Terminal, AlertTriangle, Send } from "lucide-react";
 import { toast } from "sonner";
+import { readServerSentEvents } from "@/lib/sse";
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -195,7 +196,7 @@ export default function DependenciesPage() {
     
     try {
       const token = localStorage.getItem("nexus-token");
-      const response = await fetch(`${API_URL}/admin/terminal/execute`, {
+      const response = await fetch(`${API_URL}/admin/terminal/stream`, {
         method: "POST",
         headers: { 
           Authorization: `Bearer ${token}`,
@@ -204,22 +205,32 @@ export default function DependenciesPage() {
         body: JSON.stringify({ command: cmd })
       });
       
-      const data = await response.json();
-      
-      if (data.output) {
-        setTerminalOutput(prev => [...prev, { type: 'output', text: data.output }]);
+      if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.detail || `HTTP ${response.status}`);
       }
       
-      if (data.error) {
-        setTerminalOutput(prev => [...prev, { type: 'error', text: data.error }]);
-      }
+      const handleEvent = (event, data) => {
+        if (event === 'stdout' || event === 'stderr') {
+          setTerminalOutput(prev => [...prev, { type: event === 'stdout' ? 'output' : 'error', text: data.data }]);
+        } else if (event === 'exit') {
+          if (data.error) {
+            setTerminalOutput(prev => [...prev, { type: 'error', text: data.error }]);
+          }
+          if (!data.success) {
+            setTerminalOutput(prev => [...prev, { 
+              type: 'error', 
+              text: `Comando falhou com código de saída: ${data.exit_code}` 
+            }]);
+          }
+        }
+        if (terminalRef.current) {
+          terminalRef.current.scrollTop = terminalRef.current.scrollHeight;
+        }
+      };
       
-      if (!data.success) {
-        setTerminalOutput(prev => [...prev, { 
-          type: 'error', 
-          text: `Comando falhou com código de saída: ${data.exit_code}` 
-        }]);
-      }
+      // Lê eventos SSE conforme o comando produz saída
+      await readServerSentEvents(response, handleEvent);
       
     } catch (error) {
       setTerminalOutput(prev => [...prev, { 
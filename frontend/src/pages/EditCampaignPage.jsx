@@ -1,6 +1,6 @@
 import { useEffect, useState, useCallback } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
-import { useConnectionsStore, useGroupsStore, useCampaignsStore, useImagesStore, api } from '@/store';
+import { useConnectionsStore, useCampaignsStore, useImagesStore, api } from '@/store';
 import { Card, CardContent } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -19,21 +19,20 @@ import {
   AccordionItem,
   AccordionTrigger,
 } from '@/components/ui/accordion';
+import GroupPicker from '@/components/GroupPicker';
 import { toast } from 'sonner';
-import { ArrowLeft, Upload, Info, Clock, Users, Image, MessageSquare, X, Plus, Trash2 } from 'lucide-react';
+import { ArrowLeft, Upload, Info, Clock, Image, MessageSquare, X, Plus, Trash2 } from 'lucide-react';
 
 export default function EditCampaignPage() {
   const navigate = useNavigate();
   const { id } = useParams();
   const { connections, fetchConnections } = useConnectionsStore();
-  const { fetchGroupsByConnection } = useGroupsStore();
   const { updateCampaign } = useCampaignsStore();
   const { images, fetchImages, uploadImage } = useImagesStore();
   
   const [campaign, setCampaign] = useState(null);
   const [title, setTitle] = useState('');
   const [selectedConnection, setSelectedConnection] = useState('');
-  const [groups, setGroups] = useState([]);
   const [selectedGroups, setSelectedGroups] = useState([]);
   
   // Múltiplas mensagens/imagens
@@ -49,7 +48,6 @@ export default function EditCampaignPage() {
   const [delaySeconds, setDelaySeconds] = useState(5);
   const [loading, setLoading] = useState(false);
   const [loadingCampaign, setLoadingCampaign] = useState(true);
-  const [loadingGroups, setLoadingGroups] = useState(false);
   const [uploadingIndex, setUploadingIndex] = useState(null);
 
   // Preview animado
@@ -67,40 +65,23 @@ export default function EditCampaignPage() {
     }
   }, []);
 
-  // Função para carregar grupos (definida ANTES dos useEffects que a usam)
-  const loadGroups = useCallback(async (connectionId, preSelectedGroups = []) => {
-    setLoadingGroups(true);
+  // Seleção inicial = grupos da campanha que ainda existem (missing_group_ids vem do
+  // groups-info, sem carregar todos os grupos da conexão)
+  const loadSelectedGroups = useCallback(async (groupIds) => {
+    if (groupIds.length === 0) return;
     try {
-      const data = await fetchGroupsByConnection(connectionId);
-      setGroups(data);
-      
-      // Se há grupos pré-selecionados (ao carregar a campanha), validar e filtrar apenas os que existem
-      if (preSelectedGroups.length > 0) {
-        const validGroupIds = data.map(g => g.id);
-        const validSelectedGroups = preSelectedGroups.filter(id => validGroupIds.includes(id));
-        
-        if (validSelectedGroups.length !== preSelectedGroups.length) {
-          console.warn(`${preSelectedGroups.length - validSelectedGroups.length} grupo(s) da campanha não existem mais`);
-          toast.info(`Alguns grupos da campanha não existem mais. Foram removidos da seleção.`);
-        }
-        
-        setSelectedGroups(validSelectedGroups);
+      const response = await api.get(`/campaigns/${id}/groups-info`, { params: { limit: 1 } });
+      const missing = new Set(response.data.missing_group_ids || []);
+      if (missing.size > 0) {
+        console.warn(`${missing.size} grupo(s) da campanha não existem mais`);
+        toast.info(`Alguns grupos da campanha não existem mais. Foram removidos da seleção.`);
       }
+      setSelectedGroups(groupIds.filter((groupId) => !missing.has(groupId)));
     } catch (error) {
-      console.error('Erro ao carregar grupos:', error);
-      // Se a conexão não existe mais, limpar a seleção
-      if (error.response?.status === 404) {
-        setSelectedConnection('');
-        setGroups([]);
-        setSelectedGroups([]);  // Limpar grupos selecionados também
-        toast.error('Conexão não encontrada. Selecione outra conexão.');
-      } else {
-        toast.error('Erro ao carregar grupos');
-      }
-    } finally {
-      setLoadingGroups(false);
+      console.error('Erro ao validar grupos da campanha:', error);
+      setSelectedGroups(groupIds);
     }
-  }, [fetchGroupsByConnection]);
+  }, [id]);
 
   // Load campaign data
   useEffect(() => {
@@ -111,8 +92,7 @@ export default function EditCampaignPage() {
         setCampaign(data);
         setTitle(data.title);
         setSelectedConnection(data.connection_id);
-        // NÃO setar selectedGroups aqui - será setado quando loadGroups for chamado
-        // Armazenar temporariamente para passar ao loadGroups
+        // NÃO setar selectedGroups aqui - loadSelectedGroups remove os que não existem mais
         const groupIdsToSelect = data.group_ids || [];
         
         setScheduleType(data.schedule_type || 'once');
@@ -161,9 +141,8 @@ export default function EditCampaignPage() {
           setEndDate(new Date(data.end_date).toISOString().split('T')[0]);
         }
         
-        // Carregar grupos COM os IDs pré-selecionados
         if (data.connection_id) {
-          await loadGroups(data.connection_id, groupIdsToSelect);
+          await loadSelectedGroups(groupIdsToSelect);
         }
       } catch (error) {
         toast.error('Erro ao carregar campanha');
@@ -202,19 +181,18 @@ export default function EditCampaignPage() {
         console.warn('Conexão da campanha não existe mais:', selectedConnection);
         toast.error('A conexão desta campanha não existe mais. Selecione outra.');
         setSelectedConnection('');
-        setGroups([]);
         setSelectedGroups([]);  // Limpar grupos selecionados também
-        return;
-      }
-      
-      // Se a conexão mudou (usuário selecionou outra), carregar grupos sem pré-seleção
-      if (selectedConnection !== campaign.connection_id) {
-        loadGroups(selectedConnection);
       }
-    } else {
-      setGroups([]);
     }
-  }, [selectedConnection, loadGroups, connections, campaign]);
+  }, [selectedConnection, connections, campaign]);
+
+  // Grupos pertencem à conexão: trocar de conexão limpa a seleção
+  const changeConnection = (connectionId) => {
+    if (connectionId !== selectedConnection) {
+      setSelectedGroups([]);
+    }
+    setSelectedConnection(connectionId);
+  };
 
   const handleImageUpload = async (e, index) => {
     const file = e.target.files?.[0];
@@ -284,22 +262,6 @@ export default function EditCampaignPage() {
     setMessageItems(newItems);
   };
 
-  const toggleGroup = (groupId) => {
-    setSelectedGroups((prev) =>
-      prev.includes(groupId)
-        ? prev.filter((id) => id !== groupId)
-        : [...prev, groupId]
-    );
-  };
-
-  const selectAllGroups = () => {
-    if (selectedGroups.length === groups.length) {
-      setSelectedGroups([]);
-    } else {
-      setSelectedGroups(groups.map((g) => g.id));
-    }
-  };
-
   const addSpecificTime = () => {
     setSpecificTimes([...specificTimes, '12:00']);
   };
@@ -431,7 +393,7 @@ export default function EditCampaignPage() {
 
             <div className="space-y-2">
               <Label className="text-foreground">Conexão WhatsApp</Label>
-              <Select value={selectedConnection} onValueChange={setSelectedConnection}>
+              <Select value={selectedConnection} onValueChange={changeConnection}>
                 <SelectTrigger className="bg-muted/50 border-border text-foreground">
                   <SelectValue placeholder="Selecione uma conexão" />
                 </SelectTrigger>
@@ -456,62 +418,11 @@ export default function EditCampaignPage() {
         {/* Groups Selection */}
         <Card className="glass-card">
           <CardContent className="p-4">
-            <div className="flex items-center justify-between mb-3">
-              <div className="flex items-center gap-2 text-primary">
-                <Users className="w-4 h-4" />
-                <span className="font-medium text-sm">Grupos ({selectedGroups.length} selecionados)</span>
-              </div>
-              {groups.length > 0 && (
-                <Button type="button" variant="ghost" size="sm" onClick={selectAllGroups} className="text-primary -mr-2">
-                  {selectedGroups.length === groups.length ? 'Desmarcar' : 'Selecionar'} Todos
-                </Button>
-              )}
-            </div>
-            
-            {!selectedConnection ? (
-              <p className="text-center py-6 text-muted-foreground text-sm">
-                Selecione uma conexão para ver os grupos
-              </p>
-            ) : loadingGroups ? (
-              <div className="text-center py-6">
-                <div className="w-6 h-6 border-2 border-primary border-t-transparent rounded-full animate-spin mx-auto" />
-              </div>
-            ) : groups.length === 0 ? (
-              <p className="text-center py-6 text-muted-foreground text-sm">
-                Nenhum grupo encontrado
-              </p>
-            ) : (
-              <div className="grid grid-cols-1 sm:grid-cols-2 gap-2 max-h-48 overflow-y-auto">
-                {groups.map((group) => {
-                  const isSelected = selectedGroups.includes(group.id);
-                  return (
-                    <div
-                      key={group.id}
-                      onClick={() => toggleGroup(group.id)}
-                      className={`flex items-center gap-3 p-3 rounded-lg cursor-pointer transition-all ${
-                        isSelected
-                          ? 'bg-primary/15 border border-primary/30'
-                          : 'bg-muted/30 border border-transparent hover:border-border'
-                      }`}
-                    >
-                      <div className={`w-5 h-5 rounded border-2 flex items-center justify-center flex-shrink-0 ${
-                        isSelected ? 'bg-primary border-primary' : 'border-muted-foreground'
-                      }`}>
-                        {isSelected && (
-                          <svg className="w-3 h-3 text-primary-foreground" fill="none" viewBox="0 0 24 24" stroke="currentColor" strokeWidth={3}>
-                            <path strokeLinecap="round" strokeLinejoin="round" d="M5 13l4 4L19 7" />
-                          </svg>
-                        )}
-                      </div>
-                      <div className="min-w-0 flex-1">
-                        <p className="text-sm font-medium text-foreground truncate">{group.name}</p>
-                        <p className="text-xs text-muted-foreground">{group.participants_count} participantes</p>
-                      </div>
-                    </div>
-                  );
-                })}
-              </div>
-            )}
+            <GroupPicker
+              connectionId={selectedConnection}
+              selectedGroups={selectedGroups}
+              onChange={setSelectedGroups}
+            />
           </CardContent>
         </Card>
 
@@ -137,8 +137,16 @@ export const useConnectionsStore = create((set, get) => ({
   },
 
   requestPairingCode: async (connectionId, phoneNumber) => {
-    const response = await api.post(`/connections/${connectionId}/pairing-code`, { phone_number: phoneNumber });
-    return response.data;
+    // O backend responde com um job; o código chega quando o job termina
+    let { data: job } = await api.post(`/connections/${connectionId}/pairing-code`, { phone_number: phoneNumber });
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ data: job } = await api.get(`/connection-jobs/${job.id}`));
+    }
+    if (job.status !== 'done') {
+      throw new Error(job.error || 'Erro ao gerar código');
+    }
+    return job.result;
   },
 
   refreshGroups: async (connectionId) => {
@@ -187,6 +195,22 @@ export const useGroupsStore = create((set, get) => ({
     const response = await api.get(`/connections/${connectionId}/groups`);
     return response.data;
   },
+
+  // Página de grupos (busca sem acento/maiúsculas por início de palavra)
+  fetchGroupsPage: async ({ connectionId, search = '', page = 1, limit = 50 }) => {
+    const response = await api.get('/groups/paginated', {
+      params: { connection_id: connectionId, search: search || undefined, page, limit },
+    });
+    return response.data;
+  },
+
+  // Ids de todos os grupos que casam com o filtro ("selecionar todos")
+  fetchGroupIds: async ({ connectionId, search = '' }) => {
+    const response = await api.get('/groups/paginated', {
+      params: { connection_id: connectionId, search: search || undefined, ids_only: true },
+    });
+    return response.data.ids;
+  },
 }));
 
 // Campaigns Store
@@ -198,7 +222,7 @@ export const useCampaignsStore = create((set, get) => ({
   fetchCampaigns: async () => {
     set({ loading: true, error: null });
     try {
-      const response = await api.get('/campaigns');
+      const response = await api.get('/campaigns?view=summary');
       set({ campaigns: response.data, loading: false });
     } catch (error) {
       set({ error: error.response?.data?.detail || 'Erro ao carregar campanhas', loading: false });
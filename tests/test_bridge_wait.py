@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+
+import server  # noqa: E402
+
+
+class FakeGroups:
+    async def find_one(self, query, *args, **kwargs):
+        return {'id': query['id'], 'group_id': f"{query['id']}@g.us", 'name': 'Grupo'}
+
+
+class FakeDb:
+    groups = FakeGroups()
+
+
+def unreachable_bridge(timeout):
+    def handler(request):
+        raise httpx.ConnectError('connection refused', request=request)
+    return httpx.AsyncClient(timeout=timeout, transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def failing_bridge(monkeypatch):
+    monkeypatch.setattr(server, 'db', FakeDb())
+    monkeypatch.setattr(server, 'whatsapp_http_client', unreachable_bridge)
+    monkeypatch.setattr(server, 'BRIDGE_BREAKER_OPEN_SECONDS', 0.05)
+    monkeypatch.setattr(server, 'BRIDGE_HEALTH_TTL', 0)
+    monkeypatch.setattr(server, 'BRIDGE_CAMPAIGN_MAX_WAIT', 1.0)
+    monkeypatch.setitem(server.bridge_health_cache, 'checked_at', None)
+    # Circuito já aberto: o envio começa esperando o bridge
+    monkeypatch.setattr(server, 'bridge_breaker', {
+        'state': 'open', 'failures': 5, 'opened_at': time.monotonic(),
+        'probe_in_flight': False, 'last_error': None, 'open_count': 1
+    })
+
+    state_updates = []
+
+    async def update_campaign_state(campaign, fields):
+        state_updates.append(fields)
+
+    async def record_send_log(*args, **kwargs):
+        raise AssertionError('nenhum grupo deve ser registrado com o bridge fora do ar')
+
+    monkeypatch.setattr(server, 'update_campaign_state', update_campaign_state)
+    monkeypatch.setattr(server, 'record_send_log', record_send_log)
+    return state_updates
+
+
+def test_sequential_send_stops_after_max_wait(failing_bridge):
+    campaign = {'id': 'c1', 'connection_id': 'conn1', 'group_ids': ['g1', 'g2'], 'delay_seconds': 0}
+
+    async def run():
+        return await asyncio.wait_for(
+            server.send_campaign_sequentially(campaign, 0, 0, 'oi', None), timeout=5
+        )
+
+    started = time.monotonic()
+    with pytest.raises(server.BridgeUnavailableError):
+        asyncio.run(run())
+
+    # Várias janelas abertas + testes falhos não reiniciam o prazo de 1s
+    assert time.monotonic() - started < 3
+    assert server.bridge_breaker['open_count'] > 1
+    assert not any('current_group_index' in fields for fields in failing_bridge)
+
+
+def test_batch_send_stops_after_max_wait(failing_bridge):
+    campaign = {'id': 'c1', 'connection_id': 'conn1', 'group_ids': ['g1', 'g2'], 'delay_seconds': 0}
+
+    class BatchGroups:
+        def find(self, query, *args, **kwargs):
+            groups = [{'id': group_id, 'group_id': f'{group_id}@g.us', 'name': 'Grupo'} for group_id in query['id']['$in']]
+
+            class Cursor:
+                async def to_list(self, length):
+                    return groups
+            return Cursor()
+
+    server.db.groups = BatchGroups()
+
+    async def run():
+        return await asyncio.wait_for(
+            server.send_campaign_in_batches(campaign, 0, 0, 'oi', None), timeout=5
+        )
+
+    with pytest.raises(server.BridgeUnavailableError):
+        asyncio.run(run())
+    assert failing_bridge == []
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+
+import server  # noqa: E402
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def update_many(self, query, update):
+        self.calls.append((query, update))
+
+
+class FakeDb:
+    def __init__(self):
+        self.commands = []
+        self.activity_logs = Recorder()
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDb()
+    monkeypatch.setattr(server, 'db', db)
+    monkeypatch.setitem(server.send_logs_storage, 'timeseries', True)
+    monkeypatch.setattr(server, 'SEND_LOGS_RETENTION_DAYS', 90)
+    return db
+
+
+def use_watermarks(monkeypatch, watermarks):
+    async def get_rollup_watermark(name):
+        return watermarks.get(name)
+    monkeypatch.setattr(server, 'get_rollup_watermark', get_rollup_watermark)
+
+
+def test_timeseries_expiry_enabled_when_rollup_is_current(fake_db, monkeypatch):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    use_watermarks(monkeypatch, {'send_logs': today, 'activity_logs': today})
+
+    asyncio.run(server.apply_log_expiry())
+
+    assert fake_db.commands == [(('collMod', 'send_logs'), {'expireAfterSeconds': 90 * 86400})]
+
+
+def test_timeseries_expiry_suspended_when_rollup_is_behind(fake_db, monkeypatch):
+    # Consolidação falhando há mais tempo que a retenção: nada pode expirar sem agregado
+    stale = datetime.now(timezone.utc) - timedelta(days=120)
+    use_watermarks(monkeypatch, {'send_logs': stale})
+
+    asyncio.run(server.apply_log_expiry())
+
+    assert fake_db.commands == [(('collMod', 'send_logs'), {'expireAfterSeconds': 'off'})]
+
+
+def test_activity_logs_without_rollup_never_get_ttl_field(fake_db, monkeypatch):
+    use_watermarks(monkeypatch, {})
+
+    asyncio.run(server.apply_log_expiry())
+
+    # Sem marca: só remove logged_at gravado na inserção, nunca define
+    assert fake_db.activity_logs.calls == [({'logged_at': {'$exists': True}}, {'$unset': {'logged_at': ''}})]
+
+
+def test_new_activity_log_has_no_ttl_field(monkeypatch):
+    queued = []
+    monkeypatch.setattr(server.activity_log_queue, 'put_nowait', queued.append)
+
+    asyncio.run(server.log_activity('u1', 'user', 'create', 'campaign', 'c1', 'Campanha'))
+
+    assert 'logged_at' not in queued[0]
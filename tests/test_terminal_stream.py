@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+
+import server  # noqa: E402
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(':'):
+            continue
+        lines = chunk.strip().split('\n')
+        event = lines[0].split(': ', 1)[1]
+        data = json.loads(lines[1].split(': ', 1)[1])
+        events.append((event, data))
+    return events
+
+
+async def collect(cmd, timeout, slow_client=False):
+    chunks = []
+
+    async def run():
+        async for chunk in server.stream_terminal_output(cmd):
+            chunks.append(chunk)
+            if slow_client:
+                # Cliente lento: fila e pipes ficam cheios quando o limite é atingido
+                await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(run(), timeout=timeout)
+    return parse_events(chunks)
+
+
+def test_output_limit_kills_process_and_emits_exit(monkeypatch):
+    monkeypatch.setattr(server, 'TERMINAL_STREAM_MAX_OUTPUT', 256 * 1024)
+
+    events = asyncio.run(collect('yes', timeout=15, slow_client=True))
+
+    assert events[0][0] == 'start'
+    name, data = events[-1]
+    assert name == 'exit'
+    assert data['success'] is False
+    assert data['output_bytes'] == 256 * 1024
+    assert 'limite' in data['error']
+    streamed = sum(len(d['data'].encode('utf-8')) for n, d in events if n == 'stdout')
+    assert streamed == 256 * 1024
+
+
+def test_timeout_kills_process_and_emits_exit(monkeypatch):
+    monkeypatch.setattr(server, 'TERMINAL_STREAM_TIMEOUT', 1)
+    monkeypatch.setattr(server, 'TERMINAL_STREAM_MAX_OUTPUT', 1024 * 1024 * 1024)
+
+    events = asyncio.run(collect('sleep 30', timeout=15))
+
+    name, data = events[-1]
+    assert name == 'exit'
+    assert data['success'] is False
+    assert 'tempo limite' in data['error']
+
+
+def test_completed_command_reports_exit_code():
+    events = asyncio.run(collect('echo ok; exit 3', timeout=15))
+
+    assert ('stdout', {'data': 'ok\n'}) in events
+    name, data = events[-1]
+    assert name == 'exit'
+    assert data['exit_code'] == 3
+    assert data['error'] is None
@@ -26,11 +26,40 @@ app.use(cors());
 app.use(express.json({ limit: '50mb' }));
 
 const logger = pino({ level: 'warn' });
+// Logs de diagnóstico só com LOG_LEVEL=debug (evita custo de I/O sob carga)
+const DEBUG_LOGS = (process.env.LOG_LEVEL || 'info').toLowerCase() === 'debug';
+function debugLog(...args) {
+    if (DEBUG_LOGS) {
+        console.log(...args);
+    }
+}
 const PORT = process.env.WHATSAPP_PORT || 3002;
+// Socket unix opcional para o backend no mesmo host (WHATSAPP_SOCKET ou WHATSAPP_SERVICE_URL=unix:///caminho)
+const SERVICE_URL = process.env.WHATSAPP_SERVICE_URL || '';
+const SOCKET_PATH = process.env.WHATSAPP_SOCKET || (SERVICE_URL.startsWith('unix://') ? SERVICE_URL.slice('unix://'.length) : null);
 const AUTH_DIR = path.join(__dirname, 'auth_sessions');
 const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
 const DB_NAME = process.env.DB_NAME || 'nexuzap';
 
+// Identifica esta execução do serviço: o backend detecta restarts pela troca do bootId em /health
+const BOOT_ID = crypto.randomUUID();
+const BOOTED_AT = new Date().toISOString();
+// Reconexão sequencial das sessões na subida; pode ser desligada quando o backend conduz a restauração
+const AUTO_RECONNECT_ON_START = (process.env.AUTO_RECONNECT_ON_START || 'true').toLowerCase() !== 'false';
+
+// Webhook de status para o backend (push de status/QR/telefone em vez de polling).
+// Ativo só com BRIDGE_WEBHOOK_SECRET (o mesmo configurado no backend)
+const BRIDGE_WEBHOOK_SECRET = process.env.BRIDGE_WEBHOOK_SECRET || '';
+const BACKEND_EVENTS_URL = process.env.BACKEND_EVENTS_URL || 'http://localhost:8001/api/internal/bridge-events';
+const BACKEND_EVENTS_FLUSH_MS = 300;
+const BACKEND_EVENTS_MAX_RETRY_MS = 30000;
+const pendingBackendEvents = new Map(); // connectionId -> campos mesclados
+let backendEventsTimer = null;
+let backendEventsFlushing = false;
+let backendEventsRetryMs = 0;
+// Última entrega aceita pelo backend (o backend só desliga o polling da UI depois de ver isso no /health)
+let backendEventsDeliveredAt = null;
+
 // Cache da versão do Baileys para evitar requisições desnecessárias
 let cachedBaileysVersion = null;
 let baileysVersionCacheTime = 0;
@@ -42,7 +71,7 @@ async function getBaileysVersion() {
     
     // Se tem cache válido, usa
     if (cachedBaileysVersion && (now - baileysVersionCacheTime) < BAILEYS_VERSION_CACHE_TTL) {
-        console.log(`[DEBUG] Usando versão cacheada do Baileys: ${cachedBaileysVersion.join('.')}`);
+        debugLog(`Usando versão cacheada do Baileys: ${cachedBaileysVersion.join('.')}`);
         return { version: cachedBaileysVersion };
     }
     
@@ -57,10 +86,10 @@ async function getBaileysVersion() {
         
         cachedBaileysVersion = result.version;
         baileysVersionCacheTime = now;
-        console.log(`[DEBUG] Versão do Baileys atualizada: ${result.version.join('.')}`);
+        debugLog(`Versão do Baileys atualizada: ${result.version.join('.')}`);
         return result;
     } catch (error) {
-        console.warn(`[DEBUG] Falha ao buscar versão do Baileys: ${error.message}. Usando versão padrão.`);
+        console.warn(`Falha ao buscar versão do Baileys: ${error.message}. Usando versão padrão.`);
         // Fallback para versão conhecida que funciona
         const fallbackVersion = [2, 3000, 1015901307];
         return { version: cachedBaileysVersion || fallbackVersion };
@@ -472,30 +501,30 @@ async function serviceWatchdog() {
 // setInterval(serviceWatchdog, 60000);
 
 async function createConnection(connectionId) {
-    console.log(`[DEBUG] createConnection(${connectionId}) iniciado`);
+    debugLog(`createConnection(${connectionId}) iniciado`);
     
     // Clean up existing connection if any
     const existingConn = connections.get(connectionId);
     if (existingConn?.socket) {
-        console.log(`[DEBUG] Limpando conexão existente para ${connectionId}`);
+        debugLog(`Limpando conexão existente para ${connectionId}`);
         try {
             existingConn.socket.end();
         } catch (e) {
-            console.log(`[DEBUG] Erro ao limpar conexão: ${e.message}`);
+            debugLog(`Erro ao limpar conexão: ${e.message}`);
         }
     }
 
     try {
-        console.log(`[DEBUG] Obtendo estado de autenticação do MongoDB...`);
+        debugLog(`Obtendo estado de autenticação do MongoDB...`);
         // Use MongoDB auth state
         const { state, saveCreds } = await useMongoAuthState(connectionId);
-        console.log(`[DEBUG] Estado obtido. Creds existente: ${state.creds ? 'sim' : 'não'}`);
+        debugLog(`Estado obtido. Creds existente: ${state.creds ? 'sim' : 'não'}`);
         
-        console.log(`[DEBUG] Obtendo versão do Baileys (com cache)...`);
+        debugLog(`Obtendo versão do Baileys (com cache)...`);
         const { version } = await getBaileysVersion();
-        console.log(`[DEBUG] Versão do Baileys: ${version.join('.')}`);
+        debugLog(`Versão do Baileys: ${version.join('.')}`);
         
-        console.log(`[DEBUG] Criando socket WhatsApp...`);
+        debugLog(`Criando socket WhatsApp...`);
         const sock = makeWASocket({
             version,
             auth: {
@@ -517,7 +546,7 @@ async function createConnection(connectionId) {
             msgRetryCounterMap: {},
             maxMsgRetryCount: 5,
         });
-        console.log(`[DEBUG] Socket criado com sucesso`);
+        debugLog(`Socket criado com sucesso`);
 
         const connectionData = {
             socket: sock,
@@ -537,22 +566,22 @@ async function createConnection(connectionId) {
         };
 
         connections.set(connectionId, connectionData);
-        console.log(`[DEBUG] Conexão ${connectionId} adicionada ao Map. Total de conexões: ${connections.size}`);
+        debugLog(`Conexão ${connectionId} adicionada ao Map. Total de conexões: ${connections.size}`);
 
         sock.ev.on('connection.update', async (update) => {
             try {
                 const { connection, lastDisconnect, qr } = update;
                 const conn = connections.get(connectionId);
                 
-                console.log(`[DEBUG] connection.update para ${connectionId}:`, { connection, hasQR: !!qr });
+                debugLog(`connection.update para ${connectionId}:`, { connection, hasQR: !!qr });
                 
                 if (!conn) {
-                    console.log(`[DEBUG] Conexão ${connectionId} não encontrada no update handler!`);
+                    debugLog(`Conexão ${connectionId} não encontrada no update handler!`);
                     return;
                 }
 
                 if (qr) {
-                    console.log(`[DEBUG] QR Code recebido para ${connectionId}. Gerando imagem...`);
+                    debugLog(`QR Code recebido para ${connectionId}. Gerando imagem...`);
                     conn.qrCode = qr;
                     conn.status = 'waiting_qr';
                     conn.retryCount = 0;
@@ -562,9 +591,10 @@ async function createConnection(connectionId) {
                             margin: 2,
                             color: { dark: '#000000', light: '#FFFFFF' }
                         });
-                        console.log(`[DEBUG] [${connectionId}] QR Code gerado com sucesso. Tamanho: ${conn.qrImage?.length || 0} chars`);
+                        debugLog(`[${connectionId}] QR Code gerado com sucesso. Tamanho: ${conn.qrImage?.length || 0} chars`);
+                        notifyBackend(connectionId, { status: 'waiting_qr', qr_image: conn.qrImage });
                     } catch (err) {
-                        console.error(`[DEBUG] Erro ao gerar QR Code:`, err.message);
+                        console.error(`Erro ao gerar QR Code:`, err.message);
                     }
                 }
 
@@ -574,12 +604,13 @@ async function createConnection(connectionId) {
                     const shouldReconnect = statusCode !== DisconnectReason.loggedOut;
                     
                     conn.lastError = errorMsg;
-                    console.log(`[DEBUG] [${connectionId}] Conexão fechada. Código: ${statusCode}. Erro: ${errorMsg}. Reconectar: ${shouldReconnect}`);
+                    debugLog(`[${connectionId}] Conexão fechada. Código: ${statusCode}. Erro: ${errorMsg}. Reconectar: ${shouldReconnect}`);
                     
                     // Sempre tenta reconectar exceto se foi logout explícito
                     if (shouldReconnect && conn.status !== 'deleted') {
                         conn.retryCount++;
                         conn.status = 'reconnecting';
+                        notifyBackend(connectionId, { status: 'reconnecting', last_error: errorMsg });
                         
                         // Backoff exponencial com limite
                         const delay = Math.min(3000 * Math.pow(1.5, conn.retryCount - 1), 60000);
@@ -602,6 +633,7 @@ async function createConnection(connectionId) {
                         conn.status = 'disconnected';
                         conn.qrCode = null;
                         conn.qrImage = null;
+                        notifyBackend(connectionId, { status: 'disconnected', qr_image: null, last_error: errorMsg });
                     }
                 } else if (connection === 'open') {
                     conn.status = 'connected';
@@ -612,6 +644,7 @@ async function createConnection(connectionId) {
                     conn.lastError = null;
                     conn.phoneNumber = sock.user?.id?.split(':')[0] || sock.user?.id?.split('@')[0];
                     console.log(`✅ [${connectionId}] WhatsApp conectado: ${conn.phoneNumber}`);
+                    notifyBackend(connectionId, { status: 'connected', phone_number: conn.phoneNumber, qr_image: null, last_error: null });
                     
                     // Fetch groups after connection - GARANTIR que seja executado
                     setTimeout(async () => {
@@ -644,11 +677,60 @@ async function createConnection(connectionId) {
         if (conn) {
             conn.status = 'error';
             conn.lastError = error.message;
+            notifyBackend(connectionId, { status: 'error', last_error: error.message });
         }
         throw error;
     }
 }
 
+// Enfileira mudança de estado da conexão para o backend (o mais recente vence, envio em lote)
+function notifyBackend(connectionId, fields) {
+    if (!BRIDGE_WEBHOOK_SECRET) return;
+    const pending = pendingBackendEvents.get(connectionId) || { connection_id: connectionId };
+    pendingBackendEvents.set(connectionId, { ...pending, ...fields, at: new Date().toISOString() });
+    scheduleBackendEventsFlush(BACKEND_EVENTS_FLUSH_MS);
+}
+
+function scheduleBackendEventsFlush(delay) {
+    if (backendEventsTimer || backendEventsFlushing) return;
+    backendEventsTimer = setTimeout(flushBackendEvents, delay);
+}
+
+async function flushBackendEvents() {
+    backendEventsTimer = null;
+    if (pendingBackendEvents.size === 0) return;
+    
+    backendEventsFlushing = true;
+    const events = Array.from(pendingBackendEvents.values());
+    pendingBackendEvents.clear();
+    try {
+        const response = await fetch(BACKEND_EVENTS_URL, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-Bridge-Secret': BRIDGE_WEBHOOK_SECRET },
+            body: JSON.stringify({ events }),
+            signal: AbortSignal.timeout(10000)
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        backendEventsRetryMs = 0;
+        backendEventsDeliveredAt = new Date().toISOString();
+    } catch (error) {
+        // Devolve à fila sem sobrescrever mudanças mais novas; tenta de novo com backoff
+        for (const event of events) {
+            const newer = pendingBackendEvents.get(event.connection_id);
+            pendingBackendEvents.set(event.connection_id, newer ? { ...event, ...newer } : event);
+        }
+        backendEventsRetryMs = Math.min((backendEventsRetryMs || 500) * 2, BACKEND_EVENTS_MAX_RETRY_MS);
+        console.error(`Webhook de status falhou (${error.message}). Nova tentativa em ${backendEventsRetryMs / 1000}s`);
+    } finally {
+        backendEventsFlushing = false;
+        if (pendingBackendEvents.size > 0) {
+            scheduleBackendEventsFlush(backendEventsRetryMs || BACKEND_EVENTS_FLUSH_MS);
+        }
+    }
+}
+
 async function fetchGroups(connectionId) {
     const conn = connections.get(connectionId);
     if (!conn || conn.status !== 'connected') {
@@ -855,16 +937,16 @@ app.get('/connections/:id/status', async (req, res) => {
 app.post('/connections/:id/start', async (req, res) => {
     try {
         const connectionId = req.params.id;
-        console.log(`[DEBUG] POST /connections/${connectionId}/start chamado`);
+        debugLog(`POST /connections/${connectionId}/start chamado`);
         
         if (connections.has(connectionId)) {
             const existing = connections.get(connectionId);
-            console.log(`[DEBUG] Conexão existente encontrada. Status: ${existing.status}`);
+            debugLog(`Conexão existente encontrada. Status: ${existing.status}`);
             
             if (existing.status === 'connected') {
-                console.log(`[DEBUG] Verificando se conexão está viva...`);
+                debugLog(`Verificando se conexão está viva...`);
                 const alive = await isConnectionAlive(connectionId);
-                console.log(`[DEBUG] Conexão viva: ${alive}`);
+                debugLog(`Conexão viva: ${alive}`);
                 if (alive) {
                     return res.json({ status: 'already_connected', phoneNumber: existing.phoneNumber });
                 } else {
@@ -872,20 +954,20 @@ app.post('/connections/:id/start', async (req, res) => {
                 }
             }
             if (existing.status === 'connecting' || existing.status === 'waiting_qr') {
-                console.log(`[DEBUG] Conexão já em andamento, retornando status atual`);
+                debugLog(`Conexão já em andamento, retornando status atual`);
                 return res.json({ status: existing.status, message: 'Conexão em andamento' });
             }
             try {
-                console.log(`[DEBUG] Fechando socket existente`);
+                debugLog(`Fechando socket existente`);
                 existing.socket?.end();
             } catch (e) {
-                console.log(`[DEBUG] Erro ao fechar socket: ${e.message}`);
+                debugLog(`Erro ao fechar socket: ${e.message}`);
             }
         } else {
-            console.log(`[DEBUG] Nenhuma conexão existente para ${connectionId}`);
+            debugLog(`Nenhuma conexão existente para ${connectionId}`);
         }
         
-        console.log(`[DEBUG] Iniciando criação de conexão para ${connectionId} em background...`);
+        debugLog(`Iniciando criação de conexão para ${connectionId} em background...`);
         
         // NÃO esperar a conexão completar - retorna imediatamente e cria em background
         // Isso evita timeout do backend
@@ -893,7 +975,7 @@ app.post('/connections/:id/start', async (req, res) => {
         
         // Criar conexão em background (sem await)
         createConnection(connectionId).catch(error => {
-            console.error(`[DEBUG] Erro ao criar conexão em background:`, error.message);
+            console.error(`Erro ao criar conexão em background:`, error.message);
             const conn = connections.get(connectionId);
             if (conn) {
                 conn.status = 'error';
@@ -902,7 +984,7 @@ app.post('/connections/:id/start', async (req, res) => {
         });
         
     } catch (error) {
-        console.error(`[DEBUG] Erro ao iniciar conexão:`, error);
+        console.error(`Erro ao iniciar conexão:`, error);
         res.status(500).json({ error: error.message });
     }
 });
@@ -912,7 +994,7 @@ app.post('/connections/:id/pairing-code', async (req, res) => {
     try {
         const connectionId = req.params.id;
         let { phoneNumber } = req.body;
-        console.log(`[DEBUG] POST /connections/${connectionId}/pairing-code chamado. Phone: ${phoneNumber}`);
+        debugLog(`POST /connections/${connectionId}/pairing-code chamado. Phone: ${phoneNumber}`);
         
         if (!phoneNumber) {
             return res.status(400).json({ error: 'Número de telefone é obrigatório' });
@@ -1046,18 +1128,18 @@ app.post('/connections/:id/pairing-code', async (req, res) => {
 
 app.get('/connections/:id/qr', (req, res) => {
     const connectionId = req.params.id;
-    console.log(`[DEBUG] GET /connections/${connectionId}/qr chamado`);
+    debugLog(`GET /connections/${connectionId}/qr chamado`);
     
     const conn = connections.get(connectionId);
     if (!conn) {
-        console.log(`[DEBUG] Conexão ${connectionId} não encontrada no Map de conexões`);
-        console.log(`[DEBUG] Conexões ativas: ${Array.from(connections.keys()).join(', ') || 'nenhuma'}`);
+        debugLog(`Conexão ${connectionId} não encontrada no Map de conexões`);
+        debugLog(`Conexões ativas: ${Array.from(connections.keys()).join(', ') || 'nenhuma'}`);
         return res.json({ qr: null, qrImage: null, status: 'not_found' });
     }
     
-    console.log(`[DEBUG] Conexão encontrada. Status: ${conn.status}, temQR: ${conn.qrImage ? 'sim' : 'não'}, temQRCode: ${conn.qrCode ? 'sim' : 'não'}`);
+    debugLog(`Conexão encontrada. Status: ${conn.status}, temQR: ${conn.qrImage ? 'sim' : 'não'}, temQRCode: ${conn.qrCode ? 'sim' : 'não'}`);
     if (conn.lastError) {
-        console.log(`[DEBUG] Último erro: ${conn.lastError}`);
+        debugLog(`Último erro: ${conn.lastError}`);
     }
     res.json({ 
         qr: conn.qrCode,
@@ -1132,6 +1214,55 @@ app.post('/connections/:id/send', async (req, res) => {
     }
 });
 
+// Envio em lote: o backend manda um bloco ordenado de grupos com a mesma mensagem/mídia
+// e o serviço faz o espaçamento (delaySeconds) internamente. Resultados na ordem de groupIds.
+const MAX_BATCH_GROUPS = 200;
+
+app.post('/connections/:id/send-batch', async (req, res) => {
+    const { groupIds, message, imageBase64, caption, delaySeconds = 0 } = req.body;
+    
+    if (!Array.isArray(groupIds) || groupIds.length === 0) {
+        return res.status(400).json({ success: false, error: 'groupIds é obrigatório' });
+    }
+    if (groupIds.length > MAX_BATCH_GROUPS) {
+        return res.status(400).json({ success: false, error: `Máximo de ${MAX_BATCH_GROUPS} grupos por lote` });
+    }
+    
+    // Mídia decodificada uma única vez para o lote inteiro
+    let imageBuffer = null;
+    if (imageBase64) {
+        const base64Data = imageBase64.replace(/^data:image\/\w+;base64,/, '');
+        imageBuffer = Buffer.from(base64Data, 'base64');
+    }
+    
+    const delayMs = Math.max(0, Number(delaySeconds) || 0) * 1000;
+    const results = [];
+    
+    for (let i = 0; i < groupIds.length; i++) {
+        const groupId = groupIds[i];
+        const startedAt = Date.now();
+        try {
+            const result = await sendMessageToGroup(req.params.id, groupId, message, imageBuffer, caption);
+            results.push({ groupId, success: true, messageId: result.messageId, durationMs: Date.now() - startedAt });
+            
+            // Espaçamento só depois de envios com sucesso (mesmo comportamento do envio unitário)
+            if (i < groupIds.length - 1 && delayMs > 0) {
+                await new Promise(resolve => setTimeout(resolve, delayMs));
+            }
+        } catch (error) {
+            console.error(`Erro no lote para ${groupId}:`, error.message);
+            results.push({ groupId, success: false, error: error.message || 'Erro desconhecido no envio', durationMs: Date.now() - startedAt });
+        }
+    }
+    
+    res.json({
+        success: true,
+        sent: results.filter(r => r.success).length,
+        failed: results.filter(r => !r.success).length,
+        results
+    });
+});
+
 app.post('/connections/:id/disconnect', async (req, res) => {
     const connectionId = req.params.id;
     const conn = connections.get(connectionId);
@@ -1172,13 +1303,20 @@ app.get('/health', (req, res) => {
     lastHealthCheck = Date.now();
     res.json({ 
         status: 'ok', 
+        bootId: BOOT_ID,
+        bootedAt: BOOTED_AT,
         connections: connections.size,
         uptime: process.uptime(),
         totalMessagesProcessed,
         totalErrors,
         memoryUsage: process.memoryUsage(),
         mongoConnected: !!db,
-        lastHealthCheck: new Date(lastHealthCheck).toISOString()
+        lastHealthCheck: new Date(lastHealthCheck).toISOString(),
+        webhook: {
+            enabled: !!BRIDGE_WEBHOOK_SECRET,
+            deliveredAt: backendEventsDeliveredAt,
+            failing: backendEventsRetryMs > 0
+        }
     });
 });
 
@@ -1231,6 +1369,35 @@ app.get('/connections', (req, res) => {
     res.json(list);
 });
 
+// Restauração idempotente de uma sessão salva (fila de restauração do backend após restart)
+app.post('/connections/:id/restore', async (req, res) => {
+    const connectionId = req.params.id;
+    
+    // Já ativa ou em andamento: nada a fazer
+    if (connectionIsActive(connectionId) || restoringConnections.has(connectionId)) {
+        return res.json({ success: true, skipped: true, status: connections.get(connectionId)?.status || 'connecting' });
+    }
+    
+    try {
+        // Sem MongoDB não dá para distinguir "sem sessão" de indisponível
+        if (!await connectMongo()) {
+            return res.status(503).json({ success: false, error: 'MongoDB indisponível' });
+        }
+        // Confere de novo depois dos awaits (a auto-reconexão da subida pode ter começado)
+        const result = await restoreConnectionOnce(connectionId, () => sessionExistsInMongo(connectionId));
+        if (result === 'no_session') {
+            return res.json({ success: false, status: 'no_session', error: 'Sessão não encontrada' });
+        }
+        res.json({
+            success: true,
+            ...(result === 'skipped' ? { skipped: true } : {}),
+            status: connections.get(connectionId)?.status || 'connecting'
+        });
+    } catch (error) {
+        res.status(500).json({ success: false, error: error.message });
+    }
+});
+
 app.post('/connections/:id/reconnect', async (req, res) => {
     const connectionId = req.params.id;
     const conn = connections.get(connectionId);
@@ -1254,6 +1421,37 @@ app.post('/connections/:id/reconnect', async (req, res) => {
 });
 
 // Auto-reconnect existing sessions on startup
+// Restaurações em andamento: o /restore do backend e a auto-reconexão da subida podem pedir
+// a mesma sessão ao mesmo tempo (createConnection só registra o socket depois de vários awaits)
+const restoringConnections = new Set();
+
+function connectionIsActive(connectionId) {
+    const existing = connections.get(connectionId);
+    return !!existing && !['disconnected', 'error'].includes(existing.status);
+}
+
+// Cria a conexão a partir da sessão salva, uma única vez por connectionId.
+// Retorna 'skipped' (já ativa ou sendo restaurada), 'no_session' ou 'restored'
+async function restoreConnectionOnce(connectionId, hasSession) {
+    if (connectionIsActive(connectionId) || restoringConnections.has(connectionId)) {
+        return 'skipped';
+    }
+    restoringConnections.add(connectionId);
+    try {
+        if (!await hasSession()) {
+            return 'no_session';
+        }
+        // Conexão criada por outro caminho (connect/pairing) enquanto a sessão era consultada
+        if (connectionIsActive(connectionId)) {
+            return 'skipped';
+        }
+        await createConnection(connectionId);
+        return 'restored';
+    } finally {
+        restoringConnections.delete(connectionId);
+    }
+}
+
 async function autoReconnectSessions() {
     console.log('🔄 [AUTO-CONNECT] Verificando sessões existentes para reconexão automática...');
     
@@ -1276,30 +1474,20 @@ async function autoReconnectSessions() {
         for (const conn of backendConnections) {
             const connectionId = conn.id;
             
-            // Verificar se já está conectado
-            if (connections.has(connectionId)) {
-                const existing = connections.get(connectionId);
-                if (existing.status === 'connected') {
-                    console.log(`🔄 [AUTO-CONNECT] ${connectionId} já está conectado, pulando...`);
-                    continue;
-                }
-            }
-            
-            // Verificar se há credenciais salvas no MongoDB
-            const hasSession = await database.collection('whatsapp_sessions')
-                .findOne({ connectionId, key: 'creds' });
-            
-            if (hasSession) {
-                console.log(`🔄 [AUTO-CONNECT] Reconectando ${connectionId} (${conn.name || 'sem nome'})...`);
-                try {
-                    await createConnection(connectionId);
+            try {
+                const result = await restoreConnectionOnce(connectionId, async () => !!await database.collection('whatsapp_sessions')
+                    .findOne({ connectionId, key: 'creds' }));
+                if (result === 'skipped') {
+                    console.log(`🔄 [AUTO-CONNECT] ${connectionId} já está ativa ou sendo restaurada pelo backend, pulando...`);
+                } else if (result === 'no_session') {
+                    console.log(`🔄 [AUTO-CONNECT] ${connectionId} não tem sessão salva, ignorando.`);
+                } else {
+                    console.log(`🔄 [AUTO-CONNECT] Reconectado ${connectionId} (${conn.name || 'sem nome'})`);
                     // Aguardar um pouco entre reconexões para não sobrecarregar
                     await new Promise(resolve => setTimeout(resolve, 3000));
-                } catch (error) {
-                    console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar ${connectionId}:`, error.message);
                 }
-            } else {
-                console.log(`🔄 [AUTO-CONNECT] ${connectionId} não tem sessão salva, ignorando.`);
+            } catch (error) {
+                console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar ${connectionId}:`, error.message);
             }
         }
         
@@ -1308,18 +1496,17 @@ async function autoReconnectSessions() {
             .distinct('connectionId', { key: 'creds' });
         
         for (const sessionId of orphanSessions) {
-            if (!connections.has(sessionId)) {
-                // Verificar se existe no backend
-                const backendConn = await database.collection('connections').findOne({ id: sessionId });
-                if (backendConn) {
-                    console.log(`🔄 [AUTO-CONNECT] Reconectando sessão órfã: ${sessionId}`);
-                    try {
-                        await createConnection(sessionId);
-                        await new Promise(resolve => setTimeout(resolve, 2000));
-                    } catch (error) {
-                        console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar sessão órfã ${sessionId}:`, error.message);
-                    }
+            if (connections.has(sessionId)) continue;
+            try {
+                // Só sessões de conexões que existem no backend
+                const result = await restoreConnectionOnce(sessionId, async () => !!await database.collection('connections')
+                    .findOne({ id: sessionId }));
+                if (result === 'restored') {
+                    console.log(`🔄 [AUTO-CONNECT] Sessão órfã reconectada: ${sessionId}`);
+                    await new Promise(resolve => setTimeout(resolve, 2000));
                 }
+            } catch (error) {
+                console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar sessão órfã ${sessionId}:`, error.message);
             }
         }
         
@@ -1339,17 +1526,15 @@ async function autoReconnectSessions() {
                 // Skip if already connected
                 if (connections.has(sessionId)) continue;
                 
-                const sessionPath = path.join(AUTH_DIR, sessionId);
-                const credsFile = path.join(sessionPath, 'creds.json');
-                
-                if (fs.existsSync(credsFile)) {
-                    console.log(`🔄 [AUTO-CONNECT] Reconectando sessão do filesystem: ${sessionId}`);
-                    try {
-                        await createConnection(sessionId);
+                const credsFile = path.join(AUTH_DIR, sessionId, 'creds.json');
+                try {
+                    const result = await restoreConnectionOnce(sessionId, async () => fs.existsSync(credsFile));
+                    if (result === 'restored') {
+                        console.log(`🔄 [AUTO-CONNECT] Sessão do filesystem reconectada: ${sessionId}`);
                         await new Promise(resolve => setTimeout(resolve, 2000));
-                    } catch (error) {
-                        console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar ${sessionId}:`, error.message);
                     }
+                } catch (error) {
+                    console.error(`🔄 [AUTO-CONNECT] Erro ao reconectar ${sessionId}:`, error.message);
                 }
             }
         }
@@ -1484,6 +1669,28 @@ function isPortAvailable(port) {
     });
 }
 
+// Escuta também no socket unix (além da porta TCP, que continua para health checks externos)
+function startSocketServer(socketPath) {
+    // Remove socket órfão de uma execução anterior
+    try {
+        if (fs.existsSync(socketPath) && fs.statSync(socketPath).isSocket()) {
+            fs.unlinkSync(socketPath);
+        }
+    } catch (error) {
+        console.error(`🔌 Erro ao limpar socket ${socketPath}: ${error.message}`);
+    }
+    
+    const server = app.listen(socketPath, () => {
+        console.log(`🔌 Socket unix ativo em ${socketPath}`);
+    });
+    server.on('error', (error) => {
+        console.error(`🔌 Erro no socket unix ${socketPath}: ${error.message}`);
+    });
+    process.once('exit', () => {
+        try { fs.unlinkSync(socketPath); } catch (error) { /* já removido */ }
+    });
+}
+
 // Função principal de inicialização com auto-recovery
 async function startServer(port, maxRetries = 5) {
     let currentPort = port;
@@ -1502,11 +1709,17 @@ async function startServer(port, maxRetries = 5) {
                     console.log(`🔄 Auto-reconexão habilitada`);
                     console.log(`🔧 Auto-recovery ativado`);
                     
+                    if (SOCKET_PATH) {
+                        startSocketServer(SOCKET_PATH);
+                    }
+                    
                     // Connect to MongoDB
                     await connectMongo();
                     
                     // Auto-reconnect sessions
-                    setTimeout(autoReconnectSessions, 3000);
+                    if (AUTO_RECONNECT_ON_START) {
+                        setTimeout(autoReconnectSessions, 3000);
+                    }
                     
                     resolve();
                 });